@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Benchmarks for the hot paths of the designer. Every style under root is
+# copied to a temporary folder, optionally scaled up by repeating its widget
+# files and extras, and then timed for:
+#   variables       palette_to_scss with a fresh resolver
+#   compile         full compile of <style>.scss with the built-in compiler
+#   compile_qtsass  the same with qtsass, when it is installed
+#   compile_cached  compile with a warm partial cache
+#   preview         preview_stylesheet on the preview ui
+#   view            show_text of the compiled stylesheet in the stylesheet tab
+#   search          search_text on the compiled stylesheet
+# Results are written as JSON so that runs of different revisions can be
+# compared with --compare. Runs headless on the offscreen Qt platform.
+#
+# Usage: benchmark.py [style ...] [--scale 1 10 100] [--repeat 5] [--output FILE]
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import style_compiler
+from style_compiler import theme_paths, find_themes, load_palette, extras_to_lines
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def timed(func, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+def scale_theme(style, scale, dest):
+    # copy a style to dest, repeating every widget file and extra scale times
+    name = os.path.basename(os.path.normpath(style))
+    target = os.path.join(dest, f"{name}_x{scale}")
+    paths = theme_paths(style)
+    new_paths = theme_paths(target)
+    shutil.copytree(style, target, ignore=shutil.ignore_patterns(style_compiler.CACHE_FILE, 'style_rc', '*.ui'))
+    os.replace(os.path.join(target, f"{name}.json"), new_paths['palette_file'])
+    imports = style_compiler.parse_imports(paths['scss_file'])
+    if scale == 1 or imports is None:
+        shutil.copy(paths['scss_file'], new_paths['scss_file'])
+    else:
+        palette_dict, extras_dict = load_palette(paths['palette_file'])
+        extras = {}
+        for i in range(scale):
+            for key, val in extras_dict.items():
+                extras[key if i == 0 else f"{key.strip()}_{i}"] = val
+        with open(new_paths['palette_file'], 'w') as json_file:
+            json.dump({'palette': palette_dict, 'extras': extras}, json_file, indent=4)
+        lines = []
+        for imp in imports:
+            path = style_compiler.find_partial(style, imp)
+            if os.path.abspath(path) == os.path.abspath(paths['var_file']):
+                lines.append(f"@import '{imp}';")
+                continue
+            base = os.path.basename(path)[:-len('.scss')].lstrip('_')
+            for i in range(scale):
+                shutil.copy(path, os.path.join(new_paths['widget_path'], f"_{base}_{i}.scss"))
+                lines.append(f"@import 'widgets/{base}_{i}';")
+        with open(new_paths['scss_file'], 'w') as sass_file:
+            sass_file.write('\n'.join(lines) + '\n')
+    result = style_compiler.build_theme(target, use_cache=False, write_qss=False)
+    if result['error'] is not None:
+        raise RuntimeError(result['error'])
+    return target, result['qss']
+
+def make_window(ui_file):
+    # the designer window is only needed for the preview and search benchmarks
+    try:
+        from PyQt5 import QtWidgets
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+        import style_designer
+        window = style_designer.Create_StyleSheet()
+        window.preview_pool.open(ui_file).show()
+        window.action_PreviewStylesheet.setChecked(True)
+        return app, window, None
+    except Exception as error:
+        return None, None, f"{type(error).__name__}: {error}"
+
+def bench_style(style, qss, args, app, window):
+    name = os.path.basename(os.path.normpath(style))
+    palette_dict, extras_dict = load_palette(theme_paths(style)['palette_file'])
+    extras = extras_to_lines(extras_dict)
+    benches = {}
+    benches['variables'] = lambda: style_compiler.palette_to_scss(name, palette_dict, extras, [])
+    benches['compile'] = lambda: style_compiler.compile_theme(style, use_cache=False)
+    if style_compiler.qtsass_installed():
+        benches['compile_qtsass'] = lambda: style_compiler.compile_theme(style, use_cache=False, lite=False)
+    style_compiler.compile_theme(style)
+    benches['compile_cached'] = lambda: style_compiler.compile_theme(style)
+    if window is not None:
+        def preview():
+            window.preview_pool.apply('')
+            app.processEvents()
+            start = time.perf_counter()
+            window.preview_stylesheet()
+            app.processEvents()
+            return time.perf_counter() - start
+        benches['preview'] = preview
+        def view():
+            window.show_text(window.TextView_Stylesheet, window.LazyView_Stylesheet, qss)
+            app.processEvents()
+        benches['view'] = view
+        view()
+        window.lineEdit_search.blockSignals(True)
+        window.lineEdit_search.setText(args.search)
+        window.lineEdit_search.blockSignals(False)
+        window.qss_text = qss
+        benches['search'] = window.search_text
+    results = []
+    for bench, func in benches.items():
+        if bench == 'preview':
+            # only time the stylesheet application, not the reset
+            times = [func() for i in range(args.repeat)]
+        else:
+            times = timed(func, args.repeat)
+        results.append({'bench': bench, 'times': times,
+                        'min': min(times), 'median': statistics.median(times),
+                        'mean': statistics.mean(times)})
+    return results
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+def compare(old_file, report):
+    with open(old_file, 'r') as file:
+        old = json.load(file)
+    previous = {(r['style'], r['scale'], r['bench']): r['median'] for r in old['results']}
+    print(f"{'style':<16} {'scale':>5} {'bench':<15} {'before':>10} {'after':>10} {'ratio':>7}", file=sys.stderr)
+    for r in report['results']:
+        key = (r['style'], r['scale'], r['bench'])
+        if not key in previous: continue
+        before = previous[key] * 1000
+        after = r['median'] * 1000
+        ratio = after / before if before else float('nan')
+        print(f"{r['style']:<16} {r['scale']:>5} {r['bench']:<15} {before:8.2f}ms {after:8.2f}ms {ratio:7.2f}", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Style Designer hot paths")
+    parser.add_argument('styles', nargs='*', help="style folders to benchmark (default: all under root)")
+    parser.add_argument('--root', default=HERE, help="folder containing the style folders")
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100], help="size multipliers for synthetic styles")
+    parser.add_argument('--repeat', type=int, default=5, help="number of timed runs per benchmark")
+    parser.add_argument('--ui', default=os.path.join(HERE, 'example', 'example.ui'), help="ui file used for the preview")
+    parser.add_argument('--search', default='background', help="search term for the search benchmark")
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    parser.add_argument('--compare', help="JSON report of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    # stylesheets refer to their images relative to the root folder
+    os.chdir(args.root)
+    styles = [os.path.join(args.root, s) for s in args.styles] or find_themes(args.root)
+    app, window, error = make_window(args.ui)
+    if error is not None:
+        print(f"Skipping preview and search benchmarks - {error}", file=sys.stderr)
+
+    report = {'meta': {'revision': revision(),
+                       'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'qtsass': getattr(style_compiler.load_qtsass(), '__version__', '')
+                                 if style_compiler.qtsass_installed() else '',
+                       'repeat': args.repeat,
+                       'time': time.strftime('%Y-%m-%d %H:%M:%S')},
+              'results': []}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for style in styles:
+            name = os.path.basename(os.path.normpath(style))
+            for scale in args.scale:
+                try:
+                    target, qss = scale_theme(style, scale, tmp_dir)
+                    results = bench_style(target, qss, args, app, window)
+                except Exception as error:
+                    print(f"{name} x{scale}: {type(error).__name__}: {error}", file=sys.stderr)
+                    continue
+                for r in results:
+                    r.update({'style': name, 'scale': scale, 'qss_size': len(qss)})
+                    report['results'].append(r)
+                    print(f"{name:<16} x{scale:<4} {r['bench']:<15} {r['median'] * 1000:9.2f} ms", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+    if args.compare:
+        compare(args.compare, report)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
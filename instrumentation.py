@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Timing of the hot paths. Code that may be slow is wrapped in a span:
+#   with instrumentation.span('compile', file=name):
+#       ...
+# or a function is decorated with @instrumentation.timed('read file').
+# Every span is kept in a ring of the last MAX_EVENTS spans for the trace
+# and its duration is added to the last WINDOW durations of its stage, which
+# give the percentiles and the histogram shown in the designer's timing
+# panel. The spans can be saved as a Chrome trace, open it in
+# chrome://tracing or https://ui.perfetto.dev to see them on a time line.
+# Spans nest, the time of a stage includes the stages inside it.
+# This file does not use Qt so the compiler can use it in worker processes.
+#
+# Usage: instrumentation.py trace.json    (prints the stages of a saved trace)
+
+import os
+import sys
+import json
+import time
+import bisect
+import argparse
+import threading
+import functools
+from collections import deque
+
+MAX_EVENTS = 100000
+WINDOW = 1000
+# upper edges of the histogram buckets in seconds, the last bucket is open
+BUCKETS = [10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3,
+           10e-3, 20e-3, 50e-3, 100e-3, 200e-3, 500e-3, 1.0, 2.0, 5.0]
+
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f} us"
+    if seconds < 1.0:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+def percentile(ordered, fraction):
+    # nearest rank of an ordered list
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Span():
+    __slots__ = ('recorder', 'name', 'args', 'start')
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.add(self.name, time.perf_counter() - self.start, self.start, self.args)
+        return False
+
+
+class Recorder():
+    def __init__(self, max_events=MAX_EVENTS, window=WINDOW):
+        self.max_events = max_events
+        self.window = window
+        self.lock = threading.Lock()
+        self.enabled = True
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.epoch = time.perf_counter()
+            self.events = deque(maxlen=self.max_events)
+            # name -> {'count', 'total', 'last', 'durations'}
+            self.stages = {}
+            self.version = 0
+
+    def span(self, name, **args):
+        return Span(self, name, args)
+
+    def add(self, name, duration, start=None, args=None):
+        # record a span, with no start it is taken to have just ended
+        if not self.enabled: return
+        if start is None:
+            start = time.perf_counter() - duration
+        with self.lock:
+            self.events.append((name, start, duration, threading.get_ident(), args))
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {'count': 0, 'total': 0.0, 'last': 0.0,
+                                             'durations': deque(maxlen=self.window)}
+            stage['count'] += 1
+            stage['total'] += duration
+            stage['last'] = duration
+            stage['durations'].append(duration)
+            self.version += 1
+
+    def summary(self):
+        # {name: dict} of every stage, the percentiles are of the last
+        # WINDOW spans, count and total of all of them
+        with self.lock:
+            stages = {name: (dict(stage), sorted(stage['durations'])) for name, stage in self.stages.items()}
+        result = {}
+        for name, (stage, ordered) in stages.items():
+            result[name] = {'count': stage['count'], 'total': stage['total'], 'last': stage['last'],
+                            'median': percentile(ordered, 0.5), 'p90': percentile(ordered, 0.9),
+                            'p99': percentile(ordered, 0.99), 'max': ordered[-1] if ordered else 0.0}
+        return result
+
+    def histogram(self, name):
+        # count of the last WINDOW spans of name per bucket of BUCKETS,
+        # with one more bucket for everything slower
+        counts = [0] * (len(BUCKETS) + 1)
+        with self.lock:
+            stage = self.stages.get(name)
+            durations = list(stage['durations']) if stage is not None else []
+        for duration in durations:
+            counts[bisect.bisect_left(BUCKETS, duration)] += 1
+        return counts
+
+    def trace(self):
+        # the spans as a Chrome trace, complete events in microseconds
+        with self.lock:
+            events = list(self.events)
+            epoch = self.epoch
+        pid = os.getpid()
+        threads = {}
+        trace = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'Style Designer'}}]
+        for name, start, duration, thread, args in events:
+            tid = threads.setdefault(thread, len(threads) + 1)
+            event = {'name': name, 'cat': name.split()[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': round((start - epoch) * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+            if args:
+                event['args'] = {key: str(val) for key, val in args.items()}
+            trace.append(event)
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def save_trace(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.trace(), file)
+        return len(self.events)
+
+
+RECORDER = Recorder()
+
+def span(name, **args):
+    return RECORDER.span(name, **args)
+
+def add(name, duration, start=None, args=None):
+    RECORDER.add(name, duration, start, args)
+
+def timed(name):
+    # decorator that puts every call of a function in a span
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with RECORDER.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load_trace(path):
+    # a Recorder filled with the complete events of a saved trace
+    with open(path, 'r') as file:
+        data = json.load(file)
+    events = data['traceEvents'] if isinstance(data, dict) else data
+    recorder = Recorder(max_events=max(1, len(events)), window=max(1, len(events)))
+    for event in events:
+        if event.get('ph') != 'X': continue
+        recorder.add(event['name'], event.get('dur', 0) / 1e6, event.get('ts', 0) / 1e6, event.get('args'))
+    return recorder
+
+def format_summary(summary):
+    lines = [f"{'stage':<24} {'count':>7} {'median':>10} {'p90':>10} {'max':>10} {'total':>10}"]
+    for name, s in sorted(summary.items(), key=lambda item: -item[1]['total']):
+        lines.append(f"{name:<24} {s['count']:>7} {format_time(s['median']):>10} {format_time(s['p90']):>10} "
+                     f"{format_time(s['max']):>10} {format_time(s['total']):>10}")
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the stages of a trace saved by the designer")
+    parser.add_argument('trace', help="Chrome trace json file")
+    args = parser.parse_args(argv)
+    try:
+        recorder = load_trace(args.trace)
+    except (OSError, ValueError, KeyError) as error:
+        print(f"Could not read {args.trace}: {error}")
+        return 1
+    print(format_summary(recorder.summary()))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Read only viewer for very large stylesheets. The file is memory mapped
+# instead of read, the line starts are found in chunks while the viewer is
+# idle and only the lines on screen are decoded, highlighted and painted, so
+# opening a file takes the same time and memory whatever its size.
+# Searching runs the regular expression over the mapped bytes and keeps the
+# match offsets, like Text_Search does for the plain text views.
+
+import re
+import mmap
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QPainter, QPalette
+
+CHUNK = 1 << 20          # bytes indexed per idle step
+LOOKBACK = 1 << 16       # how far back to look for an open comment or block
+CACHE_LINES = 2000       # highlighted lines kept
+TAB = '    '
+
+TOKEN = re.compile(r'''/\*|[{};:]|\$[\w-]+|@[\w-]+|"[^"]*"|'[^']*\'''')
+COLORS = {'comment': QColor('#808080'), 'selector': QColor('#2060c0'), 'property': QColor('#a03080'),
+          'value': QColor('#208040'), 'variable': QColor('#c06000'), 'at': QColor('#8040c0'),
+          'string': QColor('#b03030')}
+
+
+def highlight(text, in_comment=False, in_block=False):
+    # [(start, end, kind)] for one line, kind is a key of COLORS
+    spans = []
+    after_colon = False
+    position = 0
+    length = len(text)
+    while position < length:
+        if in_comment:
+            end = text.find('*/', position + 2 if text.startswith('/*', position) else position)
+            end = length if end < 0 else end + 2
+            spans.append((position, end, 'comment'))
+            in_comment = not text.endswith('*/', 0, end)
+            position = end
+            continue
+        match = TOKEN.search(text, position)
+        stop = length if match is None else match.start()
+        if text[position:stop].strip():
+            if after_colon:
+                kind = 'value'
+            else:
+                kind = 'property' if in_block else 'selector'
+            spans.append((position, stop, kind))
+        if match is None: break
+        token = match.group(0)
+        if token == '/*':
+            in_comment = True
+            position = match.start()
+            continue
+        if token == '{':
+            in_block = True
+            after_colon = False
+        elif token == '}':
+            in_block = False
+            after_colon = False
+        elif token == ';':
+            after_colon = False
+        elif token == ':':
+            # selectors have pseudo states, $variables: outside blocks have values
+            if in_block or text.lstrip().startswith('$'):
+                after_colon = True
+            else:
+                spans.append((match.start(), match.end(), 'selector'))
+        elif token[0] == '$':
+            spans.append((match.start(), match.end(), 'variable'))
+        elif token[0] == '@':
+            spans.append((match.start(), match.end(), 'at'))
+        else:
+            spans.append((match.start(), match.end(), 'string'))
+        position = match.end()
+    return spans
+
+
+class Line_Source():
+    # the bytes of a mapped file or of a text, with the line starts found
+    # up to self.scanned
+    def __init__(self, path=None, text=None):
+        self.file = None
+        self.data = b''
+        if path is not None:
+            self.file = open(path, 'rb')
+            try:
+                self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be mapped
+                self.data = b''
+        elif text is not None:
+            self.data = text.encode('utf-8')
+        self.size = len(self.data)
+        self.offsets = array('q', [0])
+        self.scanned = 0
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if self.file is not None:
+            self.file.close()
+        self.data = b''
+
+    def complete(self):
+        return self.scanned >= self.size
+
+    def index_more(self, size=CHUNK):
+        end = min(self.scanned + size, self.size)
+        find = self.data.find
+        position = find(b'\n', self.scanned, end)
+        while position >= 0:
+            self.offsets.append(position + 1)
+            position = find(b'\n', position + 1, end)
+        self.scanned = end
+
+    def line_count(self):
+        # estimated from the part that is indexed until the index is complete
+        if self.complete():
+            return len(self.offsets)
+        return max(len(self.offsets), int(len(self.offsets) * self.size / max(self.scanned, 1)))
+
+    def line_range(self, number):
+        while number + 1 >= len(self.offsets) and not self.complete():
+            self.index_more()
+        if number >= len(self.offsets):
+            return self.size, self.size
+        start = self.offsets[number]
+        end = self.offsets[number + 1] if number + 1 < len(self.offsets) else self.size
+        return start, end
+
+    def line_bytes(self, number):
+        start, end = self.line_range(number)
+        return bytes(self.data[start:end]).rstrip(b'\r\n')
+
+    def line_of(self, position):
+        while position >= self.scanned and not self.complete():
+            self.index_more()
+        return bisect_right(self.offsets, position) - 1
+
+    def context(self, position):
+        # (in comment, in block) at position, from the nearest markers before it
+        start = max(position - LOOKBACK, 0)
+        find = self.data.rfind
+        in_comment = find(b'/*', start, position) > find(b'*/', start, position)
+        in_block = find(b'{', start, position) > find(b'}', start, position)
+        return in_comment, in_block
+
+
+def column(raw, offset):
+    # character column of a byte offset into a line, with tabs expanded
+    return len(raw[:offset].decode('utf-8', 'replace').replace('\t', TAB))
+
+
+class Lazy_View(QtWidgets.QAbstractScrollArea):
+    text_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(Lazy_View, self).__init__(parent)
+        self.source = Line_Source()
+        self.lines = OrderedDict()
+        self.max_width = 0
+        self.cursor_line = 0
+        self.anchor_line = 0
+        self.pattern = None
+        self.starts = array('q')
+        self.ends = array('q')
+        self.current = -1
+        self.error = None
+        self.match_color = QColor('yellow')
+        self.current_color = QColor('orange')
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.index_timer = QtCore.QTimer(self)
+        self.index_timer.setInterval(0)
+        self.index_timer.timeout.connect(self.index_step)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+    def open_file(self, path):
+        self.set_source(Line_Source(path=path))
+
+    def set_text(self, text):
+        self.set_source(Line_Source(text=text))
+
+    def clear(self):
+        if self.source.size:
+            self.set_source(Line_Source())
+
+    def set_source(self, source):
+        self.source.close()
+        self.source = source
+        self.lines.clear()
+        self.max_width = 0
+        self.cursor_line = self.anchor_line = 0
+        self.source.index_more()
+        if not self.source.complete():
+            self.index_timer.start()
+        self.verticalScrollBar().setValue(0)
+        self.horizontalScrollBar().setValue(0)
+        self.update_scrollbars()
+        # the same search term is found again in the new text
+        self.build_index()
+        if self.starts:
+            self.current = 0
+        self.viewport().update()
+        self.text_changed.emit()
+
+    def index_step(self):
+        self.source.index_more()
+        if self.source.complete():
+            self.index_timer.stop()
+        self.update_scrollbars()
+
+    def line_height(self):
+        return self.fontMetrics().lineSpacing()
+
+    def visible_lines(self):
+        return max(self.viewport().height() // self.line_height(), 1)
+
+    def update_scrollbars(self):
+        bar = self.verticalScrollBar()
+        rows = self.visible_lines()
+        bar.setRange(0, max(self.source.line_count() - rows, 0))
+        bar.setPageStep(rows)
+        bar = self.horizontalScrollBar()
+        bar.setRange(0, max(self.max_width - self.viewport().width() + 8, 0))
+        bar.setPageStep(self.viewport().width())
+        bar.setSingleStep(self.fontMetrics().averageCharWidth())
+
+    def resizeEvent(self, event):
+        super(Lazy_View, self).resizeEvent(event)
+        self.update_scrollbars()
+
+    def line(self, number):
+        # (raw bytes, text, spans) of a line, highlighted when first shown
+        if number in self.lines:
+            self.lines.move_to_end(number)
+            return self.lines[number]
+        raw = self.source.line_bytes(number)
+        text = raw.decode('utf-8', 'replace').replace('\t', TAB)
+        start, end = self.source.line_range(number)
+        entry = (raw, text, highlight(text, *self.source.context(start)))
+        self.lines[number] = entry
+        if len(self.lines) > CACHE_LINES:
+            self.lines.popitem(last=False)
+        return entry
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(self.viewport().rect(), palette.color(QPalette.Base))
+        metrics = self.fontMetrics()
+        height = self.line_height()
+        first = self.verticalScrollBar().value()
+        left = 4 - self.horizontalScrollBar().value()
+        low, high = sorted((self.anchor_line, self.cursor_line))
+        selected = QColor(palette.color(QPalette.Highlight))
+        selected.setAlpha(60)
+        count = self.source.line_count()
+        width = self.max_width
+        for row in range(self.visible_lines() + 1):
+            number = first + row
+            if number >= count: break
+            raw, text, spans = self.line(number)
+            top = row * height
+            if low <= number <= high:
+                painter.fillRect(0, top, self.viewport().width(), height, selected)
+            self.paint_matches(painter, number, raw, text, left, top)
+            position = 0
+            x = left
+            for start, end, kind in spans + [(len(text), len(text), None)]:
+                for part, color in ((text[position:start], palette.color(QPalette.Text)),
+                                    (text[start:end], COLORS.get(kind))):
+                    if not part: continue
+                    painter.setPen(color)
+                    painter.drawText(x, top + metrics.ascent(), part)
+                    x += metrics.horizontalAdvance(part)
+                position = end
+            width = max(width, x - left)
+        if width > self.max_width:
+            self.max_width = width
+            self.update_scrollbars()
+
+    def paint_matches(self, painter, number, raw, text, left, top):
+        if not self.starts: return
+        start, end = self.source.line_range(number)
+        metrics = self.fontMetrics()
+        for index in range(bisect_right(self.ends, start), bisect_left(self.starts, end)):
+            first = column(raw, self.starts[index] - start)
+            last = column(raw, min(self.ends[index], start + len(raw)) - start)
+            x = left + metrics.horizontalAdvance(text[:first])
+            color = self.current_color if index == self.current else self.match_color
+            painter.fillRect(x, top, metrics.horizontalAdvance(text[first:last]), self.line_height(), color)
+
+    # selection of whole lines
+    def set_cursor_line(self, number, keep_anchor=False):
+        count = self.source.line_count()
+        self.cursor_line = min(max(number, 0), max(count - 1, 0))
+        if not keep_anchor:
+            self.anchor_line = self.cursor_line
+        bar = self.verticalScrollBar()
+        if self.cursor_line < bar.value():
+            bar.setValue(self.cursor_line)
+        elif self.cursor_line >= bar.value() + self.visible_lines():
+            bar.setValue(self.cursor_line - self.visible_lines() + 1)
+        self.viewport().update()
+
+    def goto_line(self, line):
+        # 1 based like the line numbers of the editors, centred
+        self.set_cursor_line(line - 1)
+        self.verticalScrollBar().setValue(self.cursor_line - self.visible_lines() // 2)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            number = self.verticalScrollBar().value() + event.pos().y() // self.line_height()
+            self.set_cursor_line(number, bool(event.modifiers() & Qt.ShiftModifier))
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            self.set_cursor_line(self.verticalScrollBar().value() + event.pos().y() // self.line_height(), True)
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        shift = bool(event.modifiers() & Qt.ShiftModifier)
+        control = bool(event.modifiers() & Qt.ControlModifier)
+        if event.matches(event.Copy):
+            self.copy()
+        elif event.matches(event.SelectAll):
+            self.anchor_line = 0
+            self.set_cursor_line(self.source.line_count() - 1, True)
+        elif key == Qt.Key_Up:
+            self.set_cursor_line(self.cursor_line - 1, shift)
+        elif key == Qt.Key_Down:
+            self.set_cursor_line(self.cursor_line + 1, shift)
+        elif key == Qt.Key_PageUp:
+            self.set_cursor_line(self.cursor_line - self.visible_lines(), shift)
+        elif key == Qt.Key_PageDown:
+            self.set_cursor_line(self.cursor_line + self.visible_lines(), shift)
+        elif key == Qt.Key_Home and control:
+            self.set_cursor_line(0, shift)
+        elif key == Qt.Key_End and control:
+            self.set_cursor_line(self.source.line_count() - 1, shift)
+        else:
+            super(Lazy_View, self).keyPressEvent(event)
+
+    def copy(self):
+        low, high = sorted((self.anchor_line, self.cursor_line))
+        start = self.source.line_range(low)[0]
+        end = self.source.line_range(high)[1]
+        text = bytes(self.source.data[start:end]).decode('utf-8', 'replace')
+        QtWidgets.QApplication.clipboard().setText(text)
+
+    # same interface as Text_Search
+    def find(self, term, regex=False):
+        self.error = None
+        self.pattern = None
+        if term:
+            try:
+                self.pattern = re.compile((term if regex else re.escape(term)).encode('utf-8'), re.IGNORECASE)
+            except re.error as error:
+                self.error = str(error)
+        self.build_index()
+        if self.starts:
+            position = self.source.line_range(self.verticalScrollBar().value())[0]
+            self.current = bisect_left(self.starts, position) % len(self.starts)
+        self.viewport().update()
+        return len(self.starts)
+
+    def build_index(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.current = -1
+        if self.pattern is None: return
+        for match in self.pattern.finditer(self.source.data):
+            if match.end() > match.start():
+                self.starts.append(match.start())
+                self.ends.append(match.end())
+
+    def count(self):
+        return len(self.starts)
+
+    def next(self):
+        self.move(1)
+
+    def previous(self):
+        self.move(-1)
+
+    def move(self, step):
+        if not self.starts: return
+        self.current = (self.current + step) % len(self.starts)
+        self.goto_line(self.source.line_of(self.starts[self.current]) + 1)
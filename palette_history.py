@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# In memory history of the palette and extras of a style. Every snapshot is
+# kept as the difference with the one before it, with a full copy every
+# KEYFRAME snapshots so that going back to any of them only replays a few
+# differences. Snapshots are only ever added, going back and changing the
+# palette adds a new one at the end. Each snapshot has a digest of its
+# content, which QSS_Cache uses to keep the compiled stylesheets of the last
+# few palettes so that they can be shown again without compiling.
+
+import time
+import json
+import hashlib
+from collections import OrderedDict
+
+KEYFRAME = 32
+CACHE_ENTRIES = 16
+CACHE_BYTES = 64 << 20
+
+
+def digest(palette, extras):
+    # the order of the entries is part of the palette, so it is hashed too
+    text = json.dumps([list(palette.items()), list(extras.items())])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def make_diff(old, new):
+    # (changed, removed, order) turning dict old into dict new, order is
+    # only kept when the keys end up in another order than old's
+    changed = {key: val for key, val in new.items() if old.get(key, None) != val or not key in old}
+    removed = [key for key in old if not key in new]
+    order = None
+    kept = [key for key in old if key in new] + [key for key in new if not key in old]
+    if kept != list(new):
+        order = list(new)
+    return (changed, removed, order)
+
+def apply_diff(old, diff):
+    changed, removed, order = diff
+    new = dict(old)
+    for key in removed:
+        del new[key]
+    new.update(changed)
+    if order is not None:
+        new = {key: new[key] for key in order}
+    return new
+
+
+class Palette_History():
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # every entry is {'time', 'label', 'digest', 'full' or 'diff'}
+        self.entries = []
+        self.last = None
+        self.current = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, palette, extras, label=''):
+        # add a snapshot unless it is the same as the last one, returns its index
+        key = digest(palette, extras)
+        if self.entries and self.entries[-1]['digest'] == key:
+            return len(self.entries) - 1
+        entry = {'time': time.time(), 'label': label, 'digest': key}
+        if self.last is None or len(self.entries) % KEYFRAME == 0:
+            entry['full'] = (dict(palette), dict(extras))
+        else:
+            entry['diff'] = (make_diff(self.last[0], palette), make_diff(self.last[1], extras))
+        self.entries.append(entry)
+        self.last = (dict(palette), dict(extras))
+        return len(self.entries) - 1
+
+    def state(self, index):
+        # (palette, extras) of snapshot index, the last one asked for is
+        # kept so that stepping to the next one replays a single diff
+        if self.current is not None and self.current[0] == index:
+            return self.current[1]
+        start = index - index % KEYFRAME
+        if self.current is not None and start < self.current[0] < index:
+            start, state = self.current[0] + 1, self.current[1]
+        else:
+            state = None
+        for entry in self.entries[start:index + 1]:
+            if 'full' in entry:
+                state = entry['full']
+            else:
+                state = (apply_diff(state[0], entry['diff'][0]), apply_diff(state[1], entry['diff'][1]))
+        self.current = (index, state)
+        return (dict(state[0]), dict(state[1]))
+
+    def digest(self, index):
+        return self.entries[index]['digest']
+
+    def find(self, key):
+        # index of the last snapshot with digest key, or None
+        for index in range(len(self.entries) - 1, -1, -1):
+            if self.entries[index]['digest'] == key:
+                return index
+        return None
+
+    def size(self):
+        # rough size in bytes of the stored snapshots
+        return sum(len(json.dumps(entry.get('full') or entry.get('diff'))) for entry in self.entries)
+
+
+class QSS_Cache():
+    # compiled stylesheets by key, the least recently used ones are dropped
+    # when there are more than max_entries or they take more than max_bytes
+    def __init__(self, max_entries=CACHE_ENTRIES, max_bytes=CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sheets = OrderedDict()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.sheets)
+
+    def __contains__(self, key):
+        return key in self.sheets
+
+    def get(self, key):
+        text = self.sheets.get(key)
+        if text is not None:
+            self.sheets.move_to_end(key)
+        return text
+
+    def put(self, key, text):
+        if key in self.sheets:
+            self.bytes -= len(self.sheets.pop(key))
+        self.sheets[key] = text
+        self.bytes += len(text)
+        while len(self.sheets) > 1 and (len(self.sheets) > self.max_entries or self.bytes > self.max_bytes):
+            key, text = self.sheets.popitem(last=False)
+            self.bytes -= len(text)
+
+    def clear(self):
+        self.sheets.clear()
+        self.bytes = 0
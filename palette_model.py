@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Table model for the palette. Each row holds a colour code and an optional
+# variable name; rows without a name are saved as A1, A2 ... like before.
+# Names must be unique and can't look like A1, A2 ... or a colour would be
+# lost when the palette is saved.
+# The swatches are painted by Swatch_Delegate so no widget or stylesheet
+# is created per colour, and the view only paints the rows that are visible.
+
+import re
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QRegExp, pyqtSignal
+from PyQt5.QtGui import QColor, QPalette, QRegExpValidator
+from PyQt5.QtWidgets import QStyledItemDelegate, QLineEdit, QStyle
+
+from style_compiler import PLACEHOLDER
+
+COLOR_CODE = re.compile(r'#[0-9A-Fa-f]{6}$')
+
+# table columns
+SWATCH = 0
+CODE = 1
+VARIABLE = 2
+
+
+class Palette_Model(QAbstractTableModel):
+    color_changed = pyqtSignal(int, str)
+    invalid_code = pyqtSignal(int, str)
+    # row, reason
+    invalid_name = pyqtSignal(int, str)
+
+    def __init__(self, parent=None, min_rows=32):
+        super(Palette_Model, self).__init__(parent)
+        self.min_rows = min_rows
+        self.headers = ['COLOR', 'CODE', 'VARIABLE']
+        self.entries = [['', ''] for i in range(min_rows)]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            if orientation == Qt.Horizontal:
+                return self.headers[section]
+            return f'A{section + 1}'
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() != SWATCH:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        var, code = self.entries[index.row()]
+        column = index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if column == CODE: return code
+            if column == VARIABLE: return var
+        elif role == Qt.BackgroundRole and column == SWATCH:
+            if COLOR_CODE.match(code):
+                return QColor(code)
+        elif role == Qt.TextAlignmentRole and column == CODE:
+            return Qt.AlignCenter
+        elif role == Qt.ToolTipRole and column == SWATCH:
+            return code
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        row = index.row()
+        value = str(value).strip()
+        if index.column() == CODE:
+            if value != '' and not COLOR_CODE.match(value):
+                self.invalid_code.emit(row, value)
+                return False
+            self.entries[row][1] = value
+            first = self.index(row, SWATCH)
+            self.dataChanged.emit(first, index)
+            self.color_changed.emit(row, value)
+        elif index.column() == VARIABLE:
+            if PLACEHOLDER.match(value):
+                self.invalid_name.emit(row, f"{value} is the name of an unnamed row")
+                return False
+            other = self.find_name(value)
+            if value != '' and other not in (None, row):
+                self.invalid_name.emit(row, f"{value} is already used in A{other + 1}")
+                return False
+            self.entries[row][0] = value
+            self.dataChanged.emit(index, index)
+        else:
+            return False
+        return True
+
+    def insertRows(self, row, count, parent=QModelIndex()):
+        self.beginInsertRows(parent, row, row + count - 1)
+        self.entries[row:row] = [['', ''] for i in range(count)]
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if row < 0 or row + count > len(self.entries):
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        del self.entries[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    def load(self, palette_dict):
+        # one model reset for the whole palette
+        entries = []
+        for var, code in palette_dict.items():
+            if PLACEHOLDER.match(var):
+                var = ''
+            entries.append([var, code])
+        while len(entries) < self.min_rows:
+            entries.append(['', ''])
+        self.beginResetModel()
+        self.entries = entries
+        self.endResetModel()
+
+    def to_dict(self):
+        palette_dict = {}
+        for row, (var, code) in enumerate(self.entries):
+            if not code.startswith('#'):
+                code = ''
+            if var == '':
+                var = f'A{row + 1}'
+            palette_dict[var] = code
+        return palette_dict
+
+    def find_name(self, var):
+        # row with variable name var, or None
+        for row, entry in enumerate(self.entries):
+            if entry[0] == var:
+                return row
+        return None
+
+    def color_code(self, row):
+        return self.entries[row][1]
+
+
+class Swatch_Delegate(QStyledItemDelegate):
+    def paint(self, painter, option, index):
+        if index.column() != SWATCH:
+            super(Swatch_Delegate, self).paint(painter, option, index)
+            return
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        rect = option.rect.adjusted(3, 3, -3, -3)
+        color = index.data(Qt.BackgroundRole)
+        if color is not None:
+            painter.fillRect(rect, color)
+        painter.setPen(option.palette.color(QPalette.WindowText))
+        painter.drawRect(rect)
+        painter.restore()
+
+    def createEditor(self, parent, option, index):
+        editor = super(Swatch_Delegate, self).createEditor(parent, option, index)
+        if index.column() == CODE and isinstance(editor, QLineEdit):
+            editor.setMaxLength(7)
+            editor.setAlignment(Qt.AlignCenter)
+            editor.setValidator(QRegExpValidator(QRegExp('#[0-9A-Fa-f]{0,6}'), editor))
+        return editor
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Size optimizer for compiled stylesheets. Qt parses the whole sheet again
+# on every setStyleSheet, so a smaller sheet applies faster.
+#  - declarations of a property that is set again later in the same rule
+#    are dropped
+#  - rules with identical declarations are merged into one selector list,
+#    but only if no rule in between sets any of the same properties, so the
+#    result cascades exactly like the original. Shorthands count as the same
+#    property as their longhands, border-color conflicts with border.
+# The output is written in compressed form, one rule after the other.
+
+
+class Rule():
+    def __init__(self, selectors, declarations, raw=None):
+        self.selectors = selectors
+        self.declarations = declarations
+        # at-rules and anything else that is not a plain rule is kept as is
+        self.raw = raw
+
+    def text(self):
+        if self.raw is not None:
+            return self.raw
+        block = ';'.join(f'{prop}:{value}' for prop, value in self.declarations)
+        return f"{','.join(self.selectors)}{{{block}}}"
+
+
+def split_top(text, separator):
+    # split on separator outside of quotes, parentheses and brackets
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, char in enumerate(text):
+        if quote is not None:
+            if char == quote and text[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+def strip_comments(css):
+    out = []
+    i = 0
+    quote = None
+    while i < len(css):
+        char = css[i]
+        if quote is not None:
+            if char == quote and css[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = len(css) if end < 0 else end + 2
+            continue
+        out.append(char)
+        i += 1
+    return ''.join(out)
+
+def parse_rules(css):
+    rules = []
+    css = strip_comments(css)
+    i = 0
+    length = len(css)
+    while i < length:
+        # find the opening brace of the next rule
+        quote = None
+        depth = 0
+        start = i
+        while i < length:
+            char = css[i]
+            if quote is not None:
+                if char == quote and css[i - 1] != '\\':
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif char in '([':
+                depth += 1
+            elif char in ')]':
+                depth -= 1
+            elif char == '{' and depth == 0:
+                break
+            i += 1
+        prelude = css[start:i].strip()
+        if i >= length:
+            if prelude:
+                rules.append(Rule([], [], raw=prelude))
+            break
+        # find the matching closing brace
+        level = 0
+        body_start = i + 1
+        quote = None
+        while i < length:
+            char = css[i]
+            if quote is not None:
+                if char == quote and css[i - 1] != '\\':
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif char == '{':
+                level += 1
+            elif char == '}':
+                level -= 1
+                if level == 0:
+                    break
+            i += 1
+        body = css[body_start:i]
+        i += 1
+        if prelude.startswith('@') or '{' in body:
+            rules.append(Rule([], [], raw=f"{prelude}{{{body.strip()}}}"))
+            continue
+        selectors = [' '.join(s.split()) for s in split_top(prelude, ',') if s.strip()]
+        declarations = []
+        for item in split_top(body, ';'):
+            if not ':' in item: continue
+            prop, value = item.split(':', 1)
+            declarations.append((prop.strip(), value.strip()))
+        rules.append(Rule(selectors, declarations))
+    return rules
+
+def drop_overridden(declarations):
+    # keep the last declaration of every property, an earlier !important
+    # one wins over a later normal one
+    winner = {}
+    for index, (prop, value) in enumerate(declarations):
+        if prop in winner and declarations[winner[prop]][1].endswith('!important') \
+            and not value.endswith('!important'):
+            continue
+        winner[prop] = index
+    keep = sorted(winner.values())
+    return [declarations[index] for index in keep]
+
+def family(prop):
+    # border, border-top and border-top-color all share the family border
+    return prop.split('-', 1)[0]
+
+def optimize(css):
+    rules = parse_rules(css)
+    report = {'rules_before': len(rules), 'declarations_dropped': 0, 'selectors_merged': 0}
+    output = []
+    candidate = {}
+    last_set = {}
+    for rule in rules:
+        if rule.raw is not None:
+            # nothing may be merged across an at-rule
+            output.append(rule)
+            candidate.clear()
+            continue
+        declarations = drop_overridden(rule.declarations)
+        report['declarations_dropped'] += len(rule.declarations) - len(declarations)
+        rule.declarations = declarations
+        key = tuple(declarations)
+        props = {family(prop) for prop, value in declarations}
+        index = candidate.get(key)
+        if index is not None and all(last_set.get(prop) == index for prop in props):
+            target = output[index]
+            for selector in rule.selectors:
+                if not selector in target.selectors:
+                    target.selectors.append(selector)
+            report['selectors_merged'] += 1
+            continue
+        output.append(rule)
+        index = len(output) - 1
+        candidate[key] = index
+        for prop in props:
+            last_set[prop] = index
+    report['rules_after'] = len(output)
+    text = ''.join(rule.text() for rule in output) + '\n'
+    report['size_before'] = len(css)
+    report['size_after'] = len(text)
+    return text, report
+
+def format_report(report):
+    # sizes are compared with the expanded sheet when it is known
+    before = report.get('size_expanded', report['size_before'])
+    after = report['size_after']
+    saved = 100 * (before - after) / before if before else 0
+    return (f"{before / 1024:.1f} KB -> {after / 1024:.1f} KB ({saved:.0f}% smaller), "
+            f"{report['rules_before']} -> {report['rules_after']} rules, "
+            f"{report['declarations_dropped']} overridden declarations dropped")
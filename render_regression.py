@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Finds the themes that look different after a change. Every ui file is
+# loaded in a Preview_Widget like the designer does, the compiled sheet of a
+# theme is applied and the window is grabbed to an image on the offscreen
+# Qt platform. The image is compared with the baseline of that theme:
+#   pixels    changed when a channel differs by more than the tolerance
+#   tiles     the image is cut in TILE x TILE squares, the number of squares
+#             with a changed pixel shows how spread out the change is
+#   widgets   the named widgets of the ui whose area changed the most
+# Changed images get a _diff.png next to them with the changed pixels in
+# red. The time to apply the sheet and to paint the window are recorded too.
+# Themes are rendered in worker processes, each with its own QApplication.
+#
+# Usage: render_regression.py [theme ...] [--ui FILE ...] [--update] [--compile] [--jobs N]
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import style_compiler
+from style_compiler import theme_paths, find_themes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TILE = 64
+DEFAULT_UI = os.path.join(HERE, 'example', 'example.ui')
+
+# numpy is only needed to compare images
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def init_worker():
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PyQt5 import QtWidgets
+    global APP
+    APP = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+
+def image_array(image):
+    # (height, width, 4) uint8 array of a QImage
+    from PyQt5.QtGui import QImage
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    bits = image.constBits()
+    bits.setsize(image.height() * image.bytesPerLine())
+    rows = np.frombuffer(bits, np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width() * 4].reshape(image.height(), image.width(), 4).copy()
+
+def array_image(array):
+    from PyQt5.QtGui import QImage
+    array = np.ascontiguousarray(array)
+    height, width = array.shape[:2]
+    return QImage(array.data, width, height, width * 4, QImage.Format_RGBA8888).copy()
+
+def compare(current, baseline, regions, tolerance):
+    # returns (report dict, changed pixel mask or None)
+    if current.shape != baseline.shape:
+        return {'status': 'size', 'size': list(current.shape[1::-1]),
+                'baseline_size': list(baseline.shape[1::-1])}, None
+    diff = np.abs(current.astype(np.int16) - baseline.astype(np.int16)).max(axis=2)
+    mask = diff > tolerance
+    changed = int(mask.sum())
+    if not changed:
+        return {'status': 'same', 'changed': 0}, None
+    height, width = mask.shape
+    rows, columns = np.nonzero(mask)
+    tiles = np.add.reduceat(np.add.reduceat(mask.astype(np.int32), np.arange(0, height, TILE), axis=0),
+                            np.arange(0, width, TILE), axis=1)
+    widgets = []
+    for name, x, y, w, h in regions:
+        count = int(mask[y:y + h, x:x + w].sum())
+        if count:
+            widgets.append((count / (w * h), name, count))
+    widgets.sort(reverse=True)
+    report = {'status': 'changed', 'changed': changed, 'fraction': changed / mask.size,
+              'max_diff': int(diff.max()),
+              'box': [int(columns.min()), int(rows.min()), int(columns.max()) + 1, int(rows.max()) + 1],
+              'tiles': int((tiles > 0).sum()), 'tiles_total': int(tiles.size),
+              'widgets': [{'name': name, 'changed': count, 'fraction': fraction}
+                          for fraction, name, count in widgets[:5]]}
+    return report, mask
+
+def diff_image(current, mask):
+    # the current image dimmed, with the changed pixels in red
+    out = current.copy()
+    out[..., :3] = out[..., :3] // 3 + 170
+    out[mask] = (255, 0, 0, 255)
+    return out
+
+def widget_regions(widget):
+    # (name, x, y, width, height) of the named widgets inside widget
+    from PyQt5.QtCore import QPoint, QRect
+    from PyQt5.QtWidgets import QWidget
+    regions = []
+    for child in widget.findChildren(QWidget):
+        name = child.objectName()
+        if not name or name.startswith('qt_') or not child.isVisible(): continue
+        rect = QRect(child.mapTo(widget, QPoint(0, 0)), child.size()).intersected(widget.rect())
+        if rect.width() > 0 and rect.height() > 0:
+            regions.append((name, rect.x(), rect.y(), rect.width(), rect.height()))
+    return regions
+
+def render_theme(theme, qss_file, ui_files, baseline_dir, output_dir, update=False, tolerance=8, size=None):
+    # render theme with every ui file, returns a list of result dicts
+    from style_designer import Preview_Widget
+    app = APP
+    qss = style_compiler.read_text(qss_file) or ''
+    results = []
+    for ui_file in ui_files:
+        name = os.path.splitext(os.path.basename(ui_file))[0]
+        result = {'theme': theme, 'ui': name}
+        try:
+            widget = Preview_Widget(ui_file)
+            if size is not None:
+                widget.resize(*size)
+            widget.show()
+            app.processEvents()
+            start = time.perf_counter()
+            widget.setStyleSheet(qss)
+            result['apply'] = time.perf_counter() - start
+            start = time.perf_counter()
+            image = widget.grab().toImage()
+            result['paint'] = time.perf_counter() - start
+            regions = widget_regions(widget)
+            widget.close()
+            widget.deleteLater()
+            app.processEvents()
+
+            baseline_file = os.path.join(baseline_dir, theme, f"{name}.png")
+            if update or not os.path.exists(baseline_file):
+                os.makedirs(os.path.dirname(baseline_file), exist_ok=True)
+                image.save(baseline_file)
+                result['status'] = 'updated' if update else 'new'
+                results.append(result)
+                continue
+            from PyQt5.QtGui import QImage
+            current = image_array(image)
+            report, mask = compare(current, image_array(QImage(baseline_file)), regions, tolerance)
+            result.update(report)
+            if result['status'] != 'same':
+                target = os.path.join(output_dir, theme)
+                os.makedirs(target, exist_ok=True)
+                image.save(os.path.join(target, f"{name}.png"))
+                if mask is not None:
+                    array_image(diff_image(current, mask)).save(os.path.join(target, f"{name}_diff.png"))
+        except Exception as error:
+            result['status'] = 'error'
+            result['error'] = f"{type(error).__name__}: {error}"
+        results.append(result)
+    return results
+
+def format_result(r):
+    text = f"{r['theme']:<24} {r['ui']:<16} {r['status']:<8}"
+    if 'apply' in r:
+        text += f" apply {r['apply'] * 1000:7.1f} ms  paint {r['paint'] * 1000:7.1f} ms"
+    if r['status'] == 'changed':
+        box = r['box']
+        text += (f"\n    {r['changed']} pixels ({r['fraction'] * 100:.2f}%) in {r['tiles']} of {r['tiles_total']} tiles, "
+                 f"box {box[0]},{box[1]} - {box[2]},{box[3]}, max difference {r['max_diff']}")
+        for w in r['widgets']:
+            text += f"\n    {w['name']:<28} {w['fraction'] * 100:6.1f}% changed"
+    elif r['status'] == 'size':
+        text += f" {r['baseline_size'][0]}x{r['baseline_size'][1]} -> {r['size'][0]}x{r['size'][1]}"
+    elif r['status'] == 'error':
+        text += f" {r['error']}"
+    return text
+
+def run(tasks, jobs, report=print):
+    # tasks are argument tuples for render_theme
+    results = []
+    if jobs <= 1 or len(tasks) == 1:
+        init_worker()
+        for task in tasks:
+            for result in render_theme(*task):
+                results.append(result)
+                report(format_result(result))
+    else:
+        # spawn, Qt does not survive a fork
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=init_worker) as pool:
+            futures = [pool.submit(render_theme, *task) for task in tasks]
+            for future in as_completed(futures):
+                for result in future.result():
+                    results.append(result)
+                    report(format_result(result))
+    return results
+
+def parse_size(text):
+    width, sep, height = text.lower().partition('x')
+    return int(width), int(height)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare renders of themes against stored baselines")
+    parser.add_argument('themes', nargs='*', help="theme folders, all compiled themes under --root by default")
+    parser.add_argument('--root', default=os.curdir, help="folder holding the theme folders")
+    parser.add_argument('--ui', action='append', metavar='FILE', help="ui file to render, may be repeated")
+    parser.add_argument('--baseline', default='render_baselines', help="folder of the baseline images")
+    parser.add_argument('--output', default='render_output', help="folder for the changed images and diffs")
+    parser.add_argument('--update', action='store_true', help="store the renders as the new baselines")
+    parser.add_argument('--compile', action='store_true', help="compile the themes before rendering")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--tolerance', type=int, default=8, help="largest channel difference that is not a change")
+    parser.add_argument('--size', type=parse_size, metavar='WxH', help="window size, the size in the ui by default")
+    parser.add_argument('--report', metavar='FILE', help="write the results as json to FILE")
+    args = parser.parse_args(argv)
+
+    if np is None and not args.update:
+        print("Cannot compare images - numpy is not installed")
+        print("sudo apt install python3-numpy")
+        return 2
+    styles = args.themes or find_themes(args.root)
+    ui_files = args.ui or [DEFAULT_UI]
+    for ui_file in ui_files:
+        if not os.path.exists(ui_file):
+            print(f"Could not find {ui_file}")
+            return 1
+    start = time.perf_counter()
+    if args.compile:
+        style_compiler.build_all(styles, args.jobs, report=lambda result: None)
+    tasks = []
+    for style in styles:
+        qss_file = theme_paths(style)['qss_file']
+        if not os.path.exists(qss_file):
+            print(f"Skipping {style} - not compiled")
+            continue
+        theme = os.path.basename(os.path.normpath(style))
+        tasks.append((theme, qss_file, [os.path.abspath(f) for f in ui_files], args.baseline, args.output,
+                      args.update, args.tolerance, args.size))
+    results = run(tasks, args.jobs)
+    elapsed = time.perf_counter() - start
+    count = {}
+    for r in results:
+        count[r['status']] = count.get(r['status'], 0) + 1
+    print(f"{len(results)} renders of {len(tasks)} themes in {elapsed:.1f} s: "
+          + ', '.join(f"{n} {status}" for status, n in sorted(count.items())))
+    if args.report:
+        style_compiler.write_atomic(args.report, json.dumps(results, indent=2))
+    failed = [r for r in results if r['status'] in ('changed', 'size', 'error')]
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
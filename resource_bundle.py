@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Packs the images used by a compiled stylesheet into one binary Qt
+# resource file and rewrites the url() references to :/ paths.
+#   <style>/<style>.rcc      the images, register it with
+#                            QResource.registerResource('<style>.rcc')
+#   <style>/<style>_rc.qss   the stylesheet using the resource paths
+# Only images that the sheet refers to are packed. They can be scaled down
+# to a maximum size and png files can be saved again with the highest
+# compression, whichever is smaller is kept.
+# The resource data is made by pyrcc5, which ships with PyQt5 but can only
+# write a python module; the tree, names and data it produces are the same
+# as in a binary .rcc file, so they are written out with a binary header.
+#
+# Usage: resource_bundle.py style [--base DIR] [--max-size PIXELS] [--recompress]
+
+import os
+import re
+import ast
+import sys
+import shutil
+import struct
+import argparse
+import tempfile
+import subprocess
+from xml.sax.saxutils import escape
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
+import style_compiler
+from style_compiler import theme_paths
+
+URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+RCC_MAGIC = b'qres'
+
+
+def find_urls(qss):
+    # url paths in order of appearance, without resource and data urls
+    urls = []
+    for match in URL.finditer(qss):
+        path = match.group(2).strip()
+        if path.startswith((':', 'data:', 'qrc:')) or path in urls: continue
+        urls.append(path)
+    return urls
+
+def prepare_image(source, target, max_size=None, recompress=False):
+    # copy source to target, scaled down and/or recompressed if that helps
+    shutil.copyfile(source, target)
+    if not max_size and not recompress:
+        return
+    image = QImage(source)
+    if image.isNull():
+        return
+    changed = False
+    if max_size and max(image.width(), image.height()) > max_size:
+        image = image.scaled(max_size, max_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        changed = True
+    if not changed and not (recompress and source.lower().endswith('.png')):
+        return
+    fmt = os.path.splitext(source)[1][1:].upper() or None
+    tmp_file = target + '.tmp'
+    # for png the quality sets the compression, 0 is the smallest file
+    if image.save(tmp_file, fmt, 0 if fmt == 'PNG' else -1):
+        if changed or os.path.getsize(tmp_file) < os.path.getsize(target):
+            os.replace(tmp_file, target)
+        else:
+            os.remove(tmp_file)
+
+def run_pyrcc(qrc_file):
+    # returns (version, tree, names, data) from the module pyrcc5 writes
+    py_file = os.path.splitext(qrc_file)[0] + '_rc.py'
+    result = subprocess.run([sys.executable, '-m', 'PyQt5.pyrcc_main', qrc_file, '-o', py_file],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise OSError(f"pyrcc5 failed: {result.stderr.strip()}")
+    values = {}
+    with open(py_file, 'r') as file:
+        tree = ast.parse(file.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name) \
+            and node.targets[0].id.startswith('qt_resource_'):
+            values[node.targets[0].id] = ast.literal_eval(node.value)
+    if 'qt_resource_struct_v2' in values:
+        return 2, values['qt_resource_struct_v2'], values['qt_resource_name'], values['qt_resource_data']
+    return 1, values['qt_resource_struct'], values['qt_resource_name'], values['qt_resource_data']
+
+def write_rcc(rcc_file, version, tree, names, data):
+    # header: magic, version, then the offsets of the tree, data and names
+    header_size = len(RCC_MAGIC) + 4 * 4
+    data_offset = header_size
+    names_offset = data_offset + len(data)
+    tree_offset = names_offset + len(names)
+    header = RCC_MAGIC + struct.pack('>IIII', version, tree_offset, data_offset, names_offset)
+    with open(rcc_file + '.tmp', 'wb') as file:
+        file.write(header + data + names + tree)
+    os.replace(rcc_file + '.tmp', rcc_file)
+
+def bundle(style, qss=None, base=None, max_size=None, recompress=False):
+    # returns a report dict, qss defaults to the compiled <style>.qss
+    paths = theme_paths(style)
+    name = os.path.basename(os.path.normpath(style))
+    base = base or os.getcwd()
+    if qss is None:
+        with open(paths['qss_file'], 'r') as file:
+            qss = file.read()
+    report = {'images': 0, 'missing': [], 'size_before': 0, 'size_after': 0,
+              'rcc_file': os.path.join(style, f"{name}.rcc"),
+              'qss_file': os.path.join(style, f"{name}_rc.qss")}
+    aliases = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lines = ['<!DOCTYPE RCC><RCC version="1.0">', '<qresource prefix="/">']
+        for url in find_urls(qss):
+            source = url if os.path.isabs(url) else os.path.join(base, url)
+            if not os.path.isfile(source):
+                report['missing'].append(url)
+                continue
+            alias = '/'.join(p for p in os.path.normpath(url).split(os.sep) if not p in ('', '.', '..'))
+            target = os.path.join(tmp_dir, f"{len(aliases)}{os.path.splitext(url)[1]}")
+            prepare_image(source, target, max_size, recompress)
+            report['size_before'] += os.path.getsize(source)
+            report['size_after'] += os.path.getsize(target)
+            aliases[url] = alias
+            # pyrcc5 wants paths relative to the qrc file
+            lines.append(f'<file alias="{escape(alias)}">{os.path.basename(target)}</file>')
+        lines.extend(['</qresource>', '</RCC>'])
+        if aliases:
+            qrc_file = os.path.join(tmp_dir, f"{name}.qrc")
+            with open(qrc_file, 'w') as file:
+                file.write('\n'.join(lines) + '\n')
+            write_rcc(report['rcc_file'], *run_pyrcc(qrc_file))
+        else:
+            # pyrcc5 refuses an empty resource file
+            report['rcc_file'] = None
+
+    def replace(match):
+        url = match.group(2).strip()
+        if url in aliases:
+            return f'url(":/{aliases[url]}")'
+        return match.group(0)
+    style_compiler.write_atomic(report['qss_file'], URL.sub(replace, qss))
+    report['images'] = len(aliases)
+    return report
+
+def format_report(report):
+    if report['rcc_file'] is None:
+        text = f"No images found, stylesheet written to {report['qss_file']}"
+    else:
+        text = (f"Packed {report['images']} images ({report['size_before'] / 1024:.1f} KB -> "
+                f"{report['size_after'] / 1024:.1f} KB) into {report['rcc_file']}, "
+                f"stylesheet written to {report['qss_file']}")
+    if report['missing']:
+        text += f"\nNot found: {', '.join(report['missing'])}"
+    return text
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack the images of a stylesheet into a Qt resource file")
+    parser.add_argument('style', help="style folder with a compiled stylesheet")
+    parser.add_argument('--base', default=os.getcwd(), help="folder the url() paths are relative to")
+    parser.add_argument('--max-size', type=int, help="scale images down to at most this many pixels")
+    parser.add_argument('--recompress', action='store_true', help="save png images with the highest compression")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(theme_paths(args.style)['qss_file']):
+        print(f"Could not find {theme_paths(args.style)['qss_file']} - compile the stylesheet first")
+        return 1
+    try:
+        report = bundle(args.style, base=args.base, max_size=args.max_size, recompress=args.recompress)
+    except OSError as error:
+        print(f"Could not create the resource file: {error}")
+        return 1
+    print(format_report(report))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Finds the rules of a stylesheet that never match a widget of an
+# application. Every widget partial is compiled on its own so each rule is
+# known to come from its widgets/*.scss file, then every selector is matched
+# against the widget trees of the loaded ui files:
+#   type       QPushButton matches subclasses too, .QPushButton only the class
+#   #name      the objectName
+#   [prop=val] static properties are compared, a property that is not set in
+#              the ui may still be set by the application, so it is 'unknown'
+#   :state and ::sub-control are runtime states and are not checked
+# Rules for widgets that only exist at runtime (tooltips, dialogs) are never
+# reported as dead. A pruned sheet keeps everything that is not dead.
+#
+# Usage: rule_profiler.py style file.ui [file.ui ...] [--prune FILE]
+
+import os
+import re
+import sys
+import argparse
+
+from PyQt5 import QtWidgets
+
+import style_compiler
+from style_compiler import HEADER_QSS
+from qss_optimizer import parse_rules
+
+PIECE = re.compile(r'''\#(?P<id>[\w-]+)
+                     |\.(?P<cls>[\w-]+)
+                     |\[\s*(?P<attr>[\w-]+)\s*(?:[~|]?=\s*["']?(?P<value>[^"'\]]*)["']?\s*)?\]
+                     |::(?P<sub>[\w-]+)
+                     |:(?P<pseudo>!?[\w-]+)
+                     |(?P<type>\*|[A-Za-z_][\w-]*)''', re.VERBOSE)
+
+# widgets that are created by Qt or the application when they are needed
+RUNTIME_TYPES = {'QToolTip', 'QDialog', 'QMessageBox', 'QFileDialog', 'QInputDialog',
+                 'QColorDialog', 'QFontDialog', 'QProgressDialog', 'QMenu', 'QCompleter'}
+
+
+def split_compounds(selector):
+    # [(combinator, compound text)], the first combinator is None
+    parts = []
+    combinator = None
+    current = ''
+    depth = 0
+    for char in selector:
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        if depth == 0 and (char.isspace() or char == '>'):
+            if current:
+                parts.append((combinator, current))
+                current = ''
+                combinator = ' '
+            if char == '>':
+                combinator = '>'
+            continue
+        current += char
+    if current:
+        parts.append((combinator, current))
+    return parts
+
+def parse_compound(text):
+    compound = {'type': None, 'exact': False, 'id': None, 'attrs': [], 'sub': None, 'pseudo': []}
+    position = 0
+    while position < len(text):
+        match = PIECE.match(text, position)
+        if match is None:
+            raise ValueError(f"Cannot parse selector '{text}'")
+        if match.group('type') is not None:
+            compound['type'] = match.group('type')
+        elif match.group('cls') is not None:
+            compound['type'] = match.group('cls')
+            compound['exact'] = True
+        elif match.group('id') is not None:
+            compound['id'] = match.group('id')
+        elif match.group('attr') is not None:
+            compound['attrs'].append((match.group('attr'), match.group('value')))
+        elif match.group('sub') is not None:
+            compound['sub'] = match.group('sub')
+        else:
+            compound['pseudo'].append(match.group('pseudo'))
+        position = match.end()
+    return compound
+
+def parse_selector(selector):
+    return [(combinator, parse_compound(text)) for combinator, text in split_compounds(selector)]
+
+def property_text(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+def widget_tree(widgets):
+    # flat list of widget infos, parents are indexes into the list
+    info = []
+    for top in widgets:
+        index = {}
+        for widget in [top] + top.findChildren(QtWidgets.QWidget):
+            meta = widget.metaObject()
+            chain = set()
+            while meta is not None:
+                chain.add(meta.className())
+                meta = meta.superClass()
+            props = {}
+            meta = widget.metaObject()
+            for i in range(meta.propertyCount()):
+                prop = meta.property(i)
+                props[prop.name()] = prop.read(widget)
+            for name in widget.dynamicPropertyNames():
+                name = bytes(name).decode()
+                props[name] = widget.property(name)
+            parent = widget.parentWidget()
+            index[id(widget)] = len(info)
+            info.append({'class': widget.metaObject().className(), 'chain': chain,
+                         'name': widget.objectName(), 'props': props,
+                         'parent': index.get(id(parent)) if parent is not None else None})
+    return info
+
+def match_compound(compound, widget):
+    # True, False or None when it depends on properties set at runtime
+    kind = compound['type']
+    if kind is not None and kind != '*':
+        if compound['exact']:
+            if widget['class'] != kind: return False
+        elif not kind in widget['chain']:
+            return False
+    if compound['id'] is not None and widget['name'] != compound['id']:
+        return False
+    result = True
+    for name, value in compound['attrs']:
+        if not name in widget['props']:
+            result = None
+        elif value is not None and property_text(widget['props'][name]) != value:
+            result = None
+    return result
+
+def combine(first, second):
+    if first is False or second is False: return False
+    if first is None or second is None: return None
+    return True
+
+def match_selector(selector, info, index, position=None):
+    if position is None:
+        position = len(selector) - 1
+    result = match_compound(selector[position][1], info[index])
+    if result is False or position == 0:
+        return result
+    parent = info[index]['parent']
+    if selector[position][0] == '>':
+        if parent is None: return False
+        return combine(result, match_selector(selector, info, parent, position - 1))
+    ancestors = False
+    while parent is not None:
+        found = match_selector(selector, info, parent, position - 1)
+        if found is True:
+            ancestors = True
+            break
+        if found is None:
+            ancestors = None
+        parent = info[parent]['parent']
+    return combine(result, ancestors)
+
+def selector_status(selector, info):
+    # ('used' | 'unknown' | 'runtime' | 'dead', matches, checked)
+    parsed = parse_selector(selector)
+    key = parsed[-1][1]
+    matches = 0
+    unknown = 0
+    checked = 0
+    for index, widget in enumerate(info):
+        if key['type'] not in (None, '*') and match_compound({**key, 'attrs': [], 'id': None}, widget) is False:
+            continue
+        checked += 1
+        result = match_selector(parsed, info, index)
+        if result is True:
+            matches += 1
+        elif result is None:
+            unknown += 1
+    if matches:
+        status = 'used'
+    elif any(compound['type'] in RUNTIME_TYPES for combinator, compound in parsed):
+        status = 'runtime'
+    elif unknown:
+        status = 'unknown'
+    else:
+        status = 'dead'
+    return status, matches, checked
+
+def analyze(parts, widgets):
+    # parts is a list of (partial name, css) as from compile_parts
+    info = widget_tree(widgets)
+    rules = []
+    for part, css in parts:
+        for rule in parse_rules(css or ''):
+            entry = {'part': part or 'stylesheet', 'rule': rule, 'selectors': []}
+            if rule.raw is None:
+                for selector in rule.selectors:
+                    try:
+                        status, matches, checked = selector_status(selector, info)
+                    except ValueError:
+                        status, matches, checked = 'unknown', 0, 0
+                    entry['selectors'].append({'selector': selector, 'status': status,
+                                               'matches': matches, 'checked': checked})
+            statuses = {s['status'] for s in entry['selectors']}
+            entry['status'] = next((s for s in ('used', 'runtime', 'unknown') if s in statuses), 'dead')
+            if rule.raw is not None:
+                entry['status'] = 'used'
+            entry['matches'] = sum(s['matches'] for s in entry['selectors'])
+            entry['checked'] = sum(s['checked'] for s in entry['selectors'])
+            rules.append(entry)
+    return {'widgets': len(info), 'rules': rules}
+
+def rule_text(rule, selectors):
+    if rule.raw is not None:
+        return rule.raw + '\n'
+    block = ''.join(f"  {prop}: {value};\n" for prop, value in rule.declarations)
+    return ',\n'.join(selectors) + ' {\n' + block + '}\n'
+
+def prune(result):
+    # stylesheet without the rules and selectors that are dead
+    output = []
+    for entry in result['rules']:
+        if entry['rule'].raw is not None:
+            output.append(rule_text(entry['rule'], []))
+            continue
+        selectors = [s['selector'] for s in entry['selectors'] if s['status'] != 'dead']
+        if selectors:
+            output.append(rule_text(entry['rule'], selectors))
+    return HEADER_QSS + '\n'.join(output)
+
+def format_report(result, names=()):
+    rules = result['rules']
+    count = {status: sum(1 for r in rules if r['status'] == status)
+             for status in ('used', 'dead', 'unknown', 'runtime')}
+    lines = [f"{result['widgets']} widgets in {', '.join(names) or 'the preview'}",
+             f"{len(rules)} rules: {count['used']} used, {count['dead']} never match, "
+             f"{count['unknown']} depend on properties set at runtime, {count['runtime']} for runtime widgets",
+             '', 'Rules that never match:']
+    for entry in rules:
+        if entry['status'] != 'dead': continue
+        lines.append(f"  {entry['part']:<28} {', '.join(entry['rule'].selectors)}")
+    lines.extend(['', 'Selectors that are never matched in used rules:'])
+    for entry in rules:
+        if entry['status'] == 'dead': continue
+        for s in entry['selectors']:
+            if s['status'] == 'dead':
+                lines.append(f"  {entry['part']:<28} {s['selector']}")
+    lines.extend(['', 'Matches per used rule (widgets checked):'])
+    for entry in sorted(rules, key=lambda r: -r['checked']):
+        if entry['rule'].raw is not None or entry['status'] == 'dead': continue
+        lines.append(f"  {entry['matches']:5} ({entry['checked']:5})  {entry['part']:<28} "
+                     f"{', '.join(entry['rule'].selectors)}")
+    return '\n'.join(lines)
+
+
+class Rule_Report(QtWidgets.QDialog):
+    # shows the report, Prune writes <style>_pruned.qss
+    def __init__(self, style, result, names, parent=None):
+        super(Rule_Report, self).__init__(parent)
+        self.style = style
+        self.result = result
+        self.setWindowTitle(f"Rule usage of {os.path.basename(style)}")
+        self.resize(900, 600)
+        layout = QtWidgets.QVBoxLayout(self)
+        view = QtWidgets.QPlainTextEdit(self)
+        view.setReadOnly(True)
+        view.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        view.setPlainText(format_report(result, names))
+        layout.addWidget(view)
+        self.label = QtWidgets.QLabel(self)
+        layout.addWidget(self.label)
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close, self)
+        btn_prune = buttons.addButton("Prune", QtWidgets.QDialogButtonBox.ActionRole)
+        btn_prune.clicked.connect(self.prune)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def prune(self):
+        name = os.path.basename(os.path.normpath(self.style))
+        pruned_file = os.path.join(self.style, f"{name}_pruned.qss")
+        text = prune(self.result)
+        style_compiler.write_atomic(pruned_file, text)
+        self.label.setText(f"Wrote {pruned_file} ({len(text) / 1024:.1f} KB)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the stylesheet rules that are not used by a set of ui files")
+    parser.add_argument('style', help="style folder")
+    parser.add_argument('ui_files', nargs='+', help="ui files of the application")
+    parser.add_argument('--prune', metavar='FILE', help="write the stylesheet without the unused rules to FILE")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5 import uic
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    widgets = []
+    for ui_file in args.ui_files:
+        try:
+            widgets.append(uic.loadUi(ui_file))
+        except Exception as error:
+            print(f"Could not load {ui_file}: {error}")
+            return 1
+    result = analyze(style_compiler.compile_parts(args.style), widgets)
+    print(format_report(result, [os.path.basename(f) for f in args.ui_files]))
+    if args.prune:
+        style_compiler.write_atomic(args.prune, prune(result))
+        print(f"Wrote {args.prune}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
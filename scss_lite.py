@@ -0,0 +1,656 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Built-in compiler for the part of scss the themes use, so that most builds
+# don't need qtsass and libsass. It knows:
+#   $variable: value;          top level only, - and _ in names are the same
+#   @import 'name';            found like qtsass finds them
+#   selector { ... }           nested rules, with & for the parent selector
+#   /* comments */             kept, // comments are dropped
+#   url() rgba() qlineargradient() and + to join quoted strings
+# and gives the same text as qtsass.compile with output_style='expanded'.
+# Anything else raises Unsupported, the caller then compiles with qtsass.
+# Every file is parsed once, the parse is kept until the file changes. The
+# values are split in tokens when parsed, compiling walks the rules once and
+# puts in the variables as they are met.
+#
+# Usage: scss_lite.py file.scss [--include DIR ...]
+
+import os
+import re
+import sys
+import argparse
+
+# a declaration of only these parts is written out as it is, like libsass
+# does, anything else is evaluated
+_COMPONENT = (r"""(?:-*[A-Za-z_][\w-]*|'[^'\n]*'|"[^"\n]*"|!important"""
+              r"""|[+-]?(?:\d*\.\d+|\d+)(?:[eE][+-]?\d+)?(?:%|-*[A-Za-z_][\w-]*)?"""
+              r"""|\#(?:[0-9A-Fa-f]{8}|[0-9A-Fa-f]{6}|[0-9A-Fa-f]{3,4})(?![\w-]))""")
+STATIC = re.compile(rf"{_COMPONENT}(?:(?:[ \t]*[/,][ \t]*|[ \t]+){_COMPONENT})*")
+
+TOKEN = re.compile(r"""
+    (?P<space>\s+)
+   |(?P<string>'[^'"\\\n]*'|"[^'"\\\n]*")
+   |(?P<url>url\(\s*[^\s'"()$][^\s'"()]*\s*\))
+   |(?P<function>[A-Za-z_][\w-]*\()
+   |(?P<variable>\$[\w-]*[\w])
+   |(?P<color>\#[0-9A-Fa-f]+(?![\w-]))
+   |(?P<number>[+-]?(?:\d*\.\d+|\d+)(?![\d.])(?![eE][+-]?\d)(?:%|[A-Za-z]+)?)
+   |(?P<ident>!important|-?[A-Za-z_][\w-]*)
+   |(?P<punct>[,()+])
+""", re.X)
+NUMBER = re.compile(r'([+-]?(?:\d*\.\d+|\d+))(.*)')
+IMPORT = re.compile(r"""@import\s+(.*)""", re.S)
+IMPORT_NAME = re.compile(r"""\s*(?:'([^'\n]*)'|"([^"\n]*)")\s*(,|$)""")
+PROPERTY = re.compile(r'-?[A-Za-z_][\w-]*')
+VARIABLE = re.compile(r'\$([\w-]*\w)\s*:(.*)', re.S)
+
+# colour keywords that can be used in gradients
+COLORS = {'black': (0, 0, 0), 'silver': (192, 192, 192), 'gray': (128, 128, 128),
+          'grey': (128, 128, 128), 'white': (255, 255, 255), 'maroon': (128, 0, 0),
+          'red': (255, 0, 0), 'purple': (128, 0, 128), 'fuchsia': (255, 0, 255),
+          'magenta': (255, 0, 255), 'green': (0, 128, 0), 'lime': (0, 255, 0),
+          'olive': (128, 128, 0), 'yellow': (255, 255, 0), 'navy': (0, 0, 128),
+          'blue': (0, 0, 255), 'teal': (0, 128, 128), 'aqua': (0, 255, 255),
+          'cyan': (0, 255, 255), 'orange': (255, 165, 0)}
+
+# libsass writes rgb() colours with these values by their name
+NAMED = set("""
+000000 000080 00008b 0000cd 0000ff 006400 008000 008080 008b8b 00bfff 00ced1 00fa9a 00ff00
+00ff7f 00ffff 191970 1e90ff 20b2aa 228b22 2e8b57 2f4f4f 32cd32 3cb371 40e0d0 4169e1 4682b4
+483d8b 48d1cc 4b0082 556b2f 5f9ea0 6495ed 663399 66cdaa 696969 6a5acd 6b8e23 708090 778899
+7b68ee 7cfc00 7fff00 7fffd4 800000 800080 808000 808080 87ceeb 87cefa 8a2be2 8b0000 8b008b
+8b4513 8fbc8f 90ee90 9370db 9400d3 98fb98 9932cc 9acd32 a0522d a52a2a a9a9a9 add8e6 adff2f
+afeeee b0c4de b0e0e6 b22222 b8860b ba55d3 bc8f8f bdb76b c0c0c0 c71585 cd5c5c cd853f d2691e
+d2b48c d3d3d3 d8bfd8 da70d6 daa520 db7093 dc143c dcdcdc dda0dd deb887 e0ffff e6e6fa e9967a
+ee82ee eee8aa f08080 f0e68c f0f8ff f0fff0 f0ffff f4a460 f5deb3 f5f5dc f5f5f5 f5fffa f8f8ff
+fa8072 faebd7 faf0e6 fafad2 fdf5e6 ff0000 ff00ff ff1493 ff4500 ff6347 ff69b4 ff7f50 ff8c00
+ffa07a ffa500 ffb6c1 ffc0cb ffd700 ffdab9 ffdead ffe4b5 ffe4c4 ffe4e1 ffebcd ffefd5 fff0f5
+fff5ee fff8dc fffacd fffaf0 fffafa ffff00 ffffe0 fffff0 ffffff""".split())
+
+# path -> (mtime, size, parsed file)
+AST_CACHE = {}
+
+
+class Unsupported(ValueError):
+    pass
+
+
+# same rewrite of qlineargradient(x1: 0, ..., stop: 0 red, ...) to the
+# positional form that qtsass does before compiling, bug for bug
+GRADIENT = re.compile(
+    r'qlineargradient\('
+    r'((?:(?:\s+)?(?:x1|y1|x2|y2):(?:\s+)?[0-9A-Za-z$_\.-]+,?)+)'
+    r'((?:(?:\s+)?stop:.*,?)+(?:\s+)?)?'
+    r'\)',
+    re.MULTILINE)
+
+def conform_coords(group):
+    values = ['0', '0', '0', '0']
+    for part in group.split(','):
+        key, sep, value = part.partition(':')
+        if sep and key.strip() in ('x1', 'y1', 'x2', 'y2'):
+            values[('x1', 'y1', 'x2', 'y2').index(key.strip())] = value.strip()
+    return ', '.join(values)
+
+def conform_stops(group):
+    split = ['']
+    level = 0
+    for char in group:
+        if not level and char == ',':
+            split.append('')
+            continue
+        elif char == '(':
+            level += 1
+        elif char == ')':
+            level -= 1
+        split[-1] += char
+    stops = []
+    for part in split:
+        if part:
+            if not ':' in part:
+                raise Unsupported("qlineargradient stop without stop:")
+            stops.append(part.split(':', 1)[1].strip())
+    return ', '.join(stops)
+
+def conform(text):
+    if '#{' in text:
+        raise Unsupported("interpolation")
+    if '_qnot_' in text or 'qradialgradient' in text or 'qconicalgradient' in text:
+        raise Unsupported("qradialgradient or _qnot_")
+    if not 'qlineargradient' in text:
+        return text
+    for coords, stops in GRADIENT.findall(text):
+        text = text.replace(coords, conform_coords(coords), 1)
+        if stops:
+            text = text.replace(stops, f", ({conform_stops(stops)})", 1)
+    return text
+
+
+# Parsing. A file is a list of nodes:
+#   ('comment', text)
+#   ('variable', name, value or None, tokens)
+#   ('declaration', property, text or None, tokens)
+#   ('import', [names])
+#   ('rule', [selectors], [nodes])
+# values that don't use variables are evaluated when the file is parsed
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if match is None:
+            raise Unsupported(f"can't read {text[pos:pos + 20]!r}")
+        tokens.append((match.lastgroup, match.group()))
+        pos = match.end()
+    return tokens
+
+def parse_statement(text):
+    if text.startswith('@'):
+        match = IMPORT.fullmatch(text)
+        if match is None:
+            raise Unsupported(f"{text.split()[0]} rule")
+        names = []
+        rest = match.group(1)
+        while rest:
+            name = IMPORT_NAME.match(rest)
+            if name is None:
+                raise Unsupported(f"import {rest!r}")
+            names.append(name.group(1) if name.group(1) is not None else name.group(2))
+            rest = rest[name.end():]
+            if name.group(3) == ',' and not rest.strip():
+                raise Unsupported("empty import")
+        return ('import', names)
+    if ':!' in text:
+        raise Unsupported("! in a value")
+    if text.startswith('$'):
+        match = VARIABLE.fullmatch(text)
+        if match is None:
+            raise Unsupported(f"variable {text!r}")
+        tokens = tokenize(match.group(2).strip())
+        if any(kind == 'variable' for kind, token in tokens):
+            return ('variable', match.group(1).replace('_', '-'), None, tokens)
+        return ('variable', match.group(1).replace('_', '-'), Expression(tokens, {}).evaluate(), None)
+    name, sep, value = text.partition(':')
+    name = name.strip()
+    value = value.strip()
+    if not sep or not value or PROPERTY.fullmatch(name) is None:
+        raise Unsupported(f"declaration {text!r}")
+    if STATIC.fullmatch(value) is not None:
+        return ('declaration', name, value, None)
+    tokens = tokenize(value)
+    if any(kind == 'variable' for kind, token in tokens):
+        return ('declaration', name, None, tokens)
+    return ('declaration', name, to_text(Expression(tokens, {}).evaluate()), None)
+
+def parse(text):
+    text = conform(text)
+    root = []
+    stack = [root]
+    statement = ''
+    level = 0
+    pos = 0
+    end = len(text)
+    while pos < end:
+        char = text[pos]
+        if char == '"' or char == "'":
+            close = text.find(char, pos + 1)
+            if close < 0 or '\n' in text[pos:close]:
+                raise Unsupported("unclosed string")
+            statement += text[pos:close + 1]
+            pos = close + 1
+            continue
+        if char == '/' and text.startswith('/*', pos):
+            close = text.find('*/', pos + 2)
+            if close < 0:
+                raise Unsupported("unclosed comment")
+            if statement.strip():
+                raise Unsupported("comment inside a statement")
+            statement = ''
+            stack[-1].append(('comment', text[pos:close + 2]))
+            pos = close + 2
+            continue
+        if char == '/' and text.startswith('//', pos):
+            close = text.find('\n', pos)
+            pos = end if close < 0 else close
+            continue
+        if char == '(':
+            # url(a//b.png) is not a comment
+            if statement.endswith('url') and not text[pos + 1:pos + 2] in ('"', "'"):
+                close = text.find(')', pos)
+                if close < 0:
+                    raise Unsupported("unclosed url")
+                statement += text[pos:close + 1]
+                pos = close + 1
+                continue
+            level += 1
+        elif char == ')':
+            level -= 1
+        elif level == 0 and char in '{;}':
+            text_ = statement.strip()
+            statement = ''
+            if char == '{':
+                if not text_ or text_.startswith('@') or text_.endswith(':'):
+                    raise Unsupported(f"block {text_!r}")
+                node = ('rule', split_selector(text_), [])
+                stack[-1].append(node)
+                stack.append(node[2])
+            else:
+                if text_:
+                    stack[-1].append(parse_statement(text_))
+                if char == '}':
+                    if len(stack) == 1:
+                        raise Unsupported("unmatched }")
+                    stack.pop()
+            pos += 1
+            continue
+        statement += char
+        pos += 1
+    if statement.strip() or len(stack) > 1 or level:
+        raise Unsupported("unexpected end of file")
+    return root
+
+def parse_file(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = AST_CACHE.get(path)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    with open(path, 'r') as file:
+        nodes = parse(file.read())
+    AST_CACHE[path] = (stat.st_mtime_ns, stat.st_size, nodes)
+    return nodes
+
+def find_import(name, include_paths):
+    # the same search as the qtsass importer, the working folder first
+    folder, base = os.path.split(name)
+    partial = '/'.join([folder, '_' + base]) if folder else '_' + base
+    for ext in ['', '.scss', '.css', '.sass']:
+        candidates = [name + ext, partial + ext]
+        for path in include_paths:
+            candidates.append(os.path.normpath(os.path.join(path, name + ext)))
+            candidates.append(os.path.normpath(os.path.join(path, partial + ext)))
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                if candidate.endswith(('.css', '.sass')):
+                    raise Unsupported(f"import of {candidate}")
+                return candidate
+    raise Unsupported(f"import '{name}' not found")
+
+
+# Values are ('number', value, unit), ('color', (r, g, b, a), text),
+# ('string', text, quoted) and ('list', separator, items, parentheses)
+
+def format_number(value):
+    # like libsass with a precision of 5
+    text = f"{value:.5f}".rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+def hex_color(text):
+    digits = text[1:]
+    if len(digits) == 3:
+        digits = ''.join(d * 2 for d in digits)
+    elif len(digits) != 6:
+        raise Unsupported(f"colour {text}")
+    return ('color', (int(digits[0:2], 16), int(digits[2:4], 16), int(digits[4:6], 16), 1.0), text)
+
+def to_text(value):
+    kind = value[0]
+    if kind == 'number':
+        return format_number(value[1]) + value[2]
+    if kind == 'color':
+        if value[2] is None:
+            raise Unsupported("rgb() of a named colour")
+        return value[2]
+    if kind == 'string':
+        return f'"{value[1]}"' if value[2] else value[1]
+    separator, items, parentheses = value[1:]
+    if parentheses or not items:
+        raise Unsupported("list in parentheses")
+    for item in items:
+        if item[0] == 'list' and (item[1] == ',' or separator == ','):
+            raise Unsupported("nested list")
+    return (', ' if separator == ',' else ' ').join(to_text(item) for item in items)
+
+def rgba_text(r, g, b, a, percent=False):
+    # the rgba() of qtsass, alpha as 0 - 1, 0 - 255 or a percentage
+    if percent:
+        alpha = a
+    elif a > 1.0:
+        alpha = a / 2.55
+    else:
+        alpha = a * 100
+    return f"rgba({int(r)}, {int(g)}, {int(b)}, {int(alpha)}%)"
+
+def call(name, args):
+    if name == 'url':
+        if len(args) != 1:
+            raise Unsupported("url with more than one argument")
+        return ('string', f"url({to_text(args[0])})", False)
+    if name == 'rgb':
+        if len(args) != 3 or any(arg[0] != 'number' or arg[2] or not 0 <= arg[1] <= 255 for arg in args):
+            raise Unsupported("rgb arguments")
+        rgb = tuple(int(arg[1] + 0.5) for arg in args)
+        text = '#%02x%02x%02x' % rgb
+        return ('color', rgb + (1.0,), None if text[1:] in NAMED else text)
+    if name == 'rgba':
+        if len(args) != 4 or any(arg[0] != 'number' for arg in args):
+            raise Unsupported("rgba with a colour")
+        r, g, b, a = args
+        return ('string', rgba_text(r[1], g[1], b[1], a[1], a[2] == '%'), False)
+    if name == 'qlineargradient':
+        if len(args) != 5 or any(arg[0] != 'number' for arg in args[:4]):
+            raise Unsupported("qlineargradient arguments")
+        stops = args[4]
+        if stops[0] != 'list' or stops[1] != ',':
+            raise Unsupported("qlineargradient stops")
+        texts = []
+        for stop in stops[2]:
+            if stop[0] != 'list' or len(stop[2]) != 2 or stop[2][0][0] != 'number':
+                raise Unsupported("qlineargradient stop")
+            position, color = stop[2]
+            if color[0] == 'color':
+                color = rgba_text(*color[1][:3], color[1][3])
+            elif color[0] == 'string' and not color[2]:
+                color = color[1]
+            else:
+                raise Unsupported("qlineargradient stop colour")
+            texts.append(f"stop: {float(position[1])} {color}")
+        x1, y1, x2, y2 = (float(arg[1]) for arg in args[:4])
+        return ('string', f"qlineargradient(x1: {x1}, y1: {y1}, x2: {x2}, y2: {y2}, {', '.join(texts)})", False)
+    raise Unsupported(f"function {name}()")
+
+
+class Expression():
+    # evaluates the tokens of one value with the variables in env
+    def __init__(self, tokens, env):
+        self.tokens = tokens
+        self.env = env
+        self.pos = 0
+
+    def peek(self):
+        # (kind, text) of the next token after spaces, and if there were spaces
+        pos = self.pos
+        while pos < len(self.tokens) and self.tokens[pos][0] == 'space':
+            pos += 1
+        if pos == len(self.tokens):
+            return None, None, pos > self.pos
+        return self.tokens[pos][0], self.tokens[pos][1], pos > self.pos
+
+    def take(self):
+        while self.tokens[self.pos][0] == 'space':
+            self.pos += 1
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    def evaluate(self):
+        value = self.comma_list()
+        if self.peek()[0] is not None:
+            raise Unsupported(f"unexpected {self.peek()[1]}")
+        return value
+
+    def comma_list(self):
+        items = [self.space_list()]
+        while self.peek()[1] == ',':
+            self.take()
+            items.append(self.space_list())
+        return items[0] if len(items) == 1 else ('list', ',', items, False)
+
+    def space_list(self):
+        items = [self.sum()]
+        while True:
+            kind, text, space = self.peek()
+            if kind is None or text in (',', ')'):
+                break
+            if kind == 'number' and text[0] in '+-' and not space:
+                raise Unsupported("subtraction")
+            item = self.sum()
+            items.extend(item[2] if item[0] == 'list' and item[1] == ' ' and not item[3] else [item])
+        if len(items) == 1:
+            return items[0]
+        return ('list', ' ', items, False)
+
+    def sum(self):
+        value = self.primary()
+        while self.peek()[1] == '+':
+            self.take()
+            right = self.primary()
+            if value[0] != 'string' or not value[2] or right[0] != 'string':
+                raise Unsupported("+ that is not joining strings")
+            value = ('string', value[1] + right[1], True)
+        return value
+
+    def primary(self):
+        kind, text, space = self.peek()
+        if kind is None:
+            raise Unsupported("missing value")
+        self.take()
+        if kind == 'string':
+            return ('string', text[1:-1], True)
+        if kind == 'url':
+            return ('string', 'url(' + text[4:-1].strip() + ')', False)
+        if kind == 'variable':
+            name = text[1:].replace('_', '-')
+            if not name in self.env:
+                raise Unsupported(f"undefined variable {text}")
+            return self.env[name]
+        if kind == 'color':
+            return hex_color(text)
+        if kind == 'number':
+            number, unit = NUMBER.fullmatch(text).groups()
+            return ('number', float(number), unit)
+        if kind == 'ident':
+            if text in COLORS:
+                return ('color', COLORS[text] + (1.0,), text)
+            if text == 'transparent':
+                return ('color', (0, 0, 0, 0.0), text)
+            return ('string', text, False)
+        if kind == 'function':
+            args = []
+            if self.peek()[1] != ')':
+                args = self.arguments()
+            if self.peek()[1] != ')':
+                raise Unsupported(f"unclosed {text}")
+            self.take()
+            return call(text[:-1], args)
+        if text == '(':
+            value = self.comma_list()
+            if self.peek()[1] != ')':
+                raise Unsupported("unclosed (")
+            self.take()
+            if value[0] != 'list':
+                return value
+            return ('list', value[1], value[2], True)
+        raise Unsupported(f"unexpected {text}")
+
+    def arguments(self):
+        args = [self.space_list()]
+        while self.peek()[1] == ',':
+            self.take()
+            args.append(self.space_list())
+        return args
+
+
+# Selectors are lists of (selector, newline before it)
+
+def split_selector(text):
+    # a newline after a comma is kept, like libsass does
+    parts = ['']
+    depth = 0
+    for char in text:
+        if char == '[': depth += 1
+        elif char == ']': depth -= 1
+        elif char in '()\\':
+            raise Unsupported(f"selector {text!r}")
+        if char == ',' and depth == 0:
+            parts.append('')
+        else:
+            parts[-1] += char
+    selectors = []
+    for index, part in enumerate(parts):
+        stripped = part.strip()
+        if not stripped or '\n' in part[len(part.rstrip()):]:
+            raise Unsupported(f"selector {text!r}")
+        lead = part[:len(part) - len(part.lstrip())]
+        selectors.append((normalize_selector(stripped), index > 0 and '\n' in lead))
+    return selectors
+
+def normalize_selector(text):
+    out = ''
+    space = False
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if char == '[':
+            close = text.index(']', pos)
+            if any(c.isspace() for c in text[pos:close]):
+                raise Unsupported(f"selector {text!r}")
+            char = text[pos:close + 1]
+            pos = close
+        elif char.isspace():
+            space = True
+            pos += 1
+            continue
+        elif char in '>+~':
+            out = out.rstrip() + f" {char} "
+            space = False
+            pos += 1
+            continue
+        if space and not out.endswith(' '):
+            out += ' '
+        space = False
+        out += char
+        pos += 1
+    if out.startswith(' ') or out.endswith(' '):
+        raise Unsupported(f"selector {text!r}")
+    return out
+
+def nest(parents, children):
+    if any(newline for selector, newline in parents + children):
+        raise Unsupported("nested selector on more than one line")
+    selectors = []
+    for parent, newline in parents:
+        for child, newline in children:
+            if '&' in child:
+                rest = child[1:]
+                if not child.startswith('&') or '&' in rest or re.match(r'[\w-]', rest):
+                    raise Unsupported(f"selector {child!r}")
+                selectors.append((parent + rest, False))
+            else:
+                selectors.append((f"{parent} {child}", False))
+    return selectors
+
+def join_selector(selectors):
+    text = selectors[0][0]
+    for selector, newline in selectors[1:]:
+        text += (',\n' if newline else ', ') + selector
+    return text
+
+
+class Compiler():
+    def __init__(self, include_paths=()):
+        self.include_paths = list(include_paths)
+        self.env = {}
+        # ('comment', text) and ('rule', selector, lines)
+        self.output = []
+        self.imported = []
+
+    def run(self, nodes):
+        for node in nodes:
+            kind = node[0]
+            if kind == 'comment':
+                self.output.append(node)
+            elif kind == 'variable':
+                value = node[2]
+                if value is None:
+                    value = Expression(node[3], self.env).evaluate()
+                self.env[node[1]] = value
+            elif kind == 'import':
+                for name in node[1]:
+                    path = find_import(name, self.include_paths)
+                    self.imported.append(path)
+                    self.run(parse_file(path))
+            elif kind == 'rule':
+                if any('&' in selector for selector, newline in node[1]):
+                    raise Unsupported("& outside a rule")
+                self.rule(node[1], node[2])
+            else:
+                raise Unsupported("declaration outside a rule")
+
+    def rule(self, selectors, nodes):
+        lines = []
+        self.output.append(('rule', selectors, lines))
+        for node in nodes:
+            kind = node[0]
+            if kind == 'comment':
+                lines.append(node[1])
+            elif kind == 'declaration':
+                value = node[2]
+                if value is None:
+                    value = to_text(Expression(node[3], self.env).evaluate())
+                lines.append(f"{node[1]}: {value};")
+            elif kind == 'rule':
+                self.rule(nest(selectors, node[1]), node[2])
+            else:
+                raise Unsupported(f"{kind} inside a rule")
+
+    def css(self):
+        text = []
+        previous = None
+        for item in self.output:
+            if item[0] == 'rule':
+                if not item[2]: continue
+                if previous == 'rule':
+                    text.append('\n')
+                text.append(join_selector(item[1]) + ' {\n')
+                text.extend(f"  {line}\n" for line in item[2])
+                text.append('}\n')
+            else:
+                if previous == 'rule':
+                    text.append('\n')
+                text.append(item[1] + '\n')
+            previous = item[0]
+        return ''.join(text)
+
+
+def compile(string, include_paths=(), output_style='expanded'):
+    # same arguments as qtsass.compile
+    if output_style != 'expanded':
+        raise Unsupported(f"output style {output_style}")
+    compiler = Compiler(include_paths)
+    compiler.run(parse(string))
+    return compiler.css()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a theme scss file with the built-in compiler")
+    parser.add_argument('scss_file', help="file to compile")
+    parser.add_argument('--include', action='append', metavar='DIR', help="folder to look for imports, the folder of the file by default")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.scss_file, 'r') as file:
+            text = file.read()
+    except OSError as error:
+        print(f"Could not read {args.scss_file}: {error}", file=sys.stderr)
+        return 1
+    include_paths = args.include or [os.path.dirname(os.path.abspath(args.scss_file))]
+    try:
+        sys.stdout.write(compile(text, include_paths))
+    except Unsupported as error:
+        print(f"Needs qtsass: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
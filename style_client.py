@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Applies the stylesheets served by style_server.py to a running PyQt
+# application. This file only needs PyQt5 and can be copied next to the
+# application, add this after the stylesheet has been loaded:
+#   import style_client
+#   client = style_client.attach(app, 'carbonite')
+# Every version the designer compiles is applied to app (or to any widget)
+# until the application exits. When the designer is not running nothing
+# happens, the client keeps trying to connect every few seconds.
+# Run on its own it is a stand-in client that prints what it receives.
+#
+# Usage: style_client.py theme [--name NAME] [--count N]
+
+import sys
+import json
+import time
+import argparse
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtNetwork import QLocalSocket
+
+SERVER_NAME = 'qt_style_designer'
+RETRY = 3000
+
+
+def apply_diff(text, diff):
+    # diff as made by style_server.make_diff
+    lines = text.splitlines(keepends=True)
+    for first, last, new_text in reversed(diff):
+        lines[first:last] = [new_text] if new_text else []
+    return ''.join(lines)
+
+
+class Style_Client(QtCore.QObject):
+    # theme, new stylesheet, number of lines that changed
+    sheet_changed = pyqtSignal(str, str, int)
+
+    def __init__(self, theme, target=None, name=SERVER_NAME, parent=None):
+        super(Style_Client, self).__init__(parent)
+        self.theme = theme
+        self.target = target
+        self.name = name
+        self.text = None
+        self.version = None
+        self.apply_time = 0
+        self.buffer = b''
+        self.socket = QLocalSocket(self)
+        self.socket.connected.connect(lambda: self.send('subscribe'))
+        self.socket.readyRead.connect(self.read)
+        self.socket.disconnected.connect(self.retry)
+        self.socket.error.connect(self.retry)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(RETRY)
+        self.timer.timeout.connect(self.connect_server)
+        self.connect_server()
+
+    def connect_server(self):
+        if self.socket.state() == QLocalSocket.UnconnectedState:
+            self.buffer = b''
+            self.socket.connectToServer(self.name)
+
+    def retry(self, *args):
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def close(self):
+        self.timer.stop()
+        self.socket.disconnected.disconnect(self.retry)
+        self.socket.error.disconnect(self.retry)
+        self.socket.disconnectFromServer()
+
+    def send(self, command):
+        message = {'command': command, 'theme': self.theme}
+        self.socket.write(json.dumps(message).encode('utf-8') + b'\n')
+        self.socket.flush()
+
+    def read(self):
+        self.buffer += bytes(self.socket.readAll())
+        *lines, self.buffer = self.buffer.split(b'\n')
+        for line in lines:
+            if not line.strip(): continue
+            try:
+                self.handle(json.loads(line))
+            except ValueError as error:
+                print(f"Style client: bad message from the server - {error}")
+
+    def handle(self, message):
+        if message.get('error') is not None:
+            print(f"Style client: {message['error']}")
+            return
+        if message.get('theme') != self.theme: return
+        if 'qss' in message:
+            text = message['qss']
+            changed = len(text.splitlines())
+        elif message.get('base') == self.version and self.text is not None:
+            text = apply_diff(self.text, message['diff'])
+            changed = sum(new.count('\n') + last - first for first, last, new in message['diff'])
+        else:
+            # missed a version, ask for the whole sheet
+            self.send('get')
+            return
+        self.text = text
+        self.version = message['version']
+        if self.target is not None:
+            start = time.perf_counter()
+            self.target.setStyleSheet(text)
+            self.apply_time = time.perf_counter() - start
+        self.sheet_changed.emit(self.theme, text, changed)
+
+
+def attach(target, theme, name=SERVER_NAME):
+    # keep the stylesheet of target (an application or a widget) up to date
+    return Style_Client(theme, target, name, target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in client that applies the stylesheets of a style server")
+    parser.add_argument('theme', help="theme to subscribe to")
+    parser.add_argument('--name', default=SERVER_NAME, help="name of the local socket")
+    parser.add_argument('--count', type=int, default=0, help="exit after this many stylesheets, 0 runs until killed")
+    args = parser.parse_args(argv)
+
+    from PyQt5 import QtWidgets
+    app = QtWidgets.QApplication(sys.argv[:1])
+    window = QtWidgets.QMainWindow()
+    window.setCentralWidget(QtWidgets.QPushButton("Stand-in client"))
+    window.show()
+    client = attach(app, args.theme, args.name)
+    received = []
+    def changed(theme, text, lines):
+        received.append(client.version)
+        print(f"{theme} version {client.version}: {lines} lines changed, {len(text)} bytes, "
+              f"applied in {client.apply_time * 1000:.1f} ms", flush=True)
+        if args.count and len(received) >= args.count:
+            app.quit()
+    client.sheet_changed.connect(changed)
+    return app.exec_()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Headless version of the Create Variables / Compile Stylesheet actions.
+# Usage: style_compiler.py [style ...] [--root DIR] [--jobs N] [--optimize] [--qtsass]
+# With no styles given, every folder under root that contains a
+# <style>.json palette and a <style>.scss file is compiled.
+# Stylesheets are compiled with the built-in compiler in scss_lite.py, qtsass
+# is only used for what it doesn't know, the compressed output of --optimize
+# and with --qtsass.
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import importlib.util
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import qss_optimizer
+import scss_lite
+from instrumentation import span
+from variable_resolver import VariableResolver
+
+# qtsass (and libsass) are only imported when the first stylesheet is compiled
+# that scss_lite can't compile
+qtsass = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HEADER_SCSS = '''
+//
+//    WARNING! File created programmatically.
+//    All changes made in this file will be lost!
+//
+'''
+
+HEADER_QSS = '''
+/* 
+    WARNING! File created programmatically by qtsass.
+    All changes made in this file will be lost!
+*/
+'''
+
+# unnamed palette rows are saved as A1, A2 ...
+PLACEHOLDER = re.compile(r'A\d+$')
+IMPORT = re.compile(r"""@import\s+['"]([^'"]+)['"]\s*;""")
+ANY_IMPORT = re.compile(r'@import\b')
+
+CACHE_FILE = '.compile_cache.json'
+CACHE_VERSION = 2
+
+
+def qtsass_installed():
+    return qtsass is not None or importlib.util.find_spec('qtsass') is not None
+
+def load_qtsass():
+    global qtsass
+    if qtsass is None:
+        import qtsass as module
+        qtsass = module
+    return qtsass
+
+def compile_scss(text, style, output_style='expanded', stats=None, name=None, lite=True):
+    # the built-in compiler gives the same text as qtsass for expanded
+    # output, anything it doesn't know is compiled with qtsass. With lite
+    # False everything is compiled with qtsass.
+    include_paths = [os.path.abspath(style)]
+    if not lite:
+        reason = 'the --qtsass option'
+    elif output_style != 'expanded':
+        reason = f"{output_style} output"
+    else:
+        try:
+            with span('compile scss_lite', file=name or style):
+                return scss_lite.compile(text, include_paths, output_style)
+        except scss_lite.Unsupported as error:
+            reason = str(error)
+            if stats is not None:
+                stats.setdefault('qtsass', []).append(name or os.path.basename(os.path.normpath(style)))
+    if not qtsass_installed():
+        raise ImportError(f"qtsass is needed for {reason} - sudo apt install python3-qtsass")
+    with span('compile qtsass', file=name or style):
+        return load_qtsass().compile(text, include_paths=include_paths, output_style=output_style)
+
+def theme_paths(style):
+    name = os.path.basename(os.path.normpath(style))
+    return {'palette_file': os.path.join(style, f"{name}.json"),
+            'var_file': os.path.join(style, "_variables.scss"),
+            'scss_file': os.path.join(style, f"{name}.scss"),
+            'qss_file': os.path.join(style, f"{name}.qss"),
+            'widget_path': os.path.join(style, 'widgets')}
+
+def find_themes(root):
+    themes = []
+    for name in sorted(os.listdir(root)):
+        style = os.path.join(root, name)
+        if not os.path.isdir(style): continue
+        paths = theme_paths(style)
+        if os.path.exists(paths['palette_file']) and os.path.exists(paths['scss_file']):
+            themes.append(style)
+    return themes
+
+def load_palette(palette_file):
+    with span('load palette', file=palette_file), open(palette_file, 'r') as json_file:
+        data = json.load(json_file)
+    return data.get('palette', {}), data.get('extras', {})
+
+def extras_to_lines(extras_dict):
+    return [f'{key}={val}' for key, val in extras_dict.items()]
+
+def palette_to_scss(style, palette_dict, extras_lines, unresolved, resolver=None, skip=()):
+    # pass a resolver that is kept between calls to only re-resolve
+    # the extras affected by a change, names in skip are left out
+    with span('palette_to_scss', style=style):
+        if resolver is None:
+            resolver = VariableResolver()
+        resolver.set_palette(palette_dict)
+        resolver.set_extras(extras_lines)
+        lines = []
+        lines.append(f'// Palette variables for {style}')
+        for var, code in palette_dict.items():
+            if var == '' or PLACEHOLDER.match(var) or var in skip: continue
+            lines.append(f"${var}: {code};")
+        lines.append('// Extras')
+        lines.extend(resolver.extras_scss(skip))
+        unresolved.extend(resolver.unresolved())
+        return lines
+
+def write_scss_file(scss_file, widget_path):
+    widget_files = os.listdir(widget_path)
+    widgets = [f for f in widget_files if os.path.isfile(os.path.join(widget_path, f))]
+    with open(scss_file, 'w') as sass_file:
+        sass_file.write("@import 'variables';\n")
+        for widget in widgets:
+            wname = os.path.basename(widget)
+            wname = wname.strip('_')
+            sass_file.write(f"@import 'widgets/{wname}';\n")
+
+def find_partial(style, name):
+    folder, base = os.path.split(name)
+    if not base.endswith('.scss'):
+        base += '.scss'
+    for fname in (base, '_' + base):
+        path = os.path.join(style, folder, fname)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def parse_imports(scss_file):
+    # returns the @import names in order, or None if the file contains
+    # anything else than imports and comments
+    imports = []
+    with open(scss_file, 'r') as sass_file:
+        for line in sass_file:
+            line = line.strip()
+            if line == '' or line.startswith('//'): continue
+            match = IMPORT.fullmatch(line)
+            if match is None:
+                return None
+            imports.append(match.group(1))
+    return imports
+
+def file_hash(path, seed=b''):
+    digest = hashlib.sha1(seed)
+    with span('read file', file=path), open(path, 'rb') as file:
+        digest.update(file.read())
+    return digest.hexdigest()
+
+def partial_hash(style, path, seed=b'', seen=None):
+    # hash of a partial and of every partial it imports, None when an
+    # import can't be followed, then the partial is always compiled
+    seen = set() if seen is None else seen
+    seen.add(os.path.abspath(path))
+    digest = hashlib.sha1(seed)
+    with span('read file', file=path), open(path, 'rb') as file:
+        data = file.read()
+    digest.update(data)
+    text = data.decode('utf-8', 'replace')
+    names = IMPORT.findall(text)
+    if len(names) != len(ANY_IMPORT.findall(text)):
+        return None
+    for name in names:
+        # found the same way the compilers find them
+        try:
+            child = scss_lite.find_import(name, [os.path.abspath(style)])
+        except scss_lite.Unsupported:
+            return None
+        if os.path.abspath(child) in seen: continue
+        child_hash = partial_hash(style, child, b'', seen)
+        if child_hash is None:
+            return None
+        digest.update(child_hash.encode())
+    return digest.hexdigest()
+
+def load_cache(cache_file):
+    try:
+        with open(cache_file, 'r') as file:
+            cache = json.load(file)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'styles': {}}
+
+def read_text(path):
+    try:
+        with span('read file', file=path), open(path, 'r') as file:
+            return file.read()
+    except OSError:
+        return None
+
+def write_atomic(path, text):
+    # write to a temporary file in the same folder and rename it over the
+    # target, so readers never see a half written file
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        with span('write file', file=path), open(tmp_file, 'w') as file:
+            file.write(text)
+        os.replace(tmp_file, path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def save_cache(cache_file, cache):
+    write_atomic(cache_file, json.dumps(cache))
+
+def join_parts(parts, output_style):
+    # joining the partials gives the same text as a compile of the whole file
+    if output_style == 'compressed':
+        return ''.join(part.rstrip('\n') for part in parts) + '\n'
+    return '\n'.join(parts)
+
+def compile_theme(style, use_cache=True, stats=None, output_style='expanded', lite=True):
+    # Compile <style>.scss and return the css text. With use_cache, every
+    # imported widget partial is compiled on its own, keyed by a hash of
+    # its content and the variables file, and the results are joined in
+    # @import order. Only partials whose hash changed are recompiled.
+    parts = compile_parts(style, use_cache, stats, output_style, lite)
+    if len(parts) == 1 and parts[0][0] is None:
+        return parts[0][1]
+    return join_parts([css for name, css in parts if css], output_style)
+
+def compile_parts(style, use_cache=True, stats=None, output_style='expanded', lite=True):
+    # list of (import name, css) in @import order. When the scss file can't
+    # be split into partials the whole sheet is returned with name None.
+    paths = theme_paths(style)
+    imports = parse_imports(paths['scss_file']) if use_cache else None
+    if imports is None:
+        with open(paths['scss_file'], 'r') as sass_file:
+            text = sass_file.read()
+        return [(None, compile_scss(text, style, output_style, stats, lite=lite))]
+
+    prelude = []
+    partials = []
+    for name in imports:
+        path = find_partial(style, name)
+        if path is None:
+            raise FileNotFoundError(f"Could not find import '{name}' in {style}")
+        if os.path.abspath(path) == os.path.abspath(paths['var_file']):
+            prelude.append(name)
+        else:
+            partials.append((name, path))
+    # entries of the other compiler don't match
+    seed = hashlib.sha1(b'scss_lite' if lite else b'qtsass')
+    for name in prelude:
+        seed.update(file_hash(find_partial(style, name)).encode())
+    seed = seed.hexdigest().encode()
+
+    cache_file = os.path.join(style, CACHE_FILE)
+    cache = load_cache(cache_file)
+    cached = cache['styles'].get(output_style, {})
+    parts = {}
+    output = []
+    changed = False
+    header = ''.join(f"@import '{name}';\n" for name in prelude)
+    for name, path in partials:
+        digest = partial_hash(style, path, seed)
+        entry = cached.get(name)
+        if digest is None or entry is None or entry['hash'] != digest:
+            css = compile_scss(header + f"@import '{name}';\n", style, output_style, stats, name, lite)
+            entry = {'hash': digest, 'css': css}
+            changed = True
+            if stats is not None: stats.setdefault('compiled', []).append(name)
+        elif stats is not None:
+            stats.setdefault('cached', []).append(name)
+        parts[name] = entry
+        output.append((name, entry['css']))
+    if changed or parts.keys() != cached.keys():
+        cache['styles'][output_style] = parts
+        save_cache(cache_file, cache)
+    return output
+
+def optimize_theme(style, use_cache=True, stats=None, lite=True):
+    # compressed output with merged rules, the expanded sheet is only
+    # compiled to report the size saved and comes from the cache
+    expanded = HEADER_QSS + compile_theme(style, use_cache, lite=lite)
+    css = compile_theme(style, use_cache, stats, output_style='compressed', lite=lite)
+    css, report = qss_optimizer.optimize(css)
+    report['size_expanded'] = len(expanded)
+    report['size_after'] += len(HEADER_QSS)
+    return css, report
+
+def build_theme(style, use_cache=True, palette=None, write_qss=True, optimize=False, lite=True):
+    # palette is a (palette_dict, extras_lines) tuple taken from the editor,
+    # when it is None the palette is read from <style>.json
+    # with optimize the compressed output is passed through qss_optimizer
+    # with lite False it is compiled with qtsass only
+    name = os.path.basename(os.path.normpath(style))
+    paths = theme_paths(style)
+    result = {'style': name, 'timings': {}, 'unresolved': [], 'stats': {},
+              'variables': None, 'qss': None, 'optimized': None, 'error': None}
+    try:
+        start = time.perf_counter()
+        if palette is None:
+            palette_dict, extras_dict = load_palette(paths['palette_file'])
+            palette = (palette_dict, extras_to_lines(extras_dict))
+        unresolved = []
+        scss = palette_to_scss(name, palette[0], palette[1], unresolved)
+        text = HEADER_SCSS + '\n'.join(scss)
+        if read_text(paths['var_file']) != text:
+            write_atomic(paths['var_file'], text)
+        result['variables'] = text
+        result['unresolved'] = unresolved
+        result['timings']['variables'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if not os.path.exists(paths['scss_file']):
+            write_scss_file(paths['scss_file'], paths['widget_path'])
+        if optimize:
+            css, result['optimized'] = optimize_theme(style, use_cache, result['stats'], lite)
+            result['qss'] = HEADER_QSS + css
+        else:
+            result['qss'] = HEADER_QSS + compile_theme(style, use_cache, result['stats'], lite=lite)
+        if write_qss:
+            write_atomic(paths['qss_file'], result['qss'])
+        result['timings']['compile'] = time.perf_counter() - start
+    except Exception as error:
+        result['error'] = f"{type(error).__name__}: {error}"
+    return result
+
+def print_result(result):
+    timings = '  '.join(f"{key} {val * 1000:7.1f} ms" for key, val in result['timings'].items())
+    cached = len(result['stats'].get('cached', []))
+    compiled = len(result['stats'].get('compiled', []))
+    if cached or compiled:
+        timings += f"  ({compiled} compiled, {cached} cached)"
+    fallback = result['stats'].get('qtsass', [])
+    if fallback:
+        timings += f"  {len(fallback)} with qtsass"
+    print(f"{result['style']:<16} {timings}")
+    if result['optimized'] is not None:
+        print(f"{'':<16} optimized: {qss_optimizer.format_report(result['optimized'])}")
+    if result['unresolved']:
+        print(f"{'':<16} unresolved: {', '.join(result['unresolved'])}")
+    if result['error'] is not None:
+        print(f"{'':<16} ERROR {result['error']}")
+
+def build_all(styles, jobs, use_cache=True, optimize=False, report=print_result, lite=True):
+    # build every style, each in its own process when jobs > 1
+    results = []
+    if jobs <= 1 or len(styles) == 1:
+        for style in styles:
+            results.append(build_theme(style, use_cache, optimize=optimize, lite=lite))
+            report(results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(build_theme, style, use_cache, optimize=optimize, lite=lite) for style in styles]
+            for future in as_completed(futures):
+                results.append(future.result())
+                report(results[-1])
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile Style Designer themes without a GUI")
+    parser.add_argument('styles', nargs='*', help="style folders to compile (default: all under root)")
+    parser.add_argument('--root', default=os.getcwd(), help="folder containing the style folders")
+    parser.add_argument('--no-cache', action='store_true', help="always compile the whole stylesheet")
+    parser.add_argument('--optimize', action='store_true', help="write compressed output with merged rules")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--qtsass', action='store_true', help="compile with qtsass instead of the built-in compiler")
+    args = parser.parse_args(argv)
+
+    if (args.optimize or args.qtsass) and not qtsass_installed():
+        print("Cannot compile - qtsass is not installed")
+        print("sudo apt install python3-qtsass")
+        return 2
+    styles = [os.path.join(args.root, s) for s in args.styles] or find_themes(args.root)
+    if not styles:
+        print(f"No styles found in {args.root}")
+        return 1
+
+    start = time.perf_counter()
+    results = build_all(styles, args.jobs, use_cache=not args.no_cache, optimize=args.optimize, lite=not args.qtsass)
+    errors = [r for r in results if r['error'] is not None]
+    elapsed = time.perf_counter() - start
+    print(f"Compiled {len(results) - len(errors)} of {len(results)} styles in {elapsed:.2f} s")
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
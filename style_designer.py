@@ -12,38 +12,82 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 # GNU General Public License for more details.
 
+import time
+STARTUP_MARKS = [('start', time.perf_counter())]
+
+import io
 import os
+import re
 import sys
 import json
-
-try:
-    import qtsass
-except ImportError as e:
-    print(e)
-    print("qtsass is required to compile stylesheets")
-    print("sudo apt install python3-qtsass")
+import hashlib
+import argparse
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 from PyQt5 import QtCore, QtWidgets, uic
 from PyQt5.QtCore import QFile, Qt, pyqtSignal
-from PyQt5.QtWidgets import QLabel, QLineEdit, QColorDialog, QFileDialog, QMessageBox
-from PyQt5.QtGui import QTextCursor, QTextCharFormat, QColor
+from PyQt5.QtWidgets import QColorDialog, QFileDialog, QMessageBox
+from PyQt5.QtGui import QColor
+
+import style_compiler
+import qss_optimizer
+import rule_profiler
+import theme_index
+import resource_bundle
+import instrumentation
+import palette_history
+from instrumentation import span
+from style_compiler import HEADER_SCSS, HEADER_QSS
+from variable_resolver import VariableResolver
+from palette_model import Palette_Model, Swatch_Delegate, SWATCH, CODE, VARIABLE
+from text_search import Text_Search
+from style_server import Style_Server
+from palette_history import Palette_History, QSS_Cache
+from timing_panel import Timing_Panel
+from symbol_index import Symbol_Index, normal
 
 HERE = os.path.dirname(os.path.abspath(__file__))
+UI_CACHE = os.path.join(HERE, '__pycache__', 'style_designer_ui.py')
 
-HEADER_SCSS = '''
-//
-//    WARNING! File created programmatically.
-//    All changes made in this file will be lost!
-//
-'''
+STARTUP_MARKS.append(('imports', time.perf_counter()))
 
-HEADER_QSS = '''
-/* 
-    WARNING! File created programmatically by qtsass.
-    All changes made in this file will be lost!
-*/
-'''
+def startup_mark(name):
+    STARTUP_MARKS.append((name, time.perf_counter()))
 
+def compiled_ui(ui_file, module_file=UI_CACHE, regenerate=False):
+    # Returns the Ui_MainWindow class generated from ui_file. The generated
+    # module is kept in __pycache__ and regenerated when the mtime and the
+    # hash of the ui file no longer match the ones recorded in its header,
+    # or when it can't be loaded.
+    mtime = str(os.stat(ui_file).st_mtime_ns)
+    header = ['', '']
+    if os.path.exists(module_file) and not regenerate:
+        with open(module_file, 'r') as file:
+            header = [file.readline().split(':')[-1].strip(), file.readline().split(':')[-1].strip()]
+    if header[0] != mtime:
+        with open(ui_file, 'rb') as file:
+            digest = hashlib.sha1(file.read()).hexdigest()
+        if header[1] == digest:
+            with open(module_file, 'r') as file:
+                code = file.read().split('\n', 2)[2]
+        else:
+            buffer = io.StringIO()
+            uic.compileUi(ui_file, buffer)
+            code = buffer.getvalue()
+        os.makedirs(os.path.dirname(module_file), exist_ok=True)
+        style_compiler.write_atomic(module_file, f"# ui-mtime: {mtime}\n# ui-hash: {digest}\n{code}")
+    try:
+        spec = importlib.util.spec_from_file_location('style_designer_ui', module_file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.Ui_MainWindow
+    except (ImportError, SyntaxError, NameError, AttributeError, ValueError):
+        if regenerate:
+            raise
+        print(f"Regenerating the broken {module_file}")
+        return compiled_ui(ui_file, module_file, regenerate=True)
 
 # TabWidget pages
 EXTRAS = 0
@@ -51,65 +95,316 @@ WIDGET = 1
 VARIABLES = 2
 STYLESHEET = 3
 UNRESOLVED = 4
+SYMBOLS = 5
+# texts larger than this are shown by the lazy viewer
+LAZY_SIZE = 1 << 20
 
 class Preview_Widget(QtWidgets.QMainWindow):
+    closed = pyqtSignal(str)
+
     def __init__(self, uifile):
         super(Preview_Widget, self).__init__()
+        self.uifile = uifile
         try:
             self.instance = uic.loadUi(uifile, self)
         except AttributeError as e:
             print("Error: ", e)
-        
+        self.setWindowTitle(os.path.basename(uifile))
+
+    def closeEvent(self, event):
+        self.closed.emit(self.uifile)
+        super(Preview_Widget, self).closeEvent(event)
+
+
+class Preview_Pool(QtCore.QObject):
+    # Keeps every opened ui file loaded so that it is only built once, and
+    # keeps the stylesheet of every theme in memory. Closing a preview only
+    # hides it; opening the same file again shows the existing window.
+    # Stylesheets are only applied to the previews that are open.
+    def __init__(self, parent=None):
+        super(Preview_Pool, self).__init__(parent)
+        self.previews = {}
+        self.open_files = set()
+        self.stylesheets = {}
+
+    def open(self, uifile):
+        uifile = os.path.abspath(uifile)
+        preview = self.previews.get(uifile)
+        if preview is None:
+            preview = Preview_Widget(uifile)
+            preview.closed.connect(self.open_files.discard)
+            self.previews[uifile] = preview
+        self.open_files.add(uifile)
+        return preview
+
+    def open_previews(self):
+        return {uifile: preview for uifile, preview in self.previews.items() if uifile in self.open_files}
+
+    def close_all(self):
+        for preview in self.open_previews().values():
+            preview.close()
+        self.open_files.clear()
+
+    def clear(self):
+        # really delete the previews, when the designer exits
+        for preview in self.previews.values():
+            preview.close()
+            preview.deleteLater()
+        self.previews = {}
+        self.open_files.clear()
+
+    def set_stylesheet(self, style, text):
+        self.stylesheets[style] = (None, text)
+
+    def stylesheet(self, style):
+        # sheets read from disk are read again when the file changes,
+        # sheets compiled in the designer are kept until replaced
+        qss_file = style_compiler.theme_paths(style)['qss_file']
+        cached = self.stylesheets.get(style)
+        if cached is not None and cached[0] is None:
+            return cached[1]
+        mtime = os.path.getmtime(qss_file)
+        if cached is None or cached[0] != mtime:
+            with open(qss_file, 'r') as file:
+                cached = (mtime, file.read())
+            self.stylesheets[style] = cached
+        return cached[1]
+
+    def apply(self, text, show=True, uifile=None):
+        # returns the time in seconds each open preview took to apply the
+        # stylesheet and repolish its widgets, with show the previews that
+        # were hidden by turning the preview off are shown again. With a
+        # uifile only that preview is changed.
+        app = QtWidgets.QApplication.instance()
+        timings = {}
+        previews = self.open_previews()
+        if uifile is not None:
+            uifile = os.path.abspath(uifile)
+            previews = {uifile: previews[uifile]} if uifile in previews else {}
+        for uifile, preview in previews.items():
+            if show:
+                preview.show()
+            if preview.styleSheet() == text:
+                timings[os.path.basename(uifile)] = 0.0
+                continue
+            start = time.perf_counter()
+            with span('setStyleSheet', preview=os.path.basename(uifile)):
+                preview.setStyleSheet(text)
+                app.processEvents()
+            timings[os.path.basename(uifile)] = time.perf_counter() - start
+        return timings
+
+
+class Live_Builder(QtCore.QObject):
+    # Watches the widget files and the palette file of a style and rebuilds
+    # the stylesheet in a worker process after edits have settled. Builds
+    # that are superseded by a newer edit are cancelled or ignored.
+    build_done = pyqtSignal(dict)
+    palette_changed = pyqtSignal()
+    _done = pyqtSignal(int, dict)
+
+    def __init__(self, parent=None, delay=250):
+        super(Live_Builder, self).__init__(parent)
+        self.style = None
+        self.palette_file = None
+        self.get_palette = None
+        self.write_qss = True
+        self.optimize = False
+        self.generation = 0
+        self.future = None
+        self.pool = None
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.file_changed)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.start_build)
+        self._done.connect(self.finished)
+
+    def watch(self, style, palette_file, get_palette):
+        self.stop()
+        self.style = style
+        self.palette_file = palette_file
+        self.get_palette = get_palette
+        widget_path = os.path.join(style, 'widgets')
+        if os.path.isdir(widget_path):
+            self.watcher.addPath(widget_path)
+        self.update_files()
+
+    def update_files(self):
+        files = []
+        widget_path = os.path.join(self.style, 'widgets')
+        if os.path.isdir(widget_path):
+            files = [os.path.join(widget_path, f) for f in os.listdir(widget_path) if f.endswith('.scss')]
+        if os.path.exists(self.palette_file):
+            files.append(self.palette_file)
+        watched = set(self.watcher.files())
+        new_files = [f for f in files if not f in watched]
+        if new_files:
+            self.watcher.addPaths(new_files)
 
-class CustomLineEdit(QLineEdit):
-    line_clicked = pyqtSignal()
+    def cancel(self):
+        # drop the build that is waiting or running, its result is ignored
+        self.timer.stop()
+        self.generation += 1
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
 
-    def mouseDoubleClickEvent(self, event):
-        if event.button() == 1:
-            self.line_clicked.emit()
+    def stop(self):
+        self.cancel()
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+
+    def shutdown(self):
+        self.stop()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def file_changed(self, path):
+        # editors that save by renaming remove the file from the watcher
+        if os.path.exists(path) and not path in self.watcher.files():
+            self.watcher.addPath(path)
+        if path == self.palette_file:
+            self.palette_changed.emit()
+        self.schedule()
+
+    def directory_changed(self, path):
+        self.update_files()
+        self.schedule()
+
+    def schedule(self):
+        if self.style is None: return
+        self.generation += 1
+        if self.future is not None:
+            self.future.cancel()
+        self.timer.start()
+
+    def start_build(self):
+        if self.pool is None:
+            context = multiprocessing.get_context('spawn')
+            self.pool = ProcessPoolExecutor(max_workers=1, mp_context=context)
+        generation = self.generation
+        palette = self.get_palette() if self.get_palette is not None else None
+        try:
+            self.future = self.pool.submit(style_compiler.build_theme, self.style, True, palette,
+                                           self.write_qss, self.optimize)
+        except RuntimeError as error:
+            # the worker died, start a new one with the next build
+            self.pool.shutdown(wait=False)
+            self.pool = None
+            self.build_done.emit({'error': f"{type(error).__name__}: {error}"})
+            return
+        self.future.add_done_callback(lambda future: self.build_callback(generation, future))
+
+    # runs in the executor's thread, so hand the result over with a queued signal
+    def build_callback(self, generation, future):
+        if future.cancelled(): return
+        try:
+            result = future.result()
+        except Exception as error:
+            result = {'error': f"{type(error).__name__}: {error}"}
+        self._done.emit(generation, result)
+
+    def finished(self, generation, result):
+        if generation != self.generation: return
+        self.future = None
+        self.build_done.emit(result)
 
 
 class Create_StyleSheet(QtWidgets.QMainWindow):
     def __init__(self, style=None):
         super(Create_StyleSheet, self).__init__()
         self.style = style
-        self.preview = None
-        self.current_label = None
-        self.current_line = None
+        self.preview_pool = Preview_Pool(self)
         self.qtsass_installed = True
-        self.rows = 32
         self.palette_dict = {}
         self.extras_dict = {}
         self.data_dict = {}
         self.unresolved = []
+        self.resolver = VariableResolver()
         # file paths
         self.palette_file = None
         self.var_file = None
         self.scss_file = None
         self.qss_file = None
+        self.qss_text = None
         self.widget_path = None
         self.widget_file = ''
+        self.symbol_index = None
+        self.style_server = None
+        # snapshots of the palette, with the stylesheets compiled from them
+        self.history = Palette_History()
+        self.qss_cache = QSS_Cache()
+        self.history_index = None
+        self.history_other = None
+        self.saved_digest = None
+        # largest image size in pixels in a resource bundle, 0 keeps the size
+        self.bundle_max_size = 0
+        self.live_builder = Live_Builder(self)
+        self.live_builder.build_done.connect(self.live_build_done)
+        self.live_builder.palette_changed.connect(self.live_palette_changed)
 
-        # Load the UI file:
+        # Load the UI file, using the cached generated form if possible:
         ui_file = os.path.join(HERE, 'style_designer.ui')
+        self.instance = self
         try:
+            ui = compiled_ui(ui_file)()
+            ui.setupUi(self)
+            self.__dict__.update(ui.__dict__)
+        except (OSError, ImportError, SyntaxError, NameError, ValueError) as e:
+            print("Could not use cached UI: ", e)
             self.instance = uic.loadUi(ui_file, self)
-            self.instance.setWindowTitle("Style Designer for Qt Widgets")
         except AttributeError as e:
             print("Error: ", e)
+        self.instance.setWindowTitle("Style Designer for Qt Widgets")
+        startup_mark('load ui')
 
-        if not 'qtsass' in sys.modules:
-            self.qtsass_installed = False
+        self.qtsass_installed = style_compiler.qtsass_installed()
 
-        # connect the lineEdit signals
-        for i in range(1, self.rows+1):
-            self[f"code_A{i}"].line_clicked.connect(self.color_clicked)
-            self[f"code_A{i}"].returnPressed.connect(self.color_return)
+        # palette table
+        self.palette_model = Palette_Model(self)
+        self.tableView_palette.setModel(self.palette_model)
+        self.tableView_palette.setItemDelegate(Swatch_Delegate(self.tableView_palette))
+        self.tableView_palette.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.tableView_palette.verticalHeader().setDefaultSectionSize(30)
+        self.tableView_palette.horizontalHeader().setStretchLastSection(True)
+        self.tableView_palette.setColumnWidth(SWATCH, 80)
+        self.tableView_palette.setColumnWidth(CODE, 100)
+        self.tableView_palette.doubleClicked.connect(self.palette_clicked)
+        self.palette_model.dataChanged.connect(self.palette_edited)
+        self.palette_model.color_changed.connect(self.color_changed)
+        self.palette_model.invalid_code.connect(lambda row, code: self.statusBar.showMessage("Invalid color specification"))
+        self.palette_model.invalid_name.connect(lambda row, reason: self.statusBar.showMessage(f"Invalid variable name - {reason}"))
+        self.btn_add_color.clicked.connect(self.add_color)
+        self.btn_remove_color.clicked.connect(self.remove_color)
 
         self.TextEdit_Extras.textChanged.connect(lambda: self.led_palette.setState(True))
+        self.TextEdit_Extras.textChanged.connect(self.live_schedule)
         self.TextEdit_Widget.textChanged.connect(lambda: self.led_widget.setState(True))
-        self.lineEdit_search.textChanged.connect(self.search_text)
+        # search is run when typing pauses
+        self.text_search = Text_Search(self.TextView_Stylesheet, self)
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.search_text)
+        self.lineEdit_search.textChanged.connect(self.search_timer.start)
+        self.lineEdit_search.returnPressed.connect(self.search_next)
+        self.chk_search_regex.toggled.connect(self.search_text)
+        self.btn_search_next.clicked.connect(self.search_next)
+        self.btn_search_prev.clicked.connect(self.search_previous)
+        self.TextView_Stylesheet.textChanged.connect(self.show_search_count)
+        self.LazyView_Stylesheet.text_changed.connect(self.show_search_count)
         self.statusBar.addPermanentWidget(self.widget_edit_leds)
+        # timings of the hot paths, hidden until Show Timings is checked
+        self.timing_panel = Timing_Panel(self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.timing_panel)
+        self.timing_panel.hide()
+        self.timing_panel.message.connect(self.statusBar.showMessage)
+        self.timing_panel.visibilityChanged.connect(self.action_Timings.setChecked)
         
         # connect the widget signals
         self.action_openPalette.triggered.connect(lambda: self.load_palette())
@@ -122,13 +417,28 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         self.action_CreateVariables.triggered.connect(self.create_variables)
         self.action_CompileStylesheet.triggered.connect(self.compile_stylesheet)
         self.action_PreviewStylesheet.triggered.connect(self.preview_stylesheet)
+        self.action_ApplyTheme.triggered.connect(self.apply_theme)
+        self.action_AnalyzeRules.triggered.connect(self.analyze_rules)
+        self.action_FindThemes.triggered.connect(self.find_themes)
+        self.action_FindUsages.triggered.connect(self.find_usages)
+        self.action_GotoDefinition.triggered.connect(self.goto_definition)
+        self.action_UnusedVariables.triggered.connect(self.unused_variables)
+        self.list_symbols.itemDoubleClicked.connect(self.symbol_clicked)
+        self.action_LiveUpdate.triggered.connect(self.live_update)
+        self.action_StyleServer.triggered.connect(self.serve_stylesheets)
+        self.action_Timings.triggered.connect(self.timing_panel.setVisible)
+        self.action_BundleMaxSize.triggered.connect(self.choose_bundle_size)
+        self.action_SnapshotBack.triggered.connect(lambda: self.step_snapshot(-1))
+        self.action_SnapshotForward.triggered.connect(lambda: self.step_snapshot(1))
+        self.action_SnapshotToggle.triggered.connect(self.toggle_snapshot)
+        self.action_PreviewOnly.toggled.connect(lambda state: setattr(self.live_builder, 'write_qss', not state))
+        self.action_OptimizeOutput.toggled.connect(lambda state: setattr(self.live_builder, 'optimize', state))
         self.action_Exit.triggered.connect(self.close_program)
         self.action_help.triggered.connect(self.view_help)
 
         if self.style is not None:
-            self.palette_file = os.path.join(self.style, f"{self.style}.json")
-            self.set_paths()
-            self.load_palette(self.style)
+            self.open_style(self.style)
+        startup_mark('window setup')
 
     # this prevents menubar hovering from clearing the statusBar
     def event(self, event):
@@ -138,24 +448,245 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
 
     def preview_stylesheet(self):
         if self.action_PreviewStylesheet.isChecked():
-            file = QFile(self.qss_file)
-            if not file.open(QFile.ReadOnly):
-                self.statusBar.showMessage(f"Could not open {self.qss_file}")
-                return
-            data = file.readAll()
-            text = str(data.data(), encoding='utf-8')
-            if self.preview is None:
-                self.setStyleSheet(text)
+            if self.qss_text is None:
+                file = QFile(self.qss_file)
+                if not file.open(QFile.ReadOnly):
+                    self.statusBar.showMessage(f"Could not open {self.qss_file}")
+                    return
+                with span('read file', file=self.qss_file):
+                    data = file.readAll()
+                self.qss_text = str(data.data(), encoding='utf-8')
+            text = self.qss_text
+            if not self.preview_pool.open_files:
+                with span('setStyleSheet', preview='designer'):
+                    self.setStyleSheet(text)
             else:
-                self.preview.setStyleSheet(text)
-                self.preview.show()
+                if self.style is not None:
+                    self.preview_pool.set_stylesheet(self.style, text)
+                timings = self.preview_pool.apply(text)
+                self.show_swap_timings(self.style, timings)
         else:
-            if self.preview is None:
+            if not self.preview_pool.open_files:
                 self.setStyleSheet('')
             else:
-                self.preview.setStyleSheet('')
-                self.preview.hide()
-            
+                self.preview_pool.apply('', show=False)
+                for preview in self.preview_pool.open_previews().values():
+                    preview.hide()
+
+    def apply_theme(self):
+        # apply any theme to all open previews or to one of them without loading it
+        if not self.preview_pool.open_files:
+            self.statusBar.showMessage("Open a UI file to preview themes")
+            return
+        themes = [os.path.basename(path) for path in style_compiler.find_themes(os.curdir)
+                  if os.path.exists(style_compiler.theme_paths(path)['qss_file'])]
+        current = themes.index(self.style) if self.style in themes else 0
+        style, ok = QtWidgets.QInputDialog.getItem(self, "Apply Theme", "Theme", themes, current, False)
+        if not ok: return
+        uifile = None
+        previews = list(self.preview_pool.open_previews())
+        if len(previews) > 1:
+            names = ["All previews"] + [os.path.basename(path) for path in previews]
+            name, ok = QtWidgets.QInputDialog.getItem(self, "Apply Theme", f"Apply {style} to", names, 0, False)
+            if not ok: return
+            if name != names[0]:
+                uifile = previews[names.index(name) - 1]
+        try:
+            text = self.preview_pool.stylesheet(style)
+        except OSError as error:
+            print(error)
+            self.statusBar.showMessage(f"Could not read the stylesheet of {style}")
+            return
+        timings = self.preview_pool.apply(text, uifile=uifile)
+        self.show_swap_timings(style, timings)
+
+    def open_style(self, style):
+        self.style = style
+        self.palette_file = os.path.join(self.style, f"{self.style}.json")
+        self.set_paths()
+        self.load_palette(self.style)
+
+    def find_themes(self):
+        # search the colours of all themes in the current folder
+        dialog = theme_index.Theme_Finder(os.curdir, self.style, self)
+        dialog.theme_selected.connect(self.open_style)
+        dialog.show()
+
+    def analyze_rules(self):
+        # match the rules of the current style against the open previews
+        if self.style is None: return
+        if not self.preview_pool.open_files:
+            self.statusBar.showMessage("Open the UI files of the application to analyze")
+            return
+        try:
+            parts = style_compiler.compile_parts(self.style)
+        except Exception as error:
+            print(error)
+            self.statusBar.showMessage(f"There was an error when compiling {self.style}")
+            return
+        previews = self.preview_pool.open_previews()
+        result = rule_profiler.analyze(parts, list(previews.values()))
+        names = [os.path.basename(path) for path in previews]
+        dead = sum(1 for rule in result['rules'] if rule['status'] == 'dead')
+        self.statusBar.showMessage(f"{dead} of {len(result['rules'])} rules never match")
+        rule_profiler.Rule_Report(self.style, result, names, self).exec_()
+
+    def show_swap_timings(self, style, timings):
+        # the time of each preview is in the timings panel
+        total = sum(timings.values()) * 1000
+        target = next(iter(timings)) if len(timings) == 1 else f"{len(timings)} previews"
+        msg = f"Applied {style} to {target} in {total:.0f} ms"
+        if len(timings) > 1:
+            name = max(timings, key=timings.get)
+            msg += f", slowest {name} {timings[name] * 1000:.0f} ms"
+        self.statusBar.showMessage(msg)
+
+    def live_update(self):
+        if self.action_LiveUpdate.isChecked():
+            if self.style is None:
+                self.statusBar.showMessage("Open a palette before starting live update")
+                self.action_LiveUpdate.setChecked(False)
+                return
+            self.live_builder.watch(self.style, self.palette_file, self.live_palette)
+            self.live_builder.schedule()
+            self.statusBar.showMessage(f"Live update of {self.style} started")
+        else:
+            self.live_builder.stop()
+            self.statusBar.showMessage("Live update stopped")
+
+    def serve_stylesheets(self):
+        # running applications with a style_client get every compiled stylesheet
+        if self.action_StyleServer.isChecked():
+            self.style_server = Style_Server(os.curdir, parent=self)
+            if not self.style_server.start():
+                self.statusBar.showMessage(f"Could not start the stylesheet server - {self.style_server.error}")
+                self.style_server = None
+                self.action_StyleServer.setChecked(False)
+                return
+            self.statusBar.showMessage(f"Serving stylesheets on {self.style_server.server.fullServerName()}")
+        elif self.style_server is not None:
+            self.style_server.stop()
+            self.style_server = None
+            self.statusBar.showMessage("Stylesheet server stopped")
+
+    def publish_stylesheet(self, text):
+        # returns a note for the status bar
+        if self.style_server is None or self.style is None:
+            return ''
+        count = self.style_server.publish(os.path.basename(self.style), text)
+        return f", pushed to {count} clients" if count else ''
+
+    def live_palette(self):
+        self.update_palette_dict()
+        return (dict(self.palette_dict), self.TextEdit_Extras.toPlainText().splitlines())
+
+    def live_schedule(self):
+        if self.action_LiveUpdate.isChecked():
+            self.live_builder.schedule()
+
+    def live_palette_changed(self):
+        # the palette file was changed outside of the designer
+        if not self.led_palette.getState():
+            self.load_palette(self.style)
+
+    def live_build_done(self, result):
+        if result.get('error') is not None:
+            print(result['error'])
+            self.statusBar.showMessage(f"Live update failed - {result['error']}")
+            return
+        # the build ran in a worker process, only its timings come back
+        for key, seconds in result['timings'].items():
+            instrumentation.add(f"live {key}", seconds)
+        self.qss_text = result['qss']
+        self.show_text(self.TextView_Variables, self.LazyView_Variables, result['variables'])
+        self.TextView_Unresolved.setPlainText('\n'.join(result['unresolved']))
+        self.show_text(self.TextView_Stylesheet, self.LazyView_Stylesheet, self.qss_text)
+        if self.action_PreviewStylesheet.isChecked():
+            self.preview_stylesheet()
+        elapsed = sum(result['timings'].values()) * 1000
+        note = self.publish_stylesheet(self.qss_text)
+        self.remember_snapshot('live update', self.qss_text)
+        self.statusBar.showMessage(f"Live update of {self.style} took {elapsed:.0f} ms{note}")
+
+    def remember_snapshot(self, label, qss=None):
+        # add the palette in the editor to the history unless it is the
+        # snapshot on show, and keep qss as the stylesheet compiled from it
+        self.update_palette_dict()
+        self.update_extras_dict()
+        key = palette_history.digest(self.palette_dict, self.extras_dict)
+        if self.history_index is None or self.history.digest(self.history_index) != key:
+            index = self.history.record(self.palette_dict, self.extras_dict, label)
+            if index != self.history_index:
+                self.history_other = self.history_index
+            self.history_index = index
+        if qss is not None:
+            self.qss_cache.put(self.snapshot_key(self.history_index), qss)
+        return key
+
+    def snapshot_key(self, index):
+        # the stylesheet of a palette also depends on the widget files and
+        # on the output style
+        stamp = []
+        paths = [self.scss_file]
+        if os.path.isdir(self.widget_path):
+            paths.extend(sorted(os.path.join(self.widget_path, f) for f in os.listdir(self.widget_path)))
+        for path in paths:
+            try:
+                stamp.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                pass
+        return (self.history.digest(index), tuple(stamp), self.action_OptimizeOutput.isChecked())
+
+    def step_snapshot(self, step):
+        if self.history_index is None:
+            self.statusBar.showMessage("Open a palette to start its history")
+            return
+        # edits since the last snapshot become one, so they can be stepped back to
+        self.remember_snapshot('edited')
+        index = self.history_index + step
+        if not 0 <= index < len(self.history):
+            self.statusBar.showMessage(f"No {'earlier' if step < 0 else 'later'} snapshot")
+            return
+        self.show_snapshot(index)
+
+    def toggle_snapshot(self):
+        # switch between the last two snapshots shown
+        if self.history_index is None: return
+        self.remember_snapshot('edited')
+        if self.history_other is None:
+            self.statusBar.showMessage("Step to another snapshot to compare it with this one")
+            return
+        self.show_snapshot(self.history_other)
+
+    def show_snapshot(self, index):
+        start = time.perf_counter()
+        if index != self.history_index:
+            self.history_other = self.history_index
+        self.history_index = index
+        # a build of the palette that was in the editor would replace the snapshot
+        self.live_builder.cancel()
+        with span('show snapshot'):
+            self.palette_dict, self.extras_dict = self.history.state(index)
+            # restoring is not an edit, so don't start a live build
+            self.TextEdit_Extras.blockSignals(True)
+            self.parse_palette()
+            self.parse_extras()
+            self.TextEdit_Extras.blockSignals(False)
+            self.led_palette.setState(self.history.digest(index) != self.saved_digest)
+            qss = self.qss_cache.get(self.snapshot_key(index))
+            if qss is not None:
+                self.qss_text = qss
+                self.show_text(self.TextView_Stylesheet, self.LazyView_Stylesheet, qss)
+                if self.action_PreviewStylesheet.isChecked():
+                    self.preview_stylesheet()
+        entry = self.history.entries[index]
+        msg = f"Snapshot {index + 1} of {len(self.history)} ({entry['label']} {time.strftime('%H:%M:%S', time.localtime(entry['time']))})"
+        if qss is None:
+            msg += " - not compiled yet, compile to see it"
+        else:
+            msg += f" shown in {(time.perf_counter() - start) * 1000:.0f} ms"
+        self.statusBar.showMessage(msg)
+
     def load_palette(self, style=None):
         if style is None:
             dialog = QFileDialog(self)
@@ -176,7 +707,7 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
                 return
         # open palette file and fill in color table
         if os.path.exists(self.palette_file):
-            with open(self.palette_file, 'r') as json_file:
+            with span('load palette', file=self.palette_file), open(self.palette_file, 'r') as json_file:
                 data = json.load(json_file)
             self.palette_dict = data.get('palette')
             self.extras_dict = data.get('extras')
@@ -188,17 +719,32 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         # check for variables file
         if self.var_file is not None:
             if os.path.exists(self.var_file):
-                with open(self.var_file, 'r') as var_file:
-                    data = var_file.read()
-                self.TextView_Variables.setPlainText(data)
+                self.show_text(self.TextView_Variables, self.LazyView_Variables, path=self.var_file)
                 self.tabWidget.setCurrentIndex(EXTRAS)
         # check for qss file
         if self.qss_file is not None:
             if os.path.exists(self.qss_file):
-                with open(self.qss_file, 'r') as qss_file:
-                    data = qss_file.read()
-                self.TextView_Stylesheet.setPlainText(data)
+                # a mapped file is read by the preview when it needs it
+                self.qss_text = self.show_text(self.TextView_Stylesheet, self.LazyView_Stylesheet, path=self.qss_file)
         self.led_palette.setState(False)
+        self.saved_digest = self.remember_snapshot('opened', self.compiled_qss())
+
+    def compiled_qss(self):
+        # the qss file when it was compiled from the palette in the editor
+        # and nothing changed since, otherwise None
+        if self.qss_file is None or not os.path.exists(self.qss_file): return None
+        self.update_palette_dict()
+        extras = self.TextEdit_Extras.toPlainText().splitlines()
+        scss = style_compiler.palette_to_scss(self.style, self.palette_dict, extras, [])
+        if style_compiler.read_text(self.var_file) != HEADER_SCSS + '\n'.join(scss):
+            return None
+        sources = [self.var_file, self.scss_file]
+        if os.path.isdir(self.widget_path):
+            sources.extend(os.path.join(self.widget_path, f) for f in os.listdir(self.widget_path))
+        mtime = os.path.getmtime(self.qss_file)
+        if any(os.path.exists(path) and os.path.getmtime(path) > mtime for path in sources):
+            return None
+        return self.qss_text if self.qss_text is not None else style_compiler.read_text(self.qss_file)
 
     def load_widget(self):
         dialog = QFileDialog(self)
@@ -208,8 +754,11 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         _filter = "Widget definitions (*.scss)"
         _dir = self.widget_path
         fileName, _ =  dialog.getOpenFileName(None, caption, _dir, _filter, options=options)
-        self.widget_file = fileName
         if fileName is None: return
+        self.open_widget(fileName)
+
+    def open_widget(self, fileName):
+        self.widget_file = fileName
         if not os.path.exists(fileName):
             self.statusBar.showMessage(f"File {fileName} not found")
             return
@@ -221,28 +770,32 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         self.led_widget.setState(False)
 
     def load_uifile(self):
-        if not self.preview is None:
-            self.statusBar.showMessage("Can only open 1 UI File at a time")
-            return
         dialog = QFileDialog(self)
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
-        caption = 'Open UI file'
+        caption = 'Open UI files'
         _filter = "Qt Designer Files (*.ui)"
-        _dir = 'self.style'
-        fileName, _ =  dialog.getOpenFileName(None, caption, _dir, _filter, options=options)
-        if not fileName: return
-        try:
-            self.preview = Preview_Widget(fileName)
-            self.preview.show()
-        except Exception as error:
-            print(error)
-            self.statusBar.showMessage(f"Could not open {fileName}")
+        _dir = self.style if self.style is not None else HERE
+        fileNames, _ =  dialog.getOpenFileNames(None, caption, _dir, _filter, options=options)
+        for fileName in fileNames:
+            try:
+                preview = self.preview_pool.open(fileName)
+                preview.show()
+            except Exception as error:
+                print(error)
+                self.statusBar.showMessage(f"Could not open {fileName}")
+                continue
+        if fileNames and self.action_PreviewStylesheet.isChecked():
+            self.setStyleSheet('')
+            self.preview_stylesheet()
+        elif fileNames:
+            # a reused preview may still have the sheet it was closed with
+            self.preview_pool.apply('')
 
     def close_uifile(self):
-        if self.preview is None: return
-        self.preview.close()
-        self.preview = None
+        self.preview_pool.close_all()
+        if self.action_PreviewStylesheet.isChecked():
+            self.preview_stylesheet()
 
     def save_palette(self):
         if self.style is None: return
@@ -256,20 +809,18 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         self.update_extras_dict()
         self.data_dict = {'palette': self.palette_dict,
                           'extras': self.extras_dict}
-        with open(self.palette_file, 'w') as json_file:
+        with span('write file', file=self.palette_file), open(self.palette_file, 'w') as json_file:
             json.dump(self.data_dict, json_file, indent=4)
         self.statusBar.showMessage(f"Saved {self.palette_file}")
         self.led_palette.setState(False)
+        self.saved_digest = self.remember_snapshot('saved')
 
-    def choose_color(self):
-        color = QColorDialog.getColor()
-        color_name = color.name()
-        if isinstance(self.current_label, QLabel) \
-            and isinstance(self.current_line, QLineEdit) \
-            and color.isValid():
-            self.current_line.clear()
-            self.current_line.setText(color_name)
-            self.set_color_box(self.current_label, color_name)
+    def choose_color(self, row):
+        code = self.palette_model.color_code(row)
+        initial = QColor(code) if code else QColor('white')
+        color = QColorDialog.getColor(initial, self)
+        if color.isValid():
+            self.palette_model.setData(self.palette_model.index(row, CODE), color.name())
 
     def save_as(self):
         dialog = QFileDialog(self)
@@ -313,7 +864,10 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         if self.led_palette.getState():
             self.save_palette()
         self.unresolved = []
-        scss = self.palette_to_scss()
+        skip = ()
+        if self.action_PruneVariables.isChecked():
+            skip = {name for name, kind, path, line in self.get_symbol_index().unused()}
+        scss = self.palette_to_scss(skip)
         data = '\n'.join(str(item) for item in self.unresolved)
         self.TextView_Unresolved.setPlainText(data)
         if scss is None: return
@@ -321,17 +875,47 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         data = '\n'.join([str(item) for item in scss])
         text = HEADER_SCSS + data
         # save created variables to file
-        with open(self.var_file, 'w') as var_file:
+        with span('write file', file=self.var_file), open(self.var_file, 'w') as var_file:
             var_file.write(text)
 
-        self.TextView_Variables.setPlainText(text)
+        self.show_text(self.TextView_Variables, self.LazyView_Variables, text)
         self.lbl_var_path.setText(self.var_file)
         self.tabWidget.setCurrentIndex(VARIABLES)
-        self.statusBar.showMessage(f"Created {self.var_file}")
+        msg = f"Created {self.var_file}"
+        if skip:
+            msg += f" without {len(skip)} unused variables"
+        self.statusBar.showMessage(msg)
+
+    def bundle_resources(self, data):
+        # returns a note for the status bar
+        try:
+            report = resource_bundle.bundle(self.style, data, max_size=self.bundle_max_size or None,
+                                            recompress=self.action_BundleRecompress.isChecked())
+        except OSError as error:
+            print(f"Could not create the resource file: {error}")
+            return f", bundling resources failed - {error}"
+        print(resource_bundle.format_report(report))
+        if report['rcc_file'] is None:
+            note = ", no images to bundle"
+        else:
+            note = f", bundled {report['images']} images into {report['rcc_file']}"
+        if report['missing']:
+            note += f" ({len(report['missing'])} not found)"
+        return note
+
+    def choose_bundle_size(self):
+        size, ok = QtWidgets.QInputDialog.getInt(self, "Bundle Resources", "Largest image size in pixels (0 keeps the size)",
+                                                 self.bundle_max_size, 0, 4096)
+        if not ok: return
+        self.bundle_max_size = size
+        text = f"{size} px" if size else "unchanged"
+        self.action_BundleMaxSize.setText(f"Bundled Image Size ({text})...")
+        self.statusBar.showMessage(f"Bundled images are {'scaled to at most ' + text if size else 'kept at their size'}")
 
     def compile_stylesheet(self):
-        if not self.qtsass_installed:
-            self.statusBar.showMessage("Cannot compile - qtsass is not installed")
+        # the built-in compiler can't write compressed output
+        if self.action_OptimizeOutput.isChecked() and not self.qtsass_installed:
+            self.statusBar.showMessage("Cannot optimize - qtsass is not installed")
             return
         if self.var_file is None: return
         if not os.path.exists(self.var_file):
@@ -343,14 +927,7 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
             if not os.path.exists(self.widget_path):
                 self.statusBar.showMessage("No widgets directory found")
                 return
-            widget_files = os.listdir(self.widget_path)
-            widgets = [f for f in widget_files if os.path.isfile(os.path.join(self.widget_path, f))]
-            with open(self.scss_file, 'w') as sass_file:
-                sass_file.write("@import 'variables';\n")
-                for widget in widgets:
-                    wname = os.path.basename(widget)
-                    wname = wname.strip('_')
-                    sass_file.write(f"@import 'widgets/{wname}';\n")
+            style_compiler.write_scss_file(self.scss_file, self.widget_path)
         # check if palette needs to be saved
         if self.led_widget.getState():
             self.save_widget()
@@ -358,15 +935,40 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
             self.save_palette()
             self.create_variables()
         try:
-            qtsass.compile_filename(self.scss_file, self.qss_file, output_style='expanded')
-            with open(self.qss_file, 'r') as file:
-                data = file.read()
-            data = HEADER_QSS + data
-            with open(self.qss_file, 'w') as file:
-                file.write(data)
-            self.TextView_Stylesheet.setPlainText(data)
+            stats = {}
+            report = None
+            with span('compile stylesheet', style=self.style):
+                if self.action_OptimizeOutput.isChecked():
+                    css, report = style_compiler.optimize_theme(self.style, stats=stats)
+                else:
+                    css = style_compiler.compile_theme(self.style, stats=stats)
+            data = HEADER_QSS + css
+            self.qss_text = data
+            bundled = ''
+            if self.action_PreviewOnly.isChecked():
+                msg = "Stylesheet compiled for preview only"
+            else:
+                style_compiler.write_atomic(self.qss_file, data)
+                msg = f"Stylesheet written to {self.qss_file}"
+                if self.action_BundleResources.isChecked():
+                    bundled = self.bundle_resources(data)
+            path = None if self.action_PreviewOnly.isChecked() else self.qss_file
+            self.show_text(self.TextView_Stylesheet, self.LazyView_Stylesheet, data, path)
             self.tabWidget.setCurrentIndex(STYLESHEET)
-            self.statusBar.showMessage(f"Stylesheet written to {self.qss_file}")
+            if self.action_PreviewStylesheet.isChecked():
+                self.preview_stylesheet()
+            compiled = len(stats.get('compiled', []))
+            cached = len(stats.get('cached', []))
+            msg += f" ({compiled} compiled, {cached} cached){bundled}"
+            if report is not None:
+                msg += f" - optimized {qss_optimizer.format_report(report)}"
+            msg += self.publish_stylesheet(data)
+            self.remember_snapshot('compiled', data)
+            self.statusBar.showMessage(msg)
+        except ImportError as error:
+            # the sheet uses scss that only qtsass knows
+            print(error)
+            self.statusBar.showMessage(f"Cannot compile {self.style} - {error}")
         except Exception as error:
             print(error)
             self.statusBar.showMessage(f"There was an error when compiling {self.qss_file}")
@@ -379,8 +981,10 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         self.statusBar.showMessage("Help not yet implemented")
 
     def close_program(self):
-        if not self.preview is None:
-            self.preview.close()
+        self.preview_pool.clear()
+        self.live_builder.shutdown()
+        if self.style_server is not None:
+            self.style_server.stop()
         icon = QMessageBox.Question
         title = "Close Style_Designer"
         info = "Do you want to save unsaved files?"
@@ -398,15 +1002,8 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
             self.close()
 
     def parse_palette(self):
-        for index, (var, code) in enumerate(self.palette_dict.items()):
-            idx = index + 1
-            if var.startswith('A'):
-                var = ''
-            self[f'var_A{idx}'].setText(var)
-            self[f'code_A{idx}'].setText(code)
-            if not code == '':
-                lbl = self[f'color_A{idx}']
-                self.set_color_box(lbl, code)
+        with span('parse_palette'):
+            self.palette_model.load(self.palette_dict)
 
     def parse_extras(self):
         lines = []
@@ -414,68 +1011,55 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
             line = f'{key}={val}'
             lines.append(line)
         text = "\n".join(lines)
-        self.TextEdit_Extras.setPlainText(text)
-
-    def resolve(self, part):
-        sub = part.split()
-        for i in range(len(sub)):
-            if sub[i].startswith('$'):
-                sub[i] = sub[i].strip('$')
-                x = sub[i].strip(')')
-                x = x.strip(',')
-                if x in self.palette_dict.keys():
-                    code = self.palette_dict[x]
-                    if code.startswith('#'):
-                        sub[i] = sub[i].replace(x, code)
-                    else:
-                        self.unresolved.append(sub[i])
-                else:
-                    self.unresolved.append(sub[i])
-        line = ' '.join(sub)
-        return line
-
-    def color_return(self):
-        line = self.sender()
-        label = self['color' + line.objectName().strip('code')]
-        color = line.text()
-        if color == "" or len(color) != 7 or not color.startswith('#'):
-            self.statusBar.showMessage("Invalid color specification")
-        else:
-            self.set_color_box(label, color)
-        self.led_palette.setState(True)
+        with span('parse_extras'):
+            self.TextEdit_Extras.setPlainText(text)
 
-    def color_clicked(self):
-        line = self.sender()
-        self.current_label = self['color' + line.objectName().strip('code')]
-        self.current_line = line
-        self.choose_color()
-        self.led_palette.setState(True)
+    def palette_clicked(self, index):
+        if index.column() == SWATCH:
+            self.choose_color(index.row())
 
-    def set_color_box(self, box, color):
-        self.statusBar.showMessage(f"Set {box.objectName()} to {color}")
-        box.setStyleSheet(f"background: {color};")
+    def palette_edited(self):
         self.led_palette.setState(True)
-        
+        self.live_schedule()
+
+    def color_changed(self, row, color):
+        self.statusBar.showMessage(f"Set A{row + 1} to {color}")
+
+    def add_color(self):
+        current = self.tableView_palette.currentIndex()
+        row = current.row() + 1 if current.isValid() else self.palette_model.rowCount()
+        self.palette_model.insertRows(row, 1)
+        index = self.palette_model.index(row, VARIABLE)
+        self.tableView_palette.setCurrentIndex(index)
+        self.tableView_palette.scrollTo(index)
+        self.palette_edited()
+
+    def remove_color(self):
+        current = self.tableView_palette.currentIndex()
+        if not current.isValid(): return
+        self.palette_model.removeRows(current.row(), 1)
+        self.palette_edited()
+
     def set_paths(self):
         self.var_file = os.path.join(self.style, "_variables.scss")
         self.scss_file = os.path.join(self.style, f"{self.style}.scss")
         self.qss_file = os.path.join(self.style, f"{self.style}.qss")
+        self.qss_text = None
         self.widget_path = os.path.join(self.style, 'widgets')
+        self.symbol_index = None
+        self.history.clear()
+        self.qss_cache.clear()
+        self.history_index = None
+        self.history_other = None
         self.lbl_palette_path.setText(self.palette_file)
         self.lbl_var_path.setText(self.var_file)
         self.lbl_style_path.setText(self.qss_file)
+        if self.action_LiveUpdate.isChecked():
+            self.live_builder.watch(self.style, self.palette_file, self.live_palette)
         
     def update_palette_dict(self):
         self.palette_dict.clear()
-        for i in range(1, self.rows+1):
-            index = f'A{i}'
-            code = self[f"code_A{i}"].text()
-            var = self[f"var_A{i}"].text()
-            if not code.startswith('#'):
-                code = ''
-            if var == '':
-                var = index
-            self.palette_dict[var] = code
+        self.palette_dict.update(self.palette_model.to_dict())
         
     def update_extras_dict(self):
         self.extras_dict.clear()
@@ -494,64 +1078,209 @@ class Create_StyleSheet(QtWidgets.QMainWindow):
         msg.setStandardButtons(buttons)
         return msg.exec_()
 
-    def palette_to_scss(self):
-        lines = []
-        lines.append(f'// Palette variables for {self.style}')
-        try:
-            for i in range(1, self.rows+1):
-                var = self[f"var_A{i}"].text()
-                if var == '': continue
-                code = self[f"code_A{i}"].text()
-                lines.append(f"${var}: {code};")
-        except AttributeError as error:
-            print(error)
-            self.statusBar.showMessage("Creation of palette variables failed")
-            return None
-        lines.append('// Extras')
+    def palette_to_scss(self, skip=()):
         self.update_palette_dict()
         try:
-            text = self.TextEdit_Extras.toPlainText()
-            extras = text.splitlines()
-            for extra in extras:
-                if extra.startswith('#'): continue
-                parts = extra.split('=')
-                if len(parts) > 1:
-                    val = self.resolve(parts[1])
-                    lines.append(f'${parts[0]}: {val};')
+            extras = self.TextEdit_Extras.toPlainText().splitlines()
         except AttributeError as error:
             print(error)
             self.statusBar.showMessage("Creation of extra variables failed")
             return None
-        return lines
+        return style_compiler.palette_to_scss(self.style, self.palette_dict, extras, self.unresolved, self.resolver, skip)
+
+    def get_symbol_index(self):
+        # created when first needed, only changed files are scanned again
+        if self.symbol_index is None:
+            self.symbol_index = Symbol_Index(self.style)
+        self.symbol_index.update()
+        return self.symbol_index
+
+    def symbol_at_cursor(self):
+        widget = self.focusWidget()
+        if widget is self.tableView_palette:
+            index = self.tableView_palette.currentIndex()
+            if index.isValid():
+                return self.palette_model.entries[index.row()][0] or None
+            return None
+        if not isinstance(widget, QtWidgets.QPlainTextEdit):
+            return None
+        cursor = widget.textCursor()
+        line = cursor.block().text()
+        column = cursor.positionInBlock()
+        for match in re.finditer(r'\$?[\w-]+', line):
+            if match.start() <= column <= match.end():
+                return match.group(0).lstrip('$')
+        return None
+
+    def find_usages(self):
+        if self.style is None: return
+        name = self.symbol_at_cursor()
+        if not name:
+            self.statusBar.showMessage("Place the cursor on a variable name")
+            return
+        index = self.get_symbol_index()
+        self.list_symbols.clear()
+        for path, line, kind in index.find_definition(name):
+            self.add_symbol_item(f"{path}:{line}  defined ({kind})", path, line, name)
+        usages = index.find_usages(name)
+        for path, line, column in usages:
+            self.add_symbol_item(f"{path}:{line}  used", path, line, name)
+        self.lbl_symbols.setText(f"${name} - {len(usages)} uses")
+        self.tabWidget.setCurrentIndex(SYMBOLS)
+
+    def goto_definition(self):
+        if self.style is None: return
+        name = self.symbol_at_cursor()
+        if not name: return
+        definitions = self.get_symbol_index().find_definition(name)
+        if not definitions:
+            self.statusBar.showMessage(f"${name} is not defined")
+            return
+        path, line, kind = definitions[0]
+        self.open_location(path, line, name)
+
+    def unused_variables(self):
+        if self.style is None: return
+        index = self.get_symbol_index()
+        self.list_symbols.clear()
+        unused = index.unused()
+        undefined = index.undefined()
+        for name, kind, path, line in unused:
+            self.add_symbol_item(f"{path}:{line}  {kind} ${name} is not used", path, line, name)
+        for name, path, line in undefined:
+            self.add_symbol_item(f"{path}:{line}  ${name} is not defined", path, line, name)
+        self.lbl_symbols.setText(f"{len(unused)} unused, {len(undefined)} undefined")
+        self.tabWidget.setCurrentIndex(SYMBOLS)
+
+    def add_symbol_item(self, text, path, line, name):
+        item = QtWidgets.QListWidgetItem(text)
+        item.setData(Qt.UserRole, (path, line, name))
+        self.list_symbols.addItem(item)
+
+    def symbol_clicked(self, item):
+        self.open_location(*item.data(Qt.UserRole))
+
+    def open_location(self, path, line, name):
+        if os.path.abspath(path) == os.path.abspath(self.palette_file):
+            # palette entries are selected in the table, extras in the editor
+            for row, (var, code) in enumerate(self.palette_model.entries):
+                if normal(var) == normal(name):
+                    index = self.palette_model.index(row, VARIABLE)
+                    self.tableView_palette.setCurrentIndex(index)
+                    self.tableView_palette.scrollTo(index)
+                    self.tableView_palette.setFocus()
+                    return
+            for number, text in enumerate(self.TextEdit_Extras.toPlainText().splitlines()):
+                if normal(text.split('=')[0].strip()) == normal(name):
+                    self.tabWidget.setCurrentIndex(EXTRAS)
+                    self.goto_line(self.TextEdit_Extras, number + 1)
+                    return
+            return
+        if os.path.abspath(path) != os.path.abspath(self.widget_file or os.curdir):
+            if self.led_widget.getState():
+                self.save_widget()
+            self.open_widget(path)
+        self.tabWidget.setCurrentIndex(WIDGET)
+        self.goto_line(self.TextEdit_Widget, line)
+
+    def goto_line(self, editor, line):
+        block = editor.document().findBlockByNumber(max(line - 1, 0))
+        cursor = editor.textCursor()
+        cursor.setPosition(block.position())
+        editor.setTextCursor(cursor)
+        editor.centerCursor()
+        editor.setFocus()
+
+    def show_text(self, view, lazy, text=None, path=None):
+        # large texts go to the lazy viewer, which maps the file when there is one
+        # returns the text, or None when the file was only mapped
+        size = len(text) if text is not None else os.path.getsize(path)
+        if self.action_LazyViewer.isChecked() and size > LAZY_SIZE:
+            if path is not None:
+                lazy.open_file(path)
+            else:
+                lazy.set_text(text)
+            view.clear()
+            view.hide()
+            lazy.show()
+            return text
+        if text is None:
+            with span('read file', file=path), open(path, 'r') as file:
+                text = file.read()
+        lazy.clear()
+        lazy.hide()
+        view.show()
+        with span('show text'):
+            view.setPlainText(text)
+        return text
+
+    def search_target(self):
+        # the lazy viewer searches the mapped text itself
+        if not self.LazyView_Stylesheet.isHidden():
+            return self.LazyView_Stylesheet
+        return self.text_search
 
     def search_text(self):
-        cursor = self.TextView_Stylesheet.textCursor()
-        cursor.select(QTextCursor.Document)
-        fmt = QTextCharFormat()
-        cursor.setCharFormat(fmt)
-        search_term = self.lineEdit_search.text()
-        if search_term:
-            cursor = self.TextView_Stylesheet.textCursor()
-            text = self.TextView_Stylesheet.toPlainText()
-            highlight_format = QTextCharFormat()
-            highlight_format.setBackground(QColor('yellow'))
-            cursor.setPosition(0)
-            while not cursor.isNull() and cursor.position() < len(text):
-                cursor = self.TextView_Stylesheet.document().find(search_term, cursor)
-                if cursor.hasSelection():
-                    cursor.mergeCharFormat(highlight_format)
-
-    def __getitem__(self, item):
-        return getattr(self, item)
-
-    def __setitem__(self, item, value):
-        return setattr(self, item, value)
+        self.search_timer.stop()
+        target = self.search_target()
+        with span('search_text'):
+            count = target.find(self.lineEdit_search.text(), self.chk_search_regex.isChecked())
+        self.show_search_count()
+        if target.error is not None:
+            self.statusBar.showMessage(f"Invalid regular expression - {target.error}")
+        return count
+
+    def search_next(self):
+        if self.search_timer.isActive():
+            self.search_text()
+        self.search_target().next()
+        self.show_search_count()
+
+    def search_previous(self):
+        if self.search_timer.isActive():
+            self.search_text()
+        self.search_target().previous()
+        self.show_search_count()
+
+    def show_search_count(self):
+        target = self.search_target()
+        count = target.count()
+        if not self.lineEdit_search.text():
+            self.lbl_search_count.setText('')
+        elif count == 0:
+            self.lbl_search_count.setText('no matches')
+        else:
+            self.lbl_search_count.setText(f"{target.current + 1} of {count}")
+
+
+class Startup_Profiler(QtCore.QObject):
+    # prints the startup marks when the first widget is painted
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            QtWidgets.QApplication.instance().removeEventFilter(self)
+            startup_mark('first paint')
+            start = previous = STARTUP_MARKS[0][1]
+            for name, mark in STARTUP_MARKS[1:]:
+                print(f"{name:<16} {(mark - previous) * 1000:8.1f} ms")
+                previous = mark
+            print(f"{'time to paint':<16} {(previous - start) * 1000:8.1f} ms")
+        return False
+
 
 if __name__ == '__main__':
-    app = QtWidgets.QApplication(sys.argv)
-    if len(sys.argv) == 2:
-        w = Create_StyleSheet(sys.argv[1])
-    else:
-        w = Create_StyleSheet()
+    parser = argparse.ArgumentParser(description="Style Designer for Qt Widgets")
+    parser.add_argument('style', nargs='?', help="style folder to open")
+    parser.add_argument('--profile-startup', action='store_true', help="print the time taken by each startup step")
+    parser.add_argument('--trace', metavar='FILE', help="save the timings of the session as a Chrome trace on exit")
+    args, qt_args = parser.parse_known_args()
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    startup_mark('QApplication')
+    if args.profile_startup:
+        profiler = Startup_Profiler(app)
+        app.installEventFilter(profiler)
+    if args.trace:
+        app.aboutToQuit.connect(lambda: print(f"Saved {instrumentation.RECORDER.save_trace(args.trace)} spans to {args.trace}"))
+    w = Create_StyleSheet(args.style)
     w.show()
+    startup_mark('show')
     sys.exit( app.exec_() )
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Serves the latest stylesheet of each theme to running applications over a
+# local socket (a unix socket on linux), see style_client.py for the other
+# end. Messages are single lines of json in both directions:
+#   {"command": "subscribe", "theme": "carbonite"}   send the sheet now and
+#                                                    every new version
+#   {"command": "get", "theme": "carbonite"}          send the sheet once
+#   {"command": "unsubscribe", "theme": "carbonite"}
+# The server answers with the whole sheet
+#   {"theme": "carbonite", "version": 1, "qss": "..."}
+# and pushes new versions as a diff against the previous one, a list of
+# [first line, last line, new text] replacements, when that is smaller:
+#   {"theme": "carbonite", "version": 2, "base": 1, "diff": [[10, 11, "..."]]}
+# The designer runs the server and publishes every compiled stylesheet.
+# Run on its own it serves the qss files under root and publishes them again
+# whenever they are written.
+#
+# Usage: style_server.py [root] [--name NAME]
+
+import os
+import sys
+import json
+import difflib
+import argparse
+
+from PyQt5 import QtCore
+from PyQt5.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
+
+import style_compiler
+from style_compiler import theme_paths, HEADER_QSS
+
+SERVER_NAME = 'qt_style_designer'
+
+
+def make_diff(old, new):
+    # [[first, last, text]], replacing lines first to last of old by text
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [[i1, i2, ''.join(new_lines[j1:j2])]
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+class Style_Server(QtCore.QObject):
+    def __init__(self, root=os.curdir, watch=False, parent=None):
+        super(Style_Server, self).__init__(parent)
+        self.root = root
+        self.sheets = {}
+        self.clients = {}
+        self.error = None
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.new_connection)
+        # only used when running on its own, the designer publishes itself
+        self.watcher = None
+        if watch:
+            self.watcher = QtCore.QFileSystemWatcher(self)
+            self.watcher.fileChanged.connect(self.file_changed)
+
+    def start(self, name=SERVER_NAME):
+        # a server that was killed leaves its socket file behind, it is only
+        # removed when nothing answers on it
+        if not self.server.listen(name):
+            if self.server.serverError() != QAbstractSocket.AddressInUseError:
+                self.error = self.server.errorString()
+                return False
+            probe = QLocalSocket()
+            probe.connectToServer(name)
+            if probe.waitForConnected(500):
+                probe.disconnectFromServer()
+                self.error = f"{name} is in use by another server"
+                return False
+            QLocalServer.removeServer(name)
+            if not self.server.listen(name):
+                self.error = self.server.errorString()
+                return False
+        return True
+
+    def stop(self):
+        for socket in list(self.clients):
+            socket.disconnectFromServer()
+        self.server.close()
+
+    def is_running(self):
+        return self.server.isListening()
+
+    def new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.clients[socket] = {'buffer': b'', 'themes': set()}
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.drop(socket))
+
+    def drop(self, socket):
+        self.clients.pop(socket, None)
+        socket.deleteLater()
+
+    def read(self, socket):
+        client = self.clients.get(socket)
+        if client is None: return
+        client['buffer'] += bytes(socket.readAll())
+        *lines, client['buffer'] = client['buffer'].split(b'\n')
+        for line in lines:
+            if not line.strip(): continue
+            try:
+                message = json.loads(line)
+                self.handle(socket, client, message.get('command'), message.get('theme'))
+            except (ValueError, AttributeError) as error:
+                self.send(socket, {'error': f"Bad message: {error}"})
+
+    def handle(self, socket, client, command, theme):
+        if command == 'unsubscribe':
+            client['themes'].discard(theme)
+            return
+        if not command in ('subscribe', 'get') or not theme:
+            self.send(socket, {'theme': theme, 'error': f"Unknown command {command}"})
+            return
+        try:
+            version, text = self.sheet(theme)
+        except (OSError, ValueError) as error:
+            self.send(socket, {'theme': theme, 'error': str(error)})
+            return
+        if command == 'subscribe':
+            client['themes'].add(theme)
+        self.send(socket, {'theme': theme, 'version': version, 'qss': text})
+
+    def send(self, socket, message):
+        socket.write(json.dumps(message).encode('utf-8') + b'\n')
+        socket.flush()
+
+    def sheet(self, theme):
+        # (version, text) of the latest stylesheet of theme
+        if not theme in self.sheets:
+            self.sheets[theme] = (1, self.load(theme))
+            if self.watcher is not None:
+                self.watcher.addPath(self.qss_file(theme))
+        return self.sheets[theme]
+
+    def qss_file(self, theme):
+        return theme_paths(os.path.join(self.root, theme))['qss_file']
+
+    def load(self, theme):
+        style = os.path.join(self.root, os.path.basename(theme))
+        if not os.path.isdir(style):
+            raise ValueError(f"No theme {theme} in {os.path.abspath(self.root)}")
+        text = style_compiler.read_text(self.qss_file(theme))
+        if text is not None:
+            return text
+        # compiled here, the parsed partials are kept for the next one
+        try:
+            return HEADER_QSS + style_compiler.compile_theme(style)
+        except ImportError as error:
+            raise ValueError(f"{theme} is not compiled and {error}")
+
+    def file_changed(self, path):
+        # files written with write_atomic are replaced, so watch the new one
+        if os.path.exists(path) and not path in self.watcher.files():
+            self.watcher.addPath(path)
+        for theme in list(self.sheets):
+            if self.qss_file(theme) == path:
+                text = style_compiler.read_text(path)
+                if text is not None:
+                    self.publish(theme, text)
+
+    def publish(self, theme, text):
+        # make text the latest version of theme, returns the number of
+        # clients it was pushed to
+        previous = self.sheets.get(theme)
+        if previous is not None and previous[1] == text:
+            return 0
+        version = previous[0] + 1 if previous is not None else 1
+        self.sheets[theme] = (version, text)
+        message = {'theme': theme, 'version': version, 'qss': text}
+        if previous is not None:
+            diff = {'theme': theme, 'version': version, 'base': previous[0], 'diff': make_diff(previous[1], text)}
+            if len(json.dumps(diff)) < len(text):
+                message = diff
+        count = 0
+        for socket, client in self.clients.items():
+            if theme in client['themes']:
+                self.send(socket, message)
+                count += 1
+        return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the stylesheets of a folder of themes to running applications")
+    parser.add_argument('root', nargs='?', default=os.curdir, help="folder holding the theme folders")
+    parser.add_argument('--name', default=SERVER_NAME, help="name of the local socket")
+    args = parser.parse_args(argv)
+
+    app = QtCore.QCoreApplication(sys.argv[:1])
+    server = Style_Server(args.root, watch=True)
+    if not server.start(args.name):
+        print(f"Could not start the server: {server.error}")
+        return 1
+    print(f"Serving the themes in {os.path.abspath(args.root)} on {server.server.fullServerName()}")
+    return app.exec_()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Cross reference of the $variables of a style. The palette and extras in
+# <style>.json and every scss file of the style (except the generated
+# _variables.scss) are scanned for definitions and uses. The results are
+# kept per file in <style>/.symbol_index.json and a file is only scanned
+# again when its size or modification time changes.
+#
+# Usage: symbol_index.py style [--usages NAME] [--unused] [--undefined]
+
+import os
+import re
+import sys
+import json
+import argparse
+
+import style_compiler
+from style_compiler import PLACEHOLDER
+from variable_resolver import VARIABLE
+
+INDEX_FILE = '.symbol_index.json'
+INDEX_VERSION = 1
+DEFINITION = re.compile(r'\s*\$([A-Za-z_][\w-]*)\s*:')
+JSON_KEY = re.compile(r'\s*"((?:[^"\\]|\\.)*)"\s*:')
+
+
+def normal(name):
+    # sass treats - and _ in names as the same character
+    return name.replace('_', '-')
+
+def strip_line_comment(line):
+    # // starts a comment unless it is part of a url like http://
+    for match in re.finditer('//', line):
+        if match.start() == 0 or line[match.start() - 1] != ':':
+            return line[:match.start()]
+    return line
+
+def scan_scss(text):
+    defs = []
+    uses = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = strip_line_comment(line)
+        start = 0
+        match = DEFINITION.match(line)
+        if match is not None:
+            defs.append([match.group(1), 'scss', number])
+            start = match.end()
+        for match in VARIABLE.finditer(line, start):
+            uses.append([match.group(1), number, match.start() + 1])
+    return {'defs': defs, 'uses': uses}
+
+def scan_palette(text):
+    # line numbers are found by looking for the keys in the json text
+    data = json.loads(text)
+    lines = {'palette': {}, 'extras': {}}
+    section = None
+    for number, line in enumerate(text.splitlines(), 1):
+        match = JSON_KEY.match(line)
+        if match is None: continue
+        key = json.loads(f'"{match.group(1)}"')
+        if key in lines and line.rstrip().endswith('{'):
+            section = key
+        elif section is not None:
+            lines[section].setdefault(key, number)
+    defs = []
+    uses = []
+    for name in data.get('palette', {}):
+        if name == '' or PLACEHOLDER.match(name): continue
+        defs.append([name, 'palette', lines['palette'].get(name, 0)])
+    for key, value in data.get('extras', {}).items():
+        if key.startswith('#'): continue
+        number = lines['extras'].get(key, 0)
+        defs.append([key.strip(), 'extra', number])
+        for match in VARIABLE.finditer(value):
+            uses.append([match.group(1), number, 0, key.strip()])
+    return {'defs': defs, 'uses': uses}
+
+
+class Symbol_Index():
+    def __init__(self, style):
+        self.style = style
+        self.paths = style_compiler.theme_paths(style)
+        self.index_file = os.path.join(style, INDEX_FILE)
+        self.files = {}
+        self.definitions = {}
+        self.usages = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_file, 'r') as file:
+                data = json.load(file)
+            if data.get('version') == INDEX_VERSION:
+                self.files = data['files']
+        except (OSError, ValueError, KeyError):
+            self.files = {}
+        self.rebuild()
+
+    def save(self):
+        text = json.dumps({'version': INDEX_VERSION, 'files': self.files})
+        try:
+            style_compiler.write_atomic(self.index_file, text)
+        except OSError as error:
+            print(f"Could not save {self.index_file}: {error}")
+
+    def source_files(self):
+        files = []
+        if os.path.exists(self.paths['palette_file']):
+            files.append(self.paths['palette_file'])
+        var_file = os.path.abspath(self.paths['var_file'])
+        for folder in (self.style, self.paths['widget_path']):
+            if not os.path.isdir(folder): continue
+            for name in sorted(os.listdir(folder)):
+                path = os.path.join(folder, name)
+                if name.endswith('.scss') and os.path.isfile(path) and os.path.abspath(path) != var_file:
+                    files.append(path)
+        return files
+
+    def update(self):
+        # rescan the files that changed, returns their names
+        changed = []
+        found = set()
+        for path in self.source_files():
+            key = os.path.relpath(path, self.style)
+            found.add(key)
+            stat = os.stat(path)
+            entry = self.files.get(key)
+            if entry is not None and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                continue
+            try:
+                with open(path, 'r') as file:
+                    text = file.read()
+                if path == self.paths['palette_file']:
+                    result = scan_palette(text)
+                else:
+                    result = scan_scss(text)
+            except (OSError, ValueError) as error:
+                print(f"Could not index {path}: {error}")
+                result = {'defs': [], 'uses': []}
+            self.files[key] = {'mtime': stat.st_mtime, 'size': stat.st_size, **result}
+            changed.append(key)
+        removed = [key for key in self.files if not key in found]
+        for key in removed:
+            del self.files[key]
+        if changed or removed:
+            self.rebuild()
+            self.save()
+        return changed + removed
+
+    def rebuild(self):
+        self.definitions = {}
+        self.usages = {}
+        for key, entry in self.files.items():
+            path = os.path.join(self.style, key)
+            for name, kind, line in entry['defs']:
+                self.definitions.setdefault(normal(name), []).append((path, line, kind))
+            for use in entry['uses']:
+                self.usages.setdefault(normal(use[0]), []).append((path, use[1], use[2]))
+
+    def find_usages(self, name):
+        return self.usages.get(normal(name), [])
+
+    def find_definition(self, name):
+        # palette names win over extras, like in the variables file
+        order = {'palette': 0, 'extra': 1, 'scss': 2}
+        return sorted(self.definitions.get(normal(name), []), key=lambda d: order[d[2]])
+
+    def extra_refs(self):
+        refs = {}
+        entry = self.files.get(os.path.relpath(self.paths['palette_file'], self.style), {})
+        for use in entry.get('uses', []):
+            refs.setdefault(normal(use[3]), set()).add(normal(use[0]))
+        return refs
+
+    def used_names(self):
+        # names used by the scss files, directly or through extras
+        palette_key = os.path.relpath(self.paths['palette_file'], self.style)
+        used = set()
+        for key, entry in self.files.items():
+            if key == palette_key: continue
+            used.update(normal(use[0]) for use in entry['uses'])
+        refs = self.extra_refs()
+        pending = list(used)
+        while pending:
+            for ref in refs.get(pending.pop(), ()):
+                if not ref in used:
+                    used.add(ref)
+                    pending.append(ref)
+        return used
+
+    def unused(self):
+        # [(name, kind, path, line)] of palette entries and extras
+        used = self.used_names()
+        result = []
+        for entry in self.files.values():
+            for name, kind, line in entry['defs']:
+                if kind != 'scss' and not normal(name) in used:
+                    result.append((name, kind, self.paths['palette_file'], line))
+        return sorted(result, key=lambda r: (r[2], r[3]))
+
+    def undefined(self):
+        # [(name, path, line)] of uses in scss files without any definition
+        palette_key = os.path.relpath(self.paths['palette_file'], self.style)
+        result = []
+        for key, entry in self.files.items():
+            if key == palette_key: continue
+            for name, line, column in entry['uses']:
+                if not normal(name) in self.definitions:
+                    result.append((name, os.path.join(self.style, key), line))
+        return sorted(result, key=lambda r: (r[1], r[2]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross reference of the variables of a style")
+    parser.add_argument('style', help="style folder")
+    parser.add_argument('--usages', metavar='NAME', help="list the definition and uses of a variable")
+    parser.add_argument('--unused', action='store_true', help="list palette entries and extras that are not used")
+    parser.add_argument('--undefined', action='store_true', help="list variables that are used but not defined")
+    args = parser.parse_args(argv)
+
+    index = Symbol_Index(args.style)
+    changed = index.update()
+    print(f"Indexed {len(index.files)} files ({len(changed)} changed)")
+    if args.usages:
+        name = args.usages.lstrip('$')
+        for path, line, kind in index.find_definition(name):
+            print(f"{path}:{line}: defined ({kind})")
+        for path, line, column in index.find_usages(name):
+            print(f"{path}:{line}: used")
+    if args.unused:
+        for name, kind, path, line in index.unused():
+            print(f"{path}:{line}: {kind} ${name} is not used")
+    if args.undefined:
+        for name, path, line in index.undefined():
+            print(f"{path}:{line}: ${name} is not defined")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Search for a QPlainTextEdit. The matches are found once per search term
+# with a regular expression over the plain text and kept as sorted start
+# and end positions. Highlights are drawn as extra selections, so the
+# document itself is never changed, and only for the blocks that are
+# visible; scrolling just looks up the matches in the new range.
+
+import re
+from bisect import bisect_left, bisect_right
+
+from PyQt5 import QtCore
+from PyQt5.QtGui import QColor, QTextCursor
+from PyQt5.QtWidgets import QTextEdit
+
+
+class Text_Search(QtCore.QObject):
+    def __init__(self, view, parent=None):
+        super(Text_Search, self).__init__(parent)
+        self.view = view
+        self.text = None
+        self.pattern = None
+        self.starts = []
+        self.ends = []
+        self.current = -1
+        self.error = None
+        self.match_color = QColor('yellow')
+        self.current_color = QColor('orange')
+        view.textChanged.connect(self.text_changed)
+        view.verticalScrollBar().valueChanged.connect(self.refresh)
+        view.viewport().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Resize:
+            self.refresh()
+        return False
+
+    def text_changed(self):
+        # the index is rebuilt for the new text with the same search term
+        self.text = None
+        if self.pattern is not None:
+            self.build_index()
+            if self.starts:
+                self.current = 0
+            self.refresh()
+
+    def find(self, term, regex=False):
+        # returns the number of matches, invalid expressions give 0 and
+        # leave the reason in self.error
+        self.error = None
+        self.pattern = None
+        if term:
+            try:
+                self.pattern = re.compile(term if regex else re.escape(term), re.IGNORECASE)
+            except re.error as error:
+                self.error = str(error)
+        self.build_index()
+        if self.starts:
+            # start at the first match after the cursor
+            position = self.view.textCursor().selectionStart()
+            self.current = bisect_left(self.starts, position) % len(self.starts)
+        self.refresh()
+        return len(self.starts)
+
+    def build_index(self):
+        self.starts = []
+        self.ends = []
+        self.current = -1
+        if self.pattern is None: return
+        if self.text is None:
+            self.text = self.view.toPlainText()
+        for match in self.pattern.finditer(self.text):
+            if match.end() > match.start():
+                self.starts.append(match.start())
+                self.ends.append(match.end())
+
+    def count(self):
+        return len(self.starts)
+
+    def next(self):
+        self.move(1)
+
+    def previous(self):
+        self.move(-1)
+
+    def move(self, step):
+        if not self.starts: return
+        self.current = (self.current + step) % len(self.starts)
+        cursor = self.view.textCursor()
+        cursor.setPosition(self.starts[self.current])
+        cursor.setPosition(self.ends[self.current], QTextCursor.KeepAnchor)
+        self.view.setTextCursor(cursor)
+        self.view.centerCursor()
+        self.refresh()
+
+    def visible_range(self):
+        block = self.view.firstVisibleBlock()
+        if not block.isValid():
+            return 0, 0
+        start = block.position()
+        offset = self.view.contentOffset()
+        height = self.view.viewport().height()
+        end = start
+        while block.isValid():
+            end = block.position() + block.length()
+            if self.view.blockBoundingGeometry(block).translated(offset).bottom() >= height:
+                break
+            block = block.next()
+        return start, end
+
+    def refresh(self):
+        selections = []
+        if self.starts:
+            start, end = self.visible_range()
+            first = bisect_right(self.ends, start)
+            last = bisect_left(self.starts, end)
+            document = self.view.document()
+            for index in range(first, last):
+                selection = QTextEdit.ExtraSelection()
+                color = self.current_color if index == self.current else self.match_color
+                selection.format.setBackground(color)
+                selection.cursor = QTextCursor(document)
+                selection.cursor.setPosition(self.starts[index])
+                selection.cursor.setPosition(self.ends[index], QTextCursor.KeepAnchor)
+                selections.append(selection)
+        self.view.setExtraSelections(selections)
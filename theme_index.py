@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Index of a folder of themes for finding colours across all of them. The
+# palette, the extras and some facts about the compiled stylesheet of every
+# theme are kept in <root>/.theme_index.sqlite, a theme is only read again
+# when its palette or stylesheet file changes. Every colour is converted to
+# CIE Lab, where the distance between two colours (delta E) is close to how
+# different they look, and put in a k-d tree so that the nearest colours of
+# hundreds of themes are found without comparing them all.
+#   nearest   the themes with a colour closest to a given one
+#   similar   the themes whose palettes are closest to the palette of a theme,
+#             the mean distance from each of its colours to the nearest colour
+#             of the other theme, distances over SIMILAR_RADIUS count as that
+#
+# Usage: theme_index.py root [--near CODE] [--similar THEME] [--extra KEY] [--count N]
+
+import os
+import re
+import sys
+import math
+import time
+import heapq
+import sqlite3
+import argparse
+
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QFontDatabase, QIcon, QPixmap
+
+from style_compiler import theme_paths, find_themes, load_palette
+
+INDEX_FILE = '.theme_index.sqlite'
+INDEX_VERSION = 1
+SIMILAR_RADIUS = 15.0
+HEX_COLOR = re.compile(r'#(?:[0-9A-Fa-f]{6}|[0-9A-Fa-f]{3})\b')
+RGB_COLOR = re.compile(r'rgba?\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS themes (name TEXT PRIMARY KEY, palette_mtime REAL, palette_size INTEGER,
+    qss_mtime REAL, qss_size INTEGER, qss_rules INTEGER, colors INTEGER);
+CREATE TABLE IF NOT EXISTS colors (theme TEXT, name TEXT, kind TEXT, code TEXT, l REAL, a REAL, b REAL);
+CREATE TABLE IF NOT EXISTS extras (theme TEXT, key TEXT, value TEXT);
+CREATE INDEX IF NOT EXISTS colors_theme ON colors (theme);
+CREATE INDEX IF NOT EXISTS extras_theme ON extras (theme);
+CREATE INDEX IF NOT EXISTS extras_key ON extras (key);
+'''
+
+
+def parse_color(text):
+    # (r, g, b) of the first #rgb, #rrggbb or rgb() colour in text, or None
+    match = HEX_COLOR.search(text)
+    if match is not None:
+        code = match.group(0)[1:]
+        if len(code) == 3:
+            code = ''.join(ch * 2 for ch in code)
+        return tuple(int(code[i:i + 2], 16) for i in (0, 2, 4))
+    match = RGB_COLOR.search(text)
+    if match is not None:
+        return tuple(min(int(value), 255) for value in match.groups())
+    return None
+
+def rgb_to_lab(rgb):
+    # sRGB with the D65 white point
+    def linear(value):
+        value /= 255
+        return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+    r, g, b = (linear(value) for value in rgb)
+    x = (0.4124 * r + 0.3576 * g + 0.1805 * b) / 0.95047
+    y = (0.2126 * r + 0.7152 * g + 0.0722 * b)
+    z = (0.0193 * r + 0.1192 * g + 0.9505 * b) / 1.08883
+    def f(t):
+        return t ** (1 / 3) if t > 0.008856 else 7.787 * t + 16 / 116
+    fx, fy, fz = f(x), f(y), f(z)
+    return (116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz))
+
+def color_code(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(*rgb)
+
+
+class KD_Tree():
+    # k-d tree over points of 3 coordinates, a node is
+    # (point index, axis, left node, right node) with -1 for no node
+    def __init__(self, points):
+        self.points = points
+        self.nodes = []
+        self.root = self.build(list(range(len(points))), 0)
+
+    def build(self, indexes, axis):
+        if not indexes:
+            return -1
+        indexes.sort(key=lambda i: self.points[i][axis])
+        middle = len(indexes) // 2
+        node = len(self.nodes)
+        self.nodes.append(None)
+        left = self.build(indexes[:middle], (axis + 1) % 3)
+        right = self.build(indexes[middle + 1:], (axis + 1) % 3)
+        self.nodes[node] = (indexes[middle], axis, left, right)
+        return node
+
+    def nearest(self, point, count=1, radius=math.inf):
+        # [(distance, point index)] of the count nearest points within radius
+        if count < 1:
+            return []
+        best = []
+        limit = [radius * radius]
+        def search(node):
+            if node < 0: return
+            index, axis, left, right = self.nodes[node]
+            other = self.points[index]
+            distance = ((point[0] - other[0]) ** 2 + (point[1] - other[1]) ** 2
+                        + (point[2] - other[2]) ** 2)
+            if distance <= limit[0]:
+                if len(best) < count:
+                    heapq.heappush(best, (-distance, index))
+                else:
+                    heapq.heapreplace(best, (-distance, index))
+                if len(best) == count:
+                    limit[0] = min(limit[0], -best[0][0])
+            diff = point[axis] - other[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            search(near)
+            if diff * diff <= limit[0]:
+                search(far)
+        search(self.root)
+        return sorted((math.sqrt(-distance), index) for distance, index in best)
+
+    def within(self, point, radius):
+        # [(distance, point index)] of all points within radius
+        found = []
+        limit = radius * radius
+        def search(node):
+            if node < 0: return
+            index, axis, left, right = self.nodes[node]
+            other = self.points[index]
+            distance = ((point[0] - other[0]) ** 2 + (point[1] - other[1]) ** 2
+                        + (point[2] - other[2]) ** 2)
+            if distance <= limit:
+                found.append((math.sqrt(distance), index))
+            diff = point[axis] - other[axis]
+            if diff <= radius:
+                search(left)
+            if diff >= -radius:
+                search(right)
+        search(self.root)
+        return sorted(found)
+
+
+class Theme_Index():
+    def __init__(self, root, index_file=None):
+        self.root = root
+        self.index_file = index_file or os.path.join(root, INDEX_FILE)
+        self.db = sqlite3.connect(self.index_file)
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION:
+            self.db.executescript('DROP TABLE IF EXISTS themes; DROP TABLE IF EXISTS colors;'
+                                  'DROP TABLE IF EXISTS extras;')
+            self.db.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        self.db.executescript(SCHEMA)
+        self.tree = None
+        self.entries = []
+
+    def close(self):
+        self.db.close()
+
+    def file_state(self, path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime, stat.st_size
+        except OSError:
+            return None, None
+
+    def update(self):
+        # reindex the themes whose files changed, returns (changed, removed)
+        known = {row[0]: row[1:] for row in
+                 self.db.execute('SELECT name, palette_mtime, palette_size, qss_mtime, qss_size FROM themes')}
+        changed = []
+        found = set()
+        for style in find_themes(self.root):
+            name = os.path.basename(style)
+            found.add(name)
+            paths = theme_paths(style)
+            state = self.file_state(paths['palette_file']) + self.file_state(paths['qss_file'])
+            if known.get(name) == state: continue
+            try:
+                self.index_theme(name, paths, state)
+                changed.append(name)
+            except (OSError, ValueError) as error:
+                print(f"Could not index {name}: {error}")
+        removed = [name for name in known if not name in found]
+        for name in removed:
+            self.remove_theme(name)
+        self.db.commit()
+        if changed or removed:
+            self.tree = None
+        return changed, removed
+
+    def remove_theme(self, name):
+        for table, column in (('themes', 'name'), ('colors', 'theme'), ('extras', 'theme')):
+            self.db.execute(f'DELETE FROM {table} WHERE {column} = ?', (name,))
+
+    def index_theme(self, name, paths, state):
+        palette_dict, extras_dict = load_palette(paths['palette_file'])
+        colors = []
+        for variable, code in palette_dict.items():
+            rgb = parse_color(code or '')
+            if rgb is not None:
+                colors.append((name, variable, 'palette', color_code(rgb)) + rgb_to_lab(rgb))
+        extras = []
+        for key, value in extras_dict.items():
+            key = key.strip()
+            if key.startswith('#'): continue
+            extras.append((name, key, value.strip()))
+            # colours written straight into an extra, not through a variable
+            rgb = parse_color(value) if not '$' in value else None
+            if rgb is not None:
+                colors.append((name, key, 'extra', color_code(rgb)) + rgb_to_lab(rgb))
+        rules = None
+        if state[2] is not None:
+            with open(paths['qss_file'], 'rb') as file:
+                rules = file.read().count(b'{')
+        self.remove_theme(name)
+        self.db.execute('INSERT INTO themes VALUES (?, ?, ?, ?, ?, ?, ?)', (name,) + state + (rules, len(colors)))
+        self.db.executemany('INSERT INTO colors VALUES (?, ?, ?, ?, ?, ?, ?)', colors)
+        self.db.executemany('INSERT INTO extras VALUES (?, ?, ?)', extras)
+
+    def load_tree(self):
+        if self.tree is None:
+            rows = self.db.execute('SELECT theme, name, kind, code, l, a, b FROM colors').fetchall()
+            self.entries = [row[:4] for row in rows]
+            self.tree = KD_Tree([row[4:] for row in rows])
+        return self.tree
+
+    def result(self, distance, index):
+        theme, name, kind, code = self.entries[index]
+        return {'theme': theme, 'name': name, 'kind': kind, 'code': code, 'distance': distance}
+
+    def nearest(self, code, count=10, per_theme=True):
+        # the count colours closest to code, only the closest of each theme
+        # when per_theme is set
+        rgb = parse_color(code)
+        if rgb is None:
+            raise ValueError(f"'{code}' is not a colour")
+        tree = self.load_tree()
+        point = rgb_to_lab(rgb)
+        size = count
+        while True:
+            results = []
+            themes = set()
+            found = tree.nearest(point, size)
+            for distance, index in found:
+                theme = self.entries[index][0]
+                if per_theme and theme in themes: continue
+                themes.add(theme)
+                results.append(self.result(distance, index))
+            if len(results) >= count or len(found) < size:
+                return results[:count]
+            size *= 4
+
+    def similar(self, theme, count=10):
+        # [(theme, mean distance)] of the themes with the closest palettes
+        tree = self.load_tree()
+        own = [index for index, entry in enumerate(self.entries) if entry[0] == theme]
+        if not own:
+            raise ValueError(f"{theme} is not in the index or has no colours")
+        totals = {}
+        for index in own:
+            closest = {}
+            for distance, other in tree.within(tree.points[index], SIMILAR_RADIUS):
+                name = self.entries[other][0]
+                if name != theme and distance < closest.get(name, SIMILAR_RADIUS):
+                    closest[name] = distance
+            for name, distance in closest.items():
+                totals[name] = totals.get(name, 0) + SIMILAR_RADIUS - distance
+        # themes without any close colour are left out
+        scores = [(name, SIMILAR_RADIUS - total / len(own)) for name, total in totals.items()]
+        return sorted(scores, key=lambda s: s[1])[:count]
+
+    def with_extra(self, key):
+        return self.db.execute('SELECT theme, value FROM extras WHERE key = ? ORDER BY theme', (key.strip(),)).fetchall()
+
+    def themes(self):
+        return self.db.execute('SELECT name, colors, qss_size, qss_rules FROM themes ORDER BY name').fetchall()
+
+
+def swatch(code, size=16):
+    pixmap = QPixmap(size, size)
+    pixmap.fill(QColor(code))
+    return QIcon(pixmap)
+
+
+class Theme_Finder(QtWidgets.QDialog):
+    # find themes by colour or by palette, double click opens a theme
+    theme_selected = pyqtSignal(str)
+
+    def __init__(self, root, style=None, parent=None):
+        super(Theme_Finder, self).__init__(parent)
+        self.index = Theme_Index(root)
+        self.style = style
+        self.setWindowTitle(f"Find Themes in {os.path.abspath(root)}")
+        self.resize(500, 500)
+        layout = QtWidgets.QVBoxLayout(self)
+        row = QtWidgets.QHBoxLayout()
+        self.lineEdit_color = QtWidgets.QLineEdit('#3daee9', self)
+        self.lineEdit_color.returnPressed.connect(self.find_nearest)
+        btn_pick = QtWidgets.QPushButton("Pick", self)
+        btn_pick.clicked.connect(self.pick_color)
+        btn_find = QtWidgets.QPushButton("Nearest", self)
+        btn_find.clicked.connect(self.find_nearest)
+        btn_similar = QtWidgets.QPushButton("Similar Palettes", self)
+        btn_similar.setEnabled(style is not None)
+        btn_similar.clicked.connect(self.find_similar)
+        self.spin_count = QtWidgets.QSpinBox(self)
+        self.spin_count.setRange(1, 500)
+        self.spin_count.setValue(20)
+        for widget in (self.lineEdit_color, btn_pick, btn_find, self.spin_count, btn_similar):
+            row.addWidget(widget)
+        layout.addLayout(row)
+        self.list_results = QtWidgets.QListWidget(self)
+        self.list_results.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.list_results.itemDoubleClicked.connect(self.result_clicked)
+        layout.addWidget(self.list_results)
+        self.label = QtWidgets.QLabel(self)
+        layout.addWidget(self.label)
+        start = time.perf_counter()
+        changed, removed = self.index.update()
+        self.label.setText(f"{len(self.index.themes())} themes, {len(changed)} indexed "
+                           f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def pick_color(self):
+        color = QtWidgets.QColorDialog.getColor(QColor(self.lineEdit_color.text()), self)
+        if color.isValid():
+            self.lineEdit_color.setText(color.name())
+            self.find_nearest()
+
+    def find_nearest(self):
+        start = time.perf_counter()
+        try:
+            results = self.index.nearest(self.lineEdit_color.text(), self.spin_count.value())
+        except ValueError as error:
+            self.label.setText(str(error))
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        self.list_results.clear()
+        for r in results:
+            item = QtWidgets.QListWidgetItem(swatch(r['code']), f"{r['theme']:<24} {r['name']:<24} "
+                                             f"{r['code']}  dE {r['distance']:.1f}")
+            item.setData(Qt.UserRole, r['theme'])
+            self.list_results.addItem(item)
+        self.label.setText(f"{len(results)} themes found in {elapsed:.1f} ms")
+
+    def find_similar(self):
+        start = time.perf_counter()
+        try:
+            results = self.index.similar(self.style, self.spin_count.value())
+        except ValueError as error:
+            self.label.setText(str(error))
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        self.list_results.clear()
+        for theme, score in results:
+            item = QtWidgets.QListWidgetItem(f"{theme:<24} mean dE {score:.1f}")
+            item.setData(Qt.UserRole, theme)
+            self.list_results.addItem(item)
+        self.label.setText(f"{len(results)} palettes similar to {self.style} found in {elapsed:.1f} ms")
+
+    def result_clicked(self, item):
+        self.theme_selected.emit(item.data(Qt.UserRole))
+
+    def done(self, result):
+        self.index.close()
+        super(Theme_Finder, self).done(result)
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"{text} is not a positive number")
+    return value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index a folder of themes and search their colours")
+    parser.add_argument('root', help="folder holding the theme folders")
+    parser.add_argument('--near', metavar='CODE', help="themes with a colour close to CODE, e.g. '#3daee9'")
+    parser.add_argument('--similar', metavar='THEME', help="themes with a palette close to that of THEME")
+    parser.add_argument('--extra', metavar='KEY', help="themes that define the extra KEY")
+    parser.add_argument('--count', type=positive_int, default=10, help="number of results")
+    parser.add_argument('--all-colors', action='store_true', help="list every close colour, not one per theme")
+    args = parser.parse_args(argv)
+
+    index = Theme_Index(args.root)
+    start = time.perf_counter()
+    changed, removed = index.update()
+    print(f"Indexed {len(index.themes())} themes ({len(changed)} changed, {len(removed)} removed) "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    try:
+        if args.near or args.similar:
+            start = time.perf_counter()
+            index.load_tree()
+            print(f"Loaded {len(index.entries)} colours in {(time.perf_counter() - start) * 1000:.0f} ms")
+        if args.near:
+            start = time.perf_counter()
+            results = index.nearest(args.near, args.count, not args.all_colors)
+            elapsed = (time.perf_counter() - start) * 1000
+            for r in results:
+                print(f"{r['distance']:6.1f}  {r['theme']:<24} {r['name']:<28} {r['code']}")
+            print(f"Found in {elapsed:.1f} ms")
+        if args.similar:
+            start = time.perf_counter()
+            results = index.similar(args.similar, args.count)
+            elapsed = (time.perf_counter() - start) * 1000
+            for theme, score in results:
+                print(f"{score:6.1f}  {theme}")
+            print(f"Found in {elapsed:.1f} ms")
+        if args.extra:
+            for theme, value in index.with_extra(args.extra):
+                print(f"{theme:<24} {value}")
+    except ValueError as error:
+        print(error)
+        return 1
+    finally:
+        index.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Generates variants of a style by transforming all of its colours at once.
+# Every #rgb / #rrggbb code in the palette and the extras is collected into
+# one array, transformed in HSL space and written back. Each variant is a
+# folder <style>_<variant> next to the base style holding only the new
+# palette and a <variant>.scss that imports the widget files of the base
+# style, so the widgets are never copied. The variants are then compiled in
+# parallel like style_compiler.py does.
+#
+# A variant is NAME=OP[:VALUE],OP... with these operations:
+#   lighten:0.1   darken:0.1   add to / subtract from the lightness
+#   rotate:30     rotate the hue by degrees
+#   saturate:1.2  multiply the saturation
+#   contrast:1.5  stretch the lightness away from (or towards) the middle
+#   invert        invert the lightness, a dark theme becomes a light one
+#
+# Usage: theme_variants.py style [--variant NAME=SPEC ...] [--hues N] [--jobs N]
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+import style_compiler
+from style_compiler import theme_paths, load_palette
+
+COLOR = re.compile(r'#(?:[0-9A-Fa-f]{6}|[0-9A-Fa-f]{3})\b')
+
+DEFAULT_VARIANTS = ['light=invert', 'dark=darken:0.1,saturate:0.9', 'high-contrast=contrast:1.6,saturate:1.2']
+OPERATIONS = ('lighten', 'darken', 'rotate', 'saturate', 'contrast', 'invert')
+
+# numpy is only needed to generate variants
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def parse_spec(text):
+    # 'light=invert,saturate:0.9' -> ('light', [('invert', None), ('saturate', 0.9)])
+    name, sep, ops = text.partition('=')
+    if not sep or not name.strip():
+        raise ValueError(f"Variant '{text}' must be NAME=OPERATIONS")
+    operations = []
+    for item in ops.split(','):
+        op, sep, value = item.strip().partition(':')
+        if not op in OPERATIONS:
+            raise ValueError(f"Unknown operation '{op}' in variant '{text}'")
+        operations.append((op, float(value) if sep else None))
+    return name.strip(), operations
+
+def codes_to_rgb(codes):
+    # (n, 3) array of floats between 0 and 1
+    full = [c[1:] if len(c) == 7 else ''.join(ch * 2 for ch in c[1:]) for c in codes]
+    values = np.array([int(c, 16) for c in full], dtype=np.int64).reshape(-1, 1)
+    return ((values >> np.array([16, 8, 0])) & 0xFF) / 255.0
+
+def rgb_to_codes(rgb):
+    values = np.rint(np.clip(rgb, 0, 1) * 255).astype(np.int64)
+    values = (values[:, 0] << 16) | (values[:, 1] << 8) | values[:, 2]
+    return [f'#{value:06x}' for value in values]
+
+def rgb_to_hsl(rgb):
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    high = rgb.max(axis=1)
+    low = rgb.min(axis=1)
+    light = (high + low) / 2
+    delta = high - low
+    grey = delta == 0
+    safe = np.where(grey, 1, delta)
+    scale = np.where(light <= 0.5, high + low, 2 - high - low)
+    sat = np.where(grey, 0, delta / np.where(grey, 1, scale))
+    rc = (high - r) / safe
+    gc = (high - g) / safe
+    bc = (high - b) / safe
+    hue = np.where(r == high, bc - gc, np.where(g == high, 2 + rc - bc, 4 + gc - rc))
+    hue = np.where(grey, 0, (hue / 6) % 1)
+    return np.stack([hue, sat, light], axis=1)
+
+def hsl_to_rgb(hsl):
+    hue, sat, light = hsl[:, 0], hsl[:, 1], hsl[:, 2]
+    m2 = np.where(light <= 0.5, light * (1 + sat), light + sat - light * sat)
+    m1 = 2 * light - m2
+    def channel(h):
+        h = h % 1
+        return np.select([h < 1 / 6, h < 0.5, h < 2 / 3],
+                         [m1 + (m2 - m1) * h * 6, m2, m1 + (m2 - m1) * (2 / 3 - h) * 6], m1)
+    return np.stack([channel(hue + 1 / 3), channel(hue), channel(hue - 1 / 3)], axis=1)
+
+def transform(rgb, operations):
+    hsl = rgb_to_hsl(rgb)
+    for op, value in operations:
+        if op == 'lighten':
+            hsl[:, 2] += 0.1 if value is None else value
+        elif op == 'darken':
+            hsl[:, 2] -= 0.1 if value is None else value
+        elif op == 'rotate':
+            hsl[:, 0] = (hsl[:, 0] + (180 if value is None else value) / 360) % 1
+        elif op == 'saturate':
+            hsl[:, 1] *= 1.2 if value is None else value
+        elif op == 'contrast':
+            hsl[:, 2] = 0.5 + (hsl[:, 2] - 0.5) * (1.5 if value is None else value)
+        elif op == 'invert':
+            hsl[:, 2] = 1 - hsl[:, 2]
+        hsl[:, 1:] = np.clip(hsl[:, 1:], 0, 1)
+    return hsl_to_rgb(hsl)
+
+def collect_codes(palette_dict, extras_dict):
+    codes = set()
+    for code in palette_dict.values():
+        codes.update(COLOR.findall(code))
+    for value in extras_dict.values():
+        codes.update(COLOR.findall(value))
+    return sorted(codes)
+
+def make_variants(style, specs):
+    # returns [(variant name, palette_dict, extras_dict)]
+    palette_dict, extras_dict = load_palette(theme_paths(style)['palette_file'])
+    codes = collect_codes(palette_dict, extras_dict)
+    rgb = codes_to_rgb(codes) if codes else np.zeros((0, 3))
+    variants = []
+    for name, operations in specs:
+        mapping = dict(zip(codes, rgb_to_codes(transform(rgb.copy(), operations)))) if codes else {}
+        replace = lambda match: mapping[match.group(0)]
+        palette = {key: COLOR.sub(replace, code) for key, code in palette_dict.items()}
+        extras = {key: COLOR.sub(replace, value) for key, value in extras_dict.items()}
+        variants.append((name, palette, extras))
+    return variants
+
+def write_variant(style, name, palette, extras, spec):
+    # <root>/<base>_<name>/ with the palette and an scss file importing the
+    # widget files of the base style
+    base = os.path.basename(os.path.normpath(style))
+    target = os.path.join(os.path.dirname(os.path.normpath(style)), f"{base}_{name}")
+    os.makedirs(target, exist_ok=True)
+    paths = theme_paths(target)
+    data = {'palette': palette, 'extras': extras, 'variant': {'base': base, 'spec': spec}}
+    style_compiler.write_atomic(paths['palette_file'], json.dumps(data, indent=4))
+    imports = style_compiler.parse_imports(theme_paths(style)['scss_file'])
+    if imports is None:
+        raise ValueError(f"{theme_paths(style)['scss_file']} must only contain @import lines")
+    lines = [f"// variant of {base}: {spec}"]
+    for item in imports:
+        if os.path.abspath(style_compiler.find_partial(style, item) or '') == os.path.abspath(theme_paths(style)['var_file']):
+            lines.append(f"@import '{item}';")
+        else:
+            lines.append(f"@import '../{base}/{item}';")
+    text = '\n'.join(lines) + '\n'
+    if style_compiler.read_text(paths['scss_file']) != text:
+        style_compiler.write_atomic(paths['scss_file'], text)
+    return target
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate colour variants of a style")
+    parser.add_argument('style', help="base style folder")
+    parser.add_argument('--variant', action='append', metavar='NAME=SPEC', help="variant to generate, may be repeated")
+    parser.add_argument('--hues', type=int, default=0, help="also generate N variants with the hue rotated in equal steps")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--no-compile', action='store_true', help="only write the variant folders")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("Cannot generate variants - numpy is not installed")
+        print("sudo apt install python3-numpy")
+        return 2
+    texts = list(args.variant or ([] if args.hues else DEFAULT_VARIANTS))
+    for step in range(1, args.hues + 1):
+        degrees = round(360 * step / (args.hues + 1))
+        texts.append(f"hue{degrees:03d}=rotate:{degrees}")
+    try:
+        specs = [parse_spec(text) for text in texts]
+    except ValueError as error:
+        print(error)
+        return 1
+
+    start = time.perf_counter()
+    styles = []
+    for (name, palette, extras), text in zip(make_variants(args.style, specs), texts):
+        styles.append(write_variant(args.style, name, palette, extras, text.partition('=')[2]))
+    print(f"Wrote {len(styles)} variants in {time.perf_counter() - start:.2f} s")
+    if args.no_compile:
+        return 0
+    start = time.perf_counter()
+    results = style_compiler.build_all(styles, args.jobs)
+    errors = [r for r in results if r['error'] is not None]
+    print(f"Compiled {len(results) - len(errors)} of {len(results)} variants in {time.perf_counter() - start:.2f} s")
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
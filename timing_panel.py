@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Dockable panel with the timings recorded by instrumentation.py. The table
+# has a row per stage, the slowest in total first, and the histogram shows
+# how the last spans of the selected stage are spread over BUCKETS. The
+# panel is only refreshed while it is visible and something was recorded.
+
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QPainter
+
+from instrumentation import RECORDER, BUCKETS, format_time
+
+COLUMNS = ['Stage', 'Count', 'Last', 'Median', 'P90', 'Max', 'Total']
+REFRESH = 500
+
+
+def bucket_label(index):
+    if index == len(BUCKETS):
+        return f">{format_time(BUCKETS[-1])}"
+    return format_time(BUCKETS[index]).replace(' ', '')
+
+
+class Histogram_View(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(Histogram_View, self).__init__(parent)
+        self.counts = []
+        self.title = ''
+        self.setMinimumHeight(120)
+
+    def set_counts(self, title, counts):
+        self.title = title
+        self.counts = counts
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.rect().adjusted(4, 4, -4, -4)
+        metrics = painter.fontMetrics()
+        text_height = metrics.height()
+        painter.drawText(rect.left(), rect.top() + metrics.ascent(), self.title or "Select a stage")
+        if not self.counts or not any(self.counts): return
+        top = rect.top() + text_height + 4
+        bottom = rect.bottom() - text_height - 2
+        height = max(1, bottom - top)
+        width = rect.width() / len(self.counts)
+        peak = max(self.counts)
+        color = self.palette().color(self.palette().Highlight)
+        for index, count in enumerate(self.counts):
+            x = int(rect.left() + index * width)
+            bar = int(height * count / peak)
+            if count:
+                painter.fillRect(x + 1, bottom - bar, max(1, int(width) - 2), bar, color)
+                painter.drawText(x, bottom - bar - 2, str(count))
+            if index % 2 == 0:
+                painter.drawText(x, rect.bottom(), bucket_label(index))
+
+
+class Timing_Panel(QtWidgets.QDockWidget):
+    message = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super(Timing_Panel, self).__init__("Timings", parent)
+        self.setObjectName('dock_timings')
+        self.version = -1
+        widget = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(widget)
+        layout.setContentsMargins(4, 4, 4, 4)
+        self.table = QtWidgets.QTableWidget(0, len(COLUMNS), widget)
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.table.itemSelectionChanged.connect(self.show_histogram)
+        self.histogram = Histogram_View(widget)
+        buttons = QtWidgets.QHBoxLayout()
+        self.btn_save = QtWidgets.QPushButton("Save Trace", widget)
+        self.btn_save.setToolTip("Save the recorded spans as a Chrome trace")
+        self.btn_save.clicked.connect(self.save_trace)
+        self.btn_reset = QtWidgets.QPushButton("Reset", widget)
+        self.btn_reset.clicked.connect(self.reset)
+        self.lbl_events = QtWidgets.QLabel(widget)
+        buttons.addWidget(self.lbl_events)
+        buttons.addStretch()
+        buttons.addWidget(self.btn_reset)
+        buttons.addWidget(self.btn_save)
+        layout.addWidget(self.table, 2)
+        layout.addWidget(self.histogram, 1)
+        layout.addLayout(buttons)
+        self.setWidget(widget)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(REFRESH)
+        self.timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.visibility_changed)
+
+    def visibility_changed(self, visible):
+        if visible:
+            self.refresh()
+            self.timer.start()
+        else:
+            self.timer.stop()
+
+    def selected_stage(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows: return None
+        return self.table.item(rows[0].row(), 0).text()
+
+    def refresh(self):
+        if RECORDER.version == self.version: return
+        self.version = RECORDER.version
+        selected = self.selected_stage()
+        summary = RECORDER.summary()
+        stages = sorted(summary.items(), key=lambda item: -item[1]['total'])
+        self.table.blockSignals(True)
+        self.table.setRowCount(len(stages))
+        for row, (name, s) in enumerate(stages):
+            values = [name, str(s['count'])] + [format_time(s[key]) for key in ('last', 'median', 'p90', 'max', 'total')]
+            for column, value in enumerate(values):
+                item = QtWidgets.QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+            if name == selected:
+                self.table.selectRow(row)
+        self.table.blockSignals(False)
+        self.lbl_events.setText(f"{len(RECORDER.events)} spans")
+        self.show_histogram()
+
+    def show_histogram(self):
+        name = self.selected_stage()
+        if name is None:
+            self.histogram.set_counts('', [])
+            return
+        counts = RECORDER.histogram(name)
+        self.histogram.set_counts(f"{name} - last {sum(counts)} spans", counts)
+
+    def reset(self):
+        RECORDER.reset()
+        self.version = -1
+        self.refresh()
+
+    def save_trace(self):
+        options = QtWidgets.QFileDialog.Options()
+        options |= QtWidgets.QFileDialog.DontUseNativeDialog
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save trace", 'trace.json',
+                                                        'Chrome trace (*.json)', options=options)
+        if not path: return
+        try:
+            count = RECORDER.save_trace(path)
+        except OSError as error:
+            print(error)
+            self.message.emit(f"Could not save the trace to {path}")
+            return
+        self.message.emit(f"Saved {count} spans to {path}")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# Copyright (c) 2023 Jim Sloot (persei802@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# Resolves the $variable references in the extras against the palette and
+# against other extras. Palette references are replaced by their colour
+# code, references to other extras are left for sass to evaluate and the
+# extras are written in dependency order so that every variable is defined
+# before it is used. Palette names take precedence over extras with the
+# same name, so an extra like 'border-hover = 1px solid $border-hover'
+# refers to the palette colour and not to itself.
+# The resolver keeps its state between calls; updating the palette or the
+# extras only re-resolves the entries that depend on what changed.
+
+import re
+import heapq
+from collections import defaultdict
+
+VARIABLE = re.compile(r'\$([A-Za-z_][\w-]*)')
+
+
+class VariableResolver():
+    def __init__(self):
+        self.palette = {}
+        self.palette_lines = {}
+        self.extras = {}
+        self.extras_lines = {}
+        self.extras_keys = {}
+        self.refs = {}
+        self.dependents = defaultdict(set)
+        self._order = None
+        self._cycles = []
+        self._scss = {}
+        self._resolved = {}
+        self._missing = {}
+
+    def set_palette(self, palette_dict):
+        changed = set(self.palette) ^ set(palette_dict)
+        if changed:
+            # palette names shadow extras, so the graph may change shape
+            self._order = None
+        changed.update(name for name, code in palette_dict.items()
+                       if name in self.palette and self.palette[name] != code)
+        self.palette = dict(palette_dict)
+        self.palette_lines = {name: index + 1 for index, name in enumerate(palette_dict)}
+        self.invalidate(changed)
+        return changed
+
+    def set_extras(self, extras_lines):
+        extras = {}
+        lines = {}
+        keys = {}
+        for index, extra in enumerate(extras_lines):
+            if extra.startswith('#'): continue
+            parts = extra.split('=')
+            if len(parts) > 1:
+                name = parts[0].strip()
+                extras[name] = parts[1].strip()
+                lines[name] = index + 1
+                keys[name] = parts[0]
+        changed = set(self.extras) ^ set(extras)
+        changed.update(name for name, value in extras.items()
+                       if name in self.extras and self.extras[name] != value)
+        if changed or list(extras) != list(self.extras):
+            self._order = None
+        for name in changed:
+            old_refs = self.refs.pop(name, set())
+            for ref in old_refs:
+                self.dependents[ref].discard(name)
+            if name in extras:
+                new_refs = set(VARIABLE.findall(extras[name]))
+                self.refs[name] = new_refs
+                for ref in new_refs:
+                    self.dependents[ref].add(name)
+        self.extras = extras
+        self.extras_lines = lines
+        self.extras_keys = keys
+        self.invalidate(changed)
+        return changed
+
+    def invalidate(self, names):
+        # the written value of an extra only depends on its direct
+        # references, the expanded value on the whole chain
+        pending = []
+        for name in names:
+            users = self.dependents.get(name, ())
+            for item in (name, *users):
+                self._scss.pop(item, None)
+                self._missing.pop(item, None)
+            pending.append(name)
+        seen = set()
+        while pending:
+            item = pending.pop()
+            if item in seen: continue
+            seen.add(item)
+            self._resolved.pop(item, None)
+            pending.extend(self.dependents.get(item, ()))
+
+    def extra_refs(self, name):
+        # references from an extra to other extras, palette names win
+        return [ref for ref in self.refs.get(name, ()) if ref in self.extras and not ref in self.palette]
+
+    def order(self):
+        # Kahn's algorithm, keeping the original order where possible
+        if self._order is not None:
+            return self._order
+        indegree = {name: 0 for name in self.extras}
+        users = defaultdict(list)
+        for name in self.extras:
+            for ref in self.extra_refs(name):
+                if ref == name: continue
+                indegree[name] += 1
+                users[ref].append(name)
+        position = {name: index for index, name in enumerate(self.extras)}
+        names = list(self.extras)
+        ready = [position[name] for name in names if indegree[name] == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            name = names[heapq.heappop(ready)]
+            order.append(name)
+            for user in users[name]:
+                indegree[user] -= 1
+                if indegree[user] == 0:
+                    heapq.heappush(ready, position[user])
+        self._cycles = self.find_cycles([name for name in self.extras if indegree[name] > 0])
+        # names in a cycle are still written, in their original order
+        order.extend(name for name in self.extras if indegree[name] > 0)
+        self._order = order
+        return order
+
+    def find_cycles(self, names):
+        cycles = []
+        remaining = set(names)
+        for start in names:
+            if not start in remaining: continue
+            path = [start]
+            index = {start: 0}
+            name = start
+            while True:
+                nxt = next((ref for ref in self.extra_refs(name) if ref in remaining), None)
+                if nxt is None:
+                    break
+                if nxt in index:
+                    cycles.append(path[index[nxt]:] + [nxt])
+                    break
+                index[nxt] = len(path)
+                path.append(nxt)
+                name = nxt
+            remaining.difference_update(path)
+        for name in self.extras:
+            if name in self.extra_refs(name):
+                cycles.append([name, name])
+        return cycles
+
+    def substitute(self, name):
+        # value of an extra with palette references replaced by colour codes
+        if name in self._scss:
+            return self._scss[name]
+        missing = []
+        def replace(match):
+            ref = match.group(1)
+            if ref in self.palette:
+                code = self.palette[ref]
+                if code.startswith('#'):
+                    return code
+                missing.append(ref)
+                return ref
+            if ref == name:
+                # reported as a cycle
+                return ref
+            if ref in self.extras:
+                return match.group(0)
+            missing.append(ref)
+            return ref
+        value = VARIABLE.sub(replace, self.extras[name])
+        self._scss[name] = value
+        self._missing[name] = missing
+        return value
+
+    def resolve(self, name):
+        # fully expanded value of a palette entry or extra, with references
+        # to other extras replaced by their own expanded value
+        if name in self.palette:
+            return self.palette[name]
+        if name in self._resolved:
+            return self._resolved[name]
+        if not name in self.extras:
+            return None
+        stack = [(name, False)]
+        active = set()
+        while stack:
+            item, expanded = stack.pop()
+            if item in self._resolved: continue
+            if not expanded:
+                active.add(item)
+                stack.append((item, True))
+                for ref in self.extra_refs(item):
+                    if not ref in self._resolved and not ref in active:
+                        stack.append((ref, False))
+                continue
+            # references that are still active are part of a cycle and
+            # are left as they are
+            def expand(match):
+                ref = match.group(1)
+                if ref in self.palette and self.palette[ref].startswith('#'):
+                    return self.palette[ref]
+                if ref in self._resolved:
+                    return self._resolved[ref]
+                return match.group(0)
+            self._resolved[item] = VARIABLE.sub(expand, self.extras[item])
+            active.discard(item)
+        return self._resolved[name]
+
+    def extras_scss(self, skip=()):
+        # keys are written as they were typed
+        return [f'${self.extras_keys[name]}: {self.substitute(name)};' for name in self.order() if not name in skip]
+
+    def unresolved(self):
+        report = []
+        order = self.order()
+        for name in order:
+            self.substitute(name)
+            line = self.extras_lines[name]
+            for ref in self._missing[name]:
+                if ref in self.palette:
+                    report.append(f"line {line}: ${ref} in {name} has no colour code")
+                else:
+                    report.append(f"line {line}: ${ref} in {name} is not defined")
+        for cycle in self._cycles:
+            line = self.extras_lines[cycle[0]]
+            report.append(f"line {line}: reference cycle {' -> '.join(cycle)}")
+        return report